@@ -0,0 +1,292 @@
+'''
+Rolling-window alerts evaluated on every live refresh.
+
+Rules are loaded from alerts.json (or the file named by DEX_ALERTS_FILE):
+
+    [
+        {"name": "volume_spike", "field": "volume_m5", "stat": "mean", "window": 1800,
+         "op": ">=", "ratio": 3.0, "cooldown": 600},
+        {"name": "liquidity_drop", "field": "liquidity_usd", "stat": "max", "window": 120,
+         "op": "<=", "ratio": 0.6, "cooldown": 300}
+    ]
+
+A rule compares a coin's new value with `ratio` times a rolling statistic of
+its previous values over the last `window` seconds: "volume_spike" fires
+when m5 volume is at least 3x its 30-minute average, "liquidity_drop" when
+liquidity is at most 60% of its 2-minute high. Stats:
+
+    mean        ring buffer of recent values with a running sum
+    ewma        exponentially weighted average with time constant `window`
+    max / min   monotonic deque of recent values
+
+Every aggregate is updated in O(1) (amortized) per refresh, so nothing is
+recomputed from history; rules on the same field, stat and window share one
+aggregate. A rule can only fire once a coin has `min_samples` earlier values
+(default 3) and a positive baseline (a dead coin's zero volume is not a
+spike), and then stays quiet for `cooldown` seconds per coin.
+'''
+
+import json
+import math
+import operator
+import os
+from collections import deque
+
+from event_bus import publish
+from metrics import alerts_fired
+from pair_snapshot import NUMERIC_FIELDS
+
+ALERTS_FILE = os.getenv("DEX_ALERTS_FILE", "./alerts.json")
+
+RING_CAPACITY = 1024   # most values kept per mean window; older ones are dropped early
+RING_INITIAL = 8
+DEFAULT_MIN_SAMPLES = 3
+DEFAULT_COOLDOWN = 300  # seconds
+
+# Snapshot fields a rule can watch
+RULE_FIELDS = {field for field, _ in NUMERIC_FIELDS}
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+class RollingMean:
+    """Mean of the values in the last `window` seconds, in a ring buffer (grown up to RING_CAPACITY)."""
+
+    __slots__ = ("window", "times", "values", "head", "size", "total", "samples")
+
+    def __init__(self, window):
+        self.window = window
+        self.times = [0.0] * RING_INITIAL
+        self.values = [0.0] * RING_INITIAL
+        self.head = 0  # index of the oldest value
+        self.size = 0
+        self.total = 0.0
+        self.samples = 0
+
+    def evict(self, now):
+        capacity = len(self.values)
+        while self.size and now - self.times[self.head] > self.window:
+            self.total -= self.values[self.head]
+            self.head = (self.head + 1) % capacity
+            self.size -= 1
+        if not self.size:
+            self.total = 0.0  # drop accumulated rounding error
+
+    def grow(self):
+        """Double the buffer, unrolled so the oldest value is at index 0."""
+        capacity = len(self.values)
+        order = [(self.head + i) % capacity for i in range(self.size)]
+        self.times = [self.times[i] for i in order] + [0.0] * capacity
+        self.values = [self.values[i] for i in order] + [0.0] * capacity
+        self.head = 0
+
+    def update(self, now, value):
+        self.evict(now)
+        if self.size == len(self.values):
+            if self.size < RING_CAPACITY:
+                self.grow()
+            else:
+                self.total -= self.values[self.head]
+                self.head = (self.head + 1) % len(self.values)
+                self.size -= 1
+        capacity = len(self.values)
+        tail = (self.head + self.size) % capacity
+        self.times[tail] = now
+        self.values[tail] = value
+        self.total += value
+        self.size += 1
+        self.samples += 1
+
+    def value(self, now):
+        self.evict(now)
+        return self.total / self.size if self.size else math.nan
+
+
+class Ewma:
+    """Exponentially weighted moving average over irregular refresh times."""
+
+    __slots__ = ("window", "average", "updated", "samples")
+
+    def __init__(self, window):
+        self.window = window
+        self.average = math.nan
+        self.updated = None
+        self.samples = 0
+
+    def update(self, now, value):
+        if self.updated is None:
+            self.average = value
+        else:
+            weight = 1 - math.exp(-max(0.0, now - self.updated) / self.window)
+            self.average += weight * (value - self.average)
+        self.updated = now
+        self.samples += 1
+
+    def value(self, now):
+        return self.average
+
+
+class RollingExtreme:
+    """Max (or min) of the values in the last `window` seconds, with a monotonic deque."""
+
+    __slots__ = ("window", "better", "entries", "samples")
+
+    def __init__(self, window, maximum=True):
+        self.window = window
+        self.better = operator.ge if maximum else operator.le
+        self.entries = deque()  # (time, value), values monotonic from the front
+        self.samples = 0
+
+    def evict(self, now):
+        while self.entries and now - self.entries[0][0] > self.window:
+            self.entries.popleft()
+
+    def update(self, now, value):
+        self.evict(now)
+        # Values the new one beats can never be the extreme again
+        while self.entries and self.better(value, self.entries[-1][1]):
+            self.entries.pop()
+        self.entries.append((now, value))
+        self.samples += 1
+
+    def value(self, now):
+        self.evict(now)
+        return self.entries[0][1] if self.entries else math.nan
+
+
+AGGREGATES = {
+    "mean": RollingMean,
+    "ewma": Ewma,
+    "max": lambda window: RollingExtreme(window, maximum=True),
+    "min": lambda window: RollingExtreme(window, maximum=False),
+}
+
+
+class AlertRuleError(ValueError):
+    pass
+
+
+class AlertRule:
+    """One configured rule: `field` `op` `ratio` x `stat` over `window` seconds."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.name = spec.get("name") or f"{spec.get('field')}_{spec.get('stat')}"
+        self.field = spec.get("field")
+        self.stat = spec.get("stat", "mean")
+        if self.stat not in AGGREGATES:
+            raise AlertRuleError(f"{self.name}: unknown stat {self.stat!r}")
+        if spec.get("op") not in OPERATORS:
+            raise AlertRuleError(f"{self.name}: unknown op {spec.get('op')!r}")
+        self.op = spec["op"]
+        self.compare = OPERATORS[self.op]
+        try:
+            self.window = float(spec["window"])
+            self.ratio = float(spec.get("ratio", 1.0))
+        except (KeyError, TypeError, ValueError):
+            raise AlertRuleError(f"{self.name}: window and ratio must be numbers")
+        self.cooldown = float(spec.get("cooldown", DEFAULT_COOLDOWN))
+        self.min_samples = int(spec.get("min_samples", DEFAULT_MIN_SAMPLES))
+        self.key = (self.field, self.stat, self.window)
+
+
+class AlertEngine:
+    """Per-address rolling aggregates and rule evaluation."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.aggregates = {}   # address -> {(field, stat, window): aggregate}
+        self.last_fired = {}   # (address, rule name) -> time of the last alert
+        self.fired = 0
+        for rule in rules:
+            if rule.field not in RULE_FIELDS:
+                raise AlertRuleError(f"{rule.name}: unknown field {rule.field!r}")
+        self.keys = sorted({rule.key for rule in rules}, key=str)
+
+    def observe(self, snapshot):
+        """Evaluate the rules on a new snapshot, update the windows and return the alerts fired."""
+        address = snapshot.address
+        now = snapshot.ts / 1000
+        aggregates = self.aggregates.get(address)
+        if aggregates is None:
+            aggregates = self.aggregates[address] = {
+                key: AGGREGATES[key[1]](key[2]) for key in self.keys
+            }
+
+        alerts = []
+        for rule in self.rules:
+            value = field_value(snapshot, rule.field)
+            if value is None:
+                continue
+            aggregate = aggregates[rule.key]
+            if aggregate.samples < rule.min_samples:
+                continue
+            baseline = aggregate.value(now)
+            # NaN or zero baselines (no volume, drained pool) make every ratio meaningless
+            if not baseline > 0 or not rule.compare(value, rule.ratio * baseline):
+                continue
+            last = self.last_fired.get((address, rule.name))
+            if last is not None and now - last < rule.cooldown:
+                continue
+            self.last_fired[(address, rule.name)] = now
+            alerts.append({"rule": rule.name, "address": address, "ts": snapshot.ts,
+                           "field": rule.field, "value": value, "stat": rule.stat,
+                           "window": rule.window, "baseline": baseline})
+
+        # Each shared aggregate takes the new value once, after every rule has seen the old window
+        for key in self.keys:
+            value = field_value(snapshot, key[0])
+            if value is not None:
+                aggregates[key].update(now, value)
+        self.fired += len(alerts)
+        return alerts
+
+    def forget(self, address):
+        """Drop the windows of a coin that left the watchlist."""
+        self.aggregates.pop(address, None)
+        for rule in self.rules:
+            self.last_fired.pop((address, rule.name), None)
+
+    def stats(self):
+        return {"rules": len(self.rules), "addresses": len(self.aggregates), "fired": self.fired}
+
+
+def field_value(snapshot, field):
+    """The value of a snapshot field as a float, or None when the API did not return it (counts store -1)."""
+    value = getattr(snapshot, field)
+    if value is None or (isinstance(value, int) and value < 0):
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def load_rules(path=ALERTS_FILE):
+    """Parse the rules in `path`; no file means no alerts."""
+    try:
+        with open(path, "r") as file:
+            specs = json.load(file)
+    except FileNotFoundError:
+        return []
+    return [AlertRule(spec) for spec in specs]
+
+
+alert_engine = None
+
+
+def get_engine():
+    """The process-wide engine, built from ALERTS_FILE on first use."""
+    global alert_engine
+    if alert_engine is None:
+        alert_engine = AlertEngine(load_rules())
+    return alert_engine
+
+
+def check_alerts(snapshot):
+    """Run a refreshed snapshot through the engine and publish whatever fires."""
+    alerts = get_engine().observe(snapshot)
+    for alert in alerts:
+        alerts_fired.inc(rule=alert["rule"])
+        publish("alert", **alert)
+        print(f"Alert {alert['rule']} for {alert['address']}: {alert['field']} {alert['value']:.6g} "
+              f"vs {alert['stat']} {alert['baseline']:.6g} over {alert['window']:.0f}s")
+    return alerts
@@ -0,0 +1,165 @@
+'''
+Vectorized cross-coin signals over the watchlist.
+
+Loads the latest snapshot of every coin in coins_with_socials.json into one
+NumPy array per field, computes all signals for the whole set in a single
+batched pass and ranks the coins:
+
+    buy/sell ratio      buys / sells per window (m5, h1, h24)
+    volume acceleration m5 volume rate vs h1 volume rate
+    momentum            price change over the momentum window, from history
+    liquidity / FDV     how much of the valuation is backed by liquidity
+'''
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from pair_snapshot import NUMERIC_FIELDS, parse_response
+from payload_archive import PayloadArchive
+from snapshot_store import ROW_DTYPE, SnapshotStore
+
+COINS_WITH_SOCIALS_FILE = "./test_coin_data/coins_with_socials.json"
+PAIR_DATA_DIR = "./test_coin_data"
+PAYLOAD_ARCHIVE_DIR = "./test_coin_data/archive"
+
+MOMENTUM_WINDOW = 5 * 60 * 1000  # milliseconds
+
+# Signal -> weight in the composite score (ranks are combined, so units don't matter)
+SIGNAL_WEIGHTS = {
+    "buy_sell_m5": 1.0,
+    "buy_sell_h1": 0.5,
+    "volume_acceleration": 1.0,
+    "momentum": 1.0,
+    "liquidity_to_fdv": 0.5,
+}
+
+
+def load_watchlist(path=COINS_WITH_SOCIALS_FILE):
+    """Addresses in coins_with_socials.json."""
+    try:
+        with open(path, "r") as file:
+            return list(json.load(file))
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print("Error loading coin addresses:", e)
+        return []
+
+
+payload_archive = None
+
+
+def load_saved_snapshot(address):
+    """Fallback for coins without history: the payload saved at discovery time."""
+    global payload_archive
+    if payload_archive is None and os.path.isdir(PAYLOAD_ARCHIVE_DIR):
+        payload_archive = PayloadArchive(PAYLOAD_ARCHIVE_DIR, readonly=True)
+    if payload_archive is not None and address in payload_archive:
+        return parse_response(payload_archive.get(address), address)
+    # Coins saved before the archive existed
+    try:
+        with open(os.path.join(PAIR_DATA_DIR, f"{address}.json"), "r") as file:
+            return parse_response(json.load(file), address)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def load_latest(addresses, store=None, momentum_window=MOMENTUM_WINDOW):
+    """
+    Load the latest snapshot of every address into column arrays.
+
+    Returns a dict of field -> float64 array (NaN where missing), plus
+    `price_before`: the oldest price inside the momentum window.
+    """
+    store = store or SnapshotStore()
+    n = len(addresses)
+    columns = {field: np.full(n, np.nan) for field, _ in NUMERIC_FIELDS}
+    columns["ts"] = np.full(n, np.nan)
+    columns["price_before"] = np.full(n, np.nan)
+
+    # Reading is per coin (the latest-row record, then the window's prices); all maths is batched
+    for i, address in enumerate(addresses):
+        row = store.latest_row(address)
+        if row is not None:
+            for field in ROW_DTYPE.names:
+                columns[field][i] = row[field]
+            history = store.read_tail(address, momentum_window, fields=["price_usd"])
+            if len(history["price_usd"]):
+                columns["price_before"][i] = history["price_usd"][0]
+            continue
+        snapshot = store.latest(address) or load_saved_snapshot(address)
+        if snapshot is None:
+            continue
+        columns["ts"][i] = snapshot.ts
+        for field, _ in NUMERIC_FIELDS:
+            columns[field][i] = getattr(snapshot, field)
+        history = store.read_range(address, snapshot.ts - momentum_window, fields=["price_usd"])
+        if len(history["price_usd"]):
+            columns["price_before"][i] = history["price_usd"][0]
+
+    # Missing integer counts are stored as -1
+    for field, dtype in NUMERIC_FIELDS:
+        if dtype == "<i4":
+            columns[field][columns[field] < 0] = np.nan
+    return columns
+
+
+def safe_ratio(numerator, denominator):
+    """Element-wise numerator / denominator with NaN where the denominator is 0 or missing."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = numerator / denominator
+    ratio[~np.isfinite(ratio)] = np.nan
+    return ratio
+
+
+def compute_signals(columns):
+    """Compute every signal for all coins at once."""
+    return {
+        "buy_sell_m5": safe_ratio(columns["buys_m5"], columns["sells_m5"]),
+        "buy_sell_h1": safe_ratio(columns["buys_h1"], columns["sells_h1"]),
+        "buy_sell_h24": safe_ratio(columns["buys_h24"], columns["sells_h24"]),
+        # per-minute rate over the last 5 minutes vs over the last hour
+        "volume_acceleration": safe_ratio(columns["volume_m5"] / 5, columns["volume_h1"] / 60),
+        "momentum": safe_ratio(columns["price_usd"] - columns["price_before"], columns["price_before"]),
+        "liquidity_to_fdv": safe_ratio(columns["liquidity_usd"], columns["fdv"]),
+    }
+
+
+def percentile_ranks(values):
+    """Rank values into [0, 1] (highest = 1); NaN ranks as 0."""
+    n = len(values)
+    if n < 2:
+        return np.zeros(n)
+    filled = np.where(np.isnan(values), -np.inf, values)
+    ranks = np.empty(n)
+    ranks[np.argsort(filled, kind="stable")] = np.arange(n)
+    ranks /= n - 1
+    ranks[np.isnan(values)] = 0.0
+    return ranks
+
+
+def rank_coins(signals, weights=SIGNAL_WEIGHTS):
+    """Composite score per coin and the indices ordered best first."""
+    total_weight = sum(weights.values())
+    score = sum(weight * percentile_ranks(signals[name]) for name, weight in weights.items()) / total_weight
+    return score, np.argsort(-score, kind="stable")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank the watchlist by trading signals.")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    addresses = load_watchlist()
+    if not addresses:
+        print("No coin addresses found.")
+    else:
+        columns = load_latest(addresses)
+        signals = compute_signals(columns)
+        score, order = rank_coins(signals)
+        print(f"{'address':<46} {'score':>6} {'b/s m5':>7} {'vol acc':>8} {'mom':>8} {'liq/fdv':>8}")
+        for i in order[:args.top]:
+            print(f"{addresses[i]:<46} {score[i]:6.3f} {signals['buy_sell_m5'][i]:7.2f} "
+                  f"{signals['volume_acceleration'][i]:8.2f} {signals['momentum'][i]:8.3f} "
+                  f"{signals['liquidity_to_fdv'][i]:8.3f}")
@@ -0,0 +1,232 @@
+'''
+Offline benchmarks for the discovery and refresh loops.
+
+Each target runs in its own process, in a scratch working directory, against
+a fresh fake_server (fixtures from test_coin_data/ and coin_data/ plus any
+synthetic coins) for a fixed duration, and reports:
+
+    listings/s      new listings screened per second (discovery targets)
+    latency p50/p95 seconds from a listing becoming visible to it being screened
+    refreshes/s     watchlist snapshots refreshed per second (live_json_data)
+    req/coin        upstream requests per coin looked up
+    peak RSS        maximum resident set size of the target process
+
+    python benchmark.py --duration 20 --synthetic 2000 --listing-rate 10 --latency 0.05 --error-rate 0.01
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_server import DEFAULT_FIXTURE_DIRS, start_server
+
+TARGETS = ("new_pair_fetch", "dex_scrapper", "live_json_data")
+DEFAULT_DURATION = 20  # seconds per target
+WATCHLIST_SIZE = 200   # coins refreshed by the live_json_data target
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def bench_new_pair_fetch(duration):
+    """The asyncio discovery pipeline; returns {address: time screened}."""
+    import discovery_pipeline
+    import new_pair_fetch
+
+    screened = {}
+    record_pair_status = new_pair_fetch.record_pair_status
+
+    def timed_record(pair_address, status, data, block=True):
+        if status != "no_data":
+            screened.setdefault(pair_address, time.time())
+        record_pair_status(pair_address, status, data, block)
+
+    new_pair_fetch.record_pair_status = timed_record
+    try:
+        asyncio.run(asyncio.wait_for(discovery_pipeline.run_pipeline(), duration))
+    except asyncio.TimeoutError:
+        pass
+    return {"screened": screened}
+
+
+def bench_dex_scrapper(duration):
+    """The original blocking poll loop (schedule, every 5 s); returns {address: time screened}."""
+    os.makedirs("coin_data", exist_ok=True)
+    import schedule
+    import dex_scrapper
+
+    screened = {}
+    save_pair_data = dex_scrapper.save_pair_data
+
+    def timed_save(pair_address, data):
+        found = save_pair_data(pair_address, data)
+        screened.setdefault(pair_address, time.time())
+        return found
+
+    dex_scrapper.save_pair_data = timed_save
+    schedule.run_all()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        schedule.run_pending()
+        time.sleep(0.1)
+    return {"screened": screened}
+
+
+def bench_live_json_data(duration, watchlist):
+    """The tiered watchlist refresh; returns the number of coin refreshes."""
+    with open("./test_coin_data/coins_with_socials.json", "w") as file:
+        json.dump(watchlist, file)
+    import live_json_data
+    from http_pool import create_session
+
+    refreshes = 0
+    save_snapshot = live_json_data.save_snapshot
+
+    def counted_save(pair_address, snapshot):
+        nonlocal refreshes
+        refreshes += 1
+        return save_snapshot(pair_address, snapshot)
+
+    live_json_data.save_snapshot = counted_save
+
+    async def run():
+        async with create_session() as session:
+            await live_json_data.run_live_refresh(session)
+
+    try:
+        asyncio.run(asyncio.wait_for(run(), duration))
+    except asyncio.TimeoutError:
+        pass
+    return {"refreshes": refreshes}
+
+
+def run_child(target, duration, watchlist_file, result_file):
+    """Benchmark one target in this (child) process and write its raw results."""
+    os.makedirs("test_coin_data", exist_ok=True)
+    started = time.time()
+    if target == "new_pair_fetch":
+        result = bench_new_pair_fetch(duration)
+    elif target == "dex_scrapper":
+        result = bench_dex_scrapper(duration)
+    else:
+        with open(watchlist_file) as file:
+            result = bench_live_json_data(duration, json.load(file))
+    result["elapsed"] = time.time() - started
+    result["peak_rss_mb"] = peak_rss_mb()
+    with open(result_file, "w") as file:
+        json.dump(result, file)
+
+
+def run_target(target, args, fixture_dirs):
+    """Start a fresh fake server, run `target` in a scratch directory and summarise it."""
+    server, base_url = start_server(
+        fixture_dirs=fixture_dirs, synthetic=args.synthetic, latency=args.latency,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, listing_rate=args.listing_rate)
+    env = dict(os.environ, DEX_SCREENER_BASE_URL=base_url, BIRDEYE_BASE_URL=base_url,
+               BIRDEYE_API_KEY="benchmark")
+    if args.rate_limit:
+        env["DEX_SCREENER_RATE_LIMIT"] = env["BIRDEYE_RATE_LIMIT"] = str(args.rate_limit)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        watchlist = [address for address, pairs in server.fixtures.items() if pairs][:args.watchlist]
+        watchlist_file = os.path.join(workdir, "watchlist.json")
+        result_file = os.path.join(workdir, "result.json")
+        with open(watchlist_file, "w") as file:
+            json.dump(watchlist, file)
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "benchmark.py"), "--child", target,
+             "--duration", str(args.duration), watchlist_file, result_file],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, check=True)
+        with open(result_file) as file:
+            result = json.load(file)
+    server.shutdown()
+
+    summary = {
+        "target": target,
+        "requests": server.request_count,
+        "statuses": dict(sorted(server.status_counts.items())),
+        "peak_rss_mb": result["peak_rss_mb"],
+    }
+    if "screened" in result:
+        screened = result["screened"]
+        latencies = [at - server.listed_at[address] for address, at in screened.items()
+                     if server.listed_at.get(address)]
+        summary["listings_per_sec"] = len(screened) / result["elapsed"]
+        summary["latency_p50"] = percentile(latencies, 0.5)
+        summary["latency_p95"] = percentile(latencies, 0.95)
+        summary["requests_per_coin"] = server.request_count / len(screened) if screened else None
+    else:
+        summary["refreshes_per_sec"] = result["refreshes"] / result["elapsed"]
+        summary["requests_per_coin"] = (server.request_count / result["refreshes"]
+                                        if result["refreshes"] else None)
+    return summary
+
+
+def format_number(value, spec):
+    if value is None:
+        return "-".rjust(int(spec.split(".")[0]))
+    return format(value, spec)
+
+
+def print_report(summaries):
+    print(f"{'target':<16} {'listings/s':>10} {'p50 s':>7} {'p95 s':>7} {'refresh/s':>9} "
+          f"{'req/coin':>8} {'requests':>8} {'RSS MB':>7}  statuses")
+    for summary in summaries:
+        print(f"{summary['target']:<16} "
+              f"{format_number(summary.get('listings_per_sec'), '10.2f')} "
+              f"{format_number(summary.get('latency_p50'), '7.2f')} "
+              f"{format_number(summary.get('latency_p95'), '7.2f')} "
+              f"{format_number(summary.get('refreshes_per_sec'), '9.1f')} "
+              f"{format_number(summary.get('requests_per_coin'), '8.3f')} "
+              f"{summary['requests']:>8} {summary['peak_rss_mb']:7.1f}  {summary['statuses']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against a local fake API.")
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    parser.add_argument("--synthetic", type=int, default=0, help="generated coins added to the fixtures")
+    parser.add_argument("--watchlist", type=int, default=WATCHLIST_SIZE)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--listing-rate", type=float, default=1.0)
+    parser.add_argument("--rate-limit", type=float, help="override both upstream rate limits (requests/s)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--child", choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument("child_files", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.duration, *args.child_files)
+        sys.exit(0)
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = [target for target in targets if target not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+
+    fixture_dirs = [os.path.join(REPO_DIR, directory) for directory in DEFAULT_FIXTURE_DIRS]
+    summaries = [run_target(target, args, fixture_dirs) for target in targets]
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print_report(summaries)
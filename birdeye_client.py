@@ -0,0 +1,57 @@
+'''
+Birdeye new-listing client shared by the discovery scripts.
+'''
+
+import os
+import requests
+from dotenv import load_dotenv
+from rate_limiter import get_limiter, limited_get, limited_get_json_async
+from serialization import loads
+
+load_dotenv()
+
+BIRDEYE_API_KEY = os.getenv("BIRDEYE_API_KEY")
+
+# Override to point the clients at a local fake server
+BIRDEYE_BASE_URL = os.getenv("BIRDEYE_BASE_URL", "https://public-api.birdeye.so")
+
+NEW_LISTING_LIMIT = 5
+
+# Shared by every Birdeye request in the process
+limiter = get_limiter("birdeye")
+
+
+def new_listing_url(limit=NEW_LISTING_LIMIT, time_to=None):
+    """Build the new listing endpoint URL; `time_to` (unix seconds) pages back in time."""
+    url = f"{BIRDEYE_BASE_URL}/defi/v2/tokens/new_listing?limit={limit}&meme_platform_enabled=false"
+    if time_to is not None:
+        url += f"&time_to={int(time_to)}"
+    return url
+
+
+def new_listing_headers():
+    """Headers required by the Birdeye API."""
+    return {
+        "accept": "application/json",
+        "x-chain": "solana",
+        "X-API-KEY": f"{BIRDEYE_API_KEY}"
+    }
+
+
+def listing_items(data):
+    """Extract the list of listing items from a new listing response."""
+    return (data or {}).get("data", {}).get("items", []) or []
+
+
+def fetch_new_listings(limit=NEW_LISTING_LIMIT, session=None, time_to=None):
+    """Fetch the newest listings (listed at or before `time_to`, if given) from Birdeye."""
+    http = session or requests
+    response = limited_get(limiter, http, new_listing_url(limit, time_to), headers=new_listing_headers())
+    response.raise_for_status()
+    return listing_items(loads(response.content))
+
+
+async def fetch_new_listings_async(session, limit=NEW_LISTING_LIMIT, time_to=None):
+    """Async variant of fetch_new_listings using an aiohttp session."""
+    data = await limited_get_json_async(limiter, session, new_listing_url(limit, time_to), headers=new_listing_headers())
+    return listing_items(data)
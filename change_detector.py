@@ -0,0 +1,71 @@
+'''
+Per-address change detection for snapshot rows.
+
+Keeps a fingerprint of the tracked fields of the last snapshot written for each
+address, so unchanged API responses can be skipped instead of written (and
+emitted) again. Counters show how much work was suppressed.
+
+After a restart the fingerprints are seeded from the stored history, which
+reads the disk; code on the event loop calls `seed` in an executor first.
+'''
+
+from snapshot_store import FIELDS
+
+# Every snapshot field except the refresh timestamp itself
+TRACKED_FIELDS = tuple(field for field, _ in FIELDS if field != "ts")
+
+
+def fingerprint(snapshot, fields=TRACKED_FIELDS):
+    """Hashable fingerprint of the tracked fields of a PairSnapshot (NaN compares equal to NaN)."""
+    values = (getattr(snapshot, field) for field in fields)
+    return hash(tuple(None if value != value else value for value in values))
+
+
+class ChangeDetector:
+    """Remembers the last fingerprint per address and counts suppressed writes."""
+
+    def __init__(self, fields=TRACKED_FIELDS, load_last=None):
+        self.fields = fields
+        # Optional callback(address) -> last stored PairSnapshot, used to seed after a restart
+        self.load_last = load_last
+        self.fingerprints = {}
+        self.seeded = set()
+        self.written = 0
+        self.suppressed = 0
+
+    def seed(self, addresses):
+        """Load the fingerprint of the last stored snapshot of each address not seeded yet."""
+        for address in addresses:
+            if address in self.seeded:
+                continue
+            if address not in self.fingerprints and self.load_last:
+                last = self.load_last(address)
+                if last is not None:
+                    self.fingerprints[address] = fingerprint(last, self.fields)
+            self.seeded.add(address)
+
+    def changed(self, address, snapshot):
+        """Return True (and remember the snapshot) if it differs from the last one seen."""
+        if address not in self.seeded:
+            self.seed([address])
+
+        current = fingerprint(snapshot, self.fields)
+        if self.fingerprints.get(address) == current:
+            self.suppressed += 1
+            return False
+        self.fingerprints[address] = current
+        self.written += 1
+        return True
+
+    def forget(self, address):
+        """Drop the fingerprint of an address that is no longer watched."""
+        self.fingerprints.pop(address, None)
+        self.seeded.discard(address)
+
+    def stats(self):
+        total = self.written + self.suppressed
+        return {
+            "written": self.written,
+            "suppressed": self.suppressed,
+            "suppressed_ratio": self.suppressed / total if total else 0.0,
+        }
@@ -1,5 +1,7 @@
 import requests
-import json
+from payload_archive import PayloadArchive
+from rate_limiter import get_limiter, limited_get
+from serialization import loads, slim_pairs
 
 # Enter the pair address or token symbol
 pair_address = "EUw2nosmegAyUkWmeAqWoboJt5cf3cxUhMKLnyqh3gY8"  # Replace with actual pair address or token symbol
@@ -7,27 +9,28 @@ pair_address = "EUw2nosmegAyUkWmeAqWoboJt5cf3cxUhMKLnyqh3gY8"  # Replace with ac
 # API Endpoint
 url = f"https://api.dexscreener.com/latest/dex/search?q={pair_address}"
 
-# Output JSON file name
-json_file = f"./coin_data/{pair_address}.json"
+# Output archive (see payload_archive.py)
+archive_dir = "./coin_data/archive"
 
 try:
     # Fetch data from the API
-    response = requests.get(url)
+    response = limited_get(get_limiter("dexscreener"), requests, url)
     response.raise_for_status()  # Raise an error for bad status codes
-    data = response.json()
+    data = loads(response.content)
 
     # Check if 'pairs' key exists
     if 'pairs' not in data or len(data['pairs']) == 0:
         print("No data found for the given address.")
     else:
-        # Extract the relevant data (pairs only)
-        pairs_data = data
+        # Extract the relevant data (pairs only, the fields the scrapers read)
+        pairs_data = {"schemaVersion": data.get("schemaVersion"), "pairs": slim_pairs(data["pairs"])}
 
-        # Save to JSON file
-        with open(json_file, 'w') as file:
-            json.dump(pairs_data, file, indent=4)
+        # Append to the archive
+        archive = PayloadArchive(archive_dir)
+        archive.append(pair_address, pairs_data)
+        archive.close()
 
-        print(f"Data saved to {json_file}.")
+        print(f"Data saved to {archive_dir}.")
 
 except requests.exceptions.RequestException as e:
     print("API request failed:", e)
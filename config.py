@@ -0,0 +1,11 @@
+'''
+Settings shared by several scripts, kept free of side effects so any of them
+(and the daemon) can import it.
+'''
+
+# Pair addresses added by hand; screened like new listings (see daemon.py, test_new_pair_manual.py)
+MANUAL_PAIRS = [
+    "Fikoi5epMDNz848rQUbKVwRWTt9ubwroweSNbafAJLMD",
+    "sp6DKKYq1MDXJi45QfbJyqvKwVxrNghTtZ9vH49pump",
+    "6rgQRypjqs2rsrbuZ2AcQheV7r2MmtJwHNDsgMd7pump"
+]
@@ -0,0 +1,62 @@
+'''
+Shared pytest fixtures. Living at the top of the repository, this file also
+lets the tests under tests/ import the top-level modules.
+'''
+
+import importlib
+import sys
+
+import pytest
+
+import fake_server
+from write_behind import get_writer
+
+# A manual script, not a test: importing it writes a CSV and starts no checks.
+collect_ignore = ["test_new_pair_manual.py"]
+
+
+class FakeClock:
+    """A monotonic clock the test moves by hand."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_api():
+    """
+    Start a fake_server with 20 synthetic coins; yields a function that
+    (re)configures its faults and returns (server, base_url).
+    """
+    server, base_url = fake_server.start_server(fixture_dirs=[], synthetic=20, listing_rate=0)
+
+    def configure(**faults):
+        fake_server.configure_server(server, server.fixtures, listing_rate=0, **faults)
+        return server, base_url
+
+    yield configure
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def new_pair_fetch(tmp_path, monkeypatch):
+    """new_pair_fetch imported afresh inside tmp_path, so its state files land there."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "new_pair_fetch", raising=False)
+    module = importlib.import_module("new_pair_fetch")
+    yield module
+    get_writer().flush()  # state changes are written behind
+    module.store.close()
+    module.payload_archive.close()
@@ -0,0 +1,137 @@
+'''
+Single long-running entry point for discovery, retries, manual pairs and live refresh.
+
+All stages run on one event loop, share one keep-alive connection pool and
+one in-memory copy of the discovery state (new_pair_fetch's sets), instead
+of five separate processes each with their own connections and sets.
+
+    python daemon.py                          # every stage
+    python daemon.py --stages discovery,live  # a subset
+    python daemon.py --events-port 8780       # also stream events over SSE
+    python daemon.py --metrics-port 9108      # and expose Prometheus metrics
+
+Stage modules are imported lazily, so only the enabled stages pay for their
+imports and state loading at startup.
+'''
+
+import argparse
+import asyncio
+import time
+
+STAGES = ("discovery", "manual", "live")
+
+MANUAL_INTERVAL = 10  # seconds between manual pair sweeps
+
+
+class DaemonContext:
+    """Resources shared by every stage."""
+
+    def __init__(self, session):
+        self.session = session
+        self.pipeline = None
+
+    def discovery_pipeline(self):
+        """The lookup -> filter -> persist pipeline, created on first use."""
+        if self.pipeline is None:
+            from discovery_pipeline import DiscoveryPipeline
+
+            self.pipeline = DiscoveryPipeline(self.session)
+        return self.pipeline
+
+
+async def discovery_stage(context):
+    """Listing polls and backed-off no-data retries."""
+    await asyncio.gather(*context.discovery_pipeline().producers())
+
+
+async def manual_stage(context, manual_pairs=None):
+    """
+    Feed manually added pairs through the same lookup and socials screen.
+
+    Each pair is looked up once; after that, pairs with no data or no socials
+    yet are retried by the no-data retry sweep, with its backoff and TTL. The
+    sweep also runs here, for when the discovery stage is not enabled; due
+    retries are handed out once, so running it from both stages is harmless.
+    """
+    import new_pair_fetch
+
+    if manual_pairs is None:
+        from config import MANUAL_PAIRS as manual_pairs
+
+    pipeline = context.discovery_pipeline()
+    while True:
+        for pair_address in manual_pairs:
+            if pair_address in new_pair_fetch.processed_pairs or pair_address in new_pair_fetch.manual_pairs:
+                continue
+            new_pair_fetch.manual_pairs.add(pair_address)
+            await pipeline.enqueue(pair_address)
+        await pipeline.retry_no_data_pairs()
+        await asyncio.sleep(MANUAL_INTERVAL)
+
+
+async def live_stage(context):
+    """Refresh snapshots of every coin with socials, straight from the in-memory set."""
+    import live_json_data
+    import new_pair_fetch
+
+    await live_json_data.run_live_refresh(
+        context.session,
+        load_addresses=lambda: sorted(new_pair_fetch.coins_with_socials),
+    )
+
+
+STAGE_RUNNERS = {
+    "discovery": discovery_stage,
+    "manual": manual_stage,
+    "live": live_stage,
+}
+
+
+async def run_daemon(stages=STAGES, events_port=None, events_socket=None, metrics_port=None):
+    """Run the selected stages (and optionally the event and metrics endpoints) until cancelled."""
+    from http_pool import create_session
+
+    started = time.perf_counter()
+    events = None
+    if events_port or events_socket:
+        from event_bus import serve_events
+
+        events = await serve_events(port=events_port, unix_socket=events_socket)
+    metrics = None
+    if metrics_port:
+        from metrics import serve_metrics
+
+        metrics = await serve_metrics(port=metrics_port)
+    async with create_session() as session:
+        context = DaemonContext(session)
+        tasks = [STAGE_RUNNERS[stage](context) for stage in stages]
+        # Discovery and manual pairs share the pipeline's queue consumers
+        if {"discovery", "manual"} & set(stages):
+            tasks += context.discovery_pipeline().workers()
+        print(f"Daemon running stages: {', '.join(stages)} (startup {time.perf_counter() - started:.2f}s)")
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for runner in (events, metrics):
+                if runner:
+                    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scrapers as one daemon.")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("--events-port", type=int, help="serve the event stream on this local port")
+    parser.add_argument("--events-socket", help="serve the event stream on this Unix socket")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGE_RUNNERS]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    try:
+        asyncio.run(run_daemon(stages, args.events_port, args.events_socket, args.metrics_port))
+    except KeyboardInterrupt:
+        print("Daemon stopped.")
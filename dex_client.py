@@ -0,0 +1,149 @@
+'''
+Batched Dex Screener token lookups.
+
+Instead of one free-text search request per address, addresses are grouped
+into comma-separated calls to the tokens endpoint (up to TOKENS_BATCH_LIMIT
+per request) and the response is split back out per address.
+'''
+
+import asyncio
+import os
+import requests
+from rate_limiter import get_limiter, limited_get, limited_get_json_async
+from response_cache import get_cache
+from serialization import loads, slim_pairs
+
+# Override to point the clients at a local fake server (see fake_server.py)
+DEX_SCREENER_BASE_URL = os.getenv("DEX_SCREENER_BASE_URL", "https://api.dexscreener.com")
+
+# Dex Screener accepts up to 30 comma-separated token addresses per call
+TOKENS_BATCH_LIMIT = 30
+
+SCHEMA_VERSION = "1.0.0"
+
+# Shared by every Dex Screener request in the process
+limiter = get_limiter("dexscreener")
+cache = get_cache("tokens")
+
+
+def chunked(addresses, size=TOKENS_BATCH_LIMIT):
+    """Yield successive lists of at most `size` unique addresses, keeping order."""
+    batch = []
+    seen = set()
+    for address in addresses:
+        if not address or address in seen:
+            continue
+        seen.add(address)
+        batch.append(address)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def tokens_url(addresses):
+    """Build the tokens endpoint URL for a batch of addresses."""
+    return f"{DEX_SCREENER_BASE_URL}/latest/dex/tokens/{','.join(addresses)}"
+
+
+def pair_matches(pair, address):
+    """Return True if a pair belongs to the given token (or pair) address."""
+    return address in (
+        pair.get("baseToken", {}).get("address"),
+        pair.get("quoteToken", {}).get("address"),
+        pair.get("pairAddress"),
+    )
+
+
+def split_pairs_by_address(addresses, data):
+    """
+    Split a batched response into one search-shaped payload per address.
+
+    Every requested address gets an entry; addresses the provider knows
+    nothing about get an empty `pairs` list, which the callers treat as
+    "no data" exactly like an empty search result.
+    """
+    pairs = slim_pairs((data or {}).get("pairs") or [])
+    schema_version = (data or {}).get("schemaVersion", SCHEMA_VERSION)
+    return {
+        address: {
+            "schemaVersion": schema_version,
+            "pairs": [pair for pair in pairs if pair_matches(pair, address)],
+        }
+        for address in addresses
+    }
+
+
+def has_pairs(data):
+    """Return True if a per-address payload contains any pair data."""
+    return bool(data and data.get("pairs"))
+
+
+def fetch_tokens_batch(addresses, session=None):
+    """Fetch one batch of addresses in a single request and split the result."""
+    http = session or requests
+    response = limited_get(limiter, http, tokens_url(addresses))
+    response.raise_for_status()
+    return split_pairs_by_address(addresses, loads(response.content))
+
+
+def request_tokens(addresses, session=None):
+    """Uncached batched lookup of any number of addresses (see fetch_tokens)."""
+    results = {}
+    for batch in chunked(addresses):
+        try:
+            results.update(fetch_tokens_batch(batch, session))
+        except requests.exceptions.RequestException as e:
+            print(f"Batched lookup failed for {len(batch)} addresses:", e)
+    return results
+
+
+async def fetch_tokens_batch_async(session, addresses):
+    """Async variant of fetch_tokens_batch using an aiohttp session."""
+    data = await limited_get_json_async(limiter, session, tokens_url(addresses))
+    return split_pairs_by_address(addresses, data)
+
+
+async def request_tokens_async(session, addresses):
+    """Uncached async batched lookup; batches are requested concurrently."""
+    batches = list(chunked(addresses))
+    responses = await asyncio.gather(
+        *(fetch_tokens_batch_async(session, batch) for batch in batches),
+        return_exceptions=True,
+    )
+    results = {}
+    for batch, response in zip(batches, responses):
+        if isinstance(response, Exception):
+            print(f"Batched lookup failed for {len(batch)} addresses:", response)
+            continue
+        results.update(response)
+    return results
+
+
+def fetch_tokens(addresses, session=None):
+    """
+    Look up any number of addresses using as few requests as possible.
+
+    Fresh responses come from the cache. Returns a dict of address -> payload;
+    a batch whose request fails is left out of the result, so callers can
+    treat missing addresses as failures.
+    """
+    addresses = list(dict.fromkeys(address for address in addresses if address))
+    return cache.get_many(addresses, lambda missing: request_tokens(missing, session))
+
+
+async def fetch_tokens_async(session, addresses, fresh=False):
+    """
+    Async variant of fetch_tokens; concurrent lookups of the same address share one request.
+
+    With `fresh` (the live refresh) the cache is bypassed but still updated,
+    so a refresh never records a cached, already-seen response.
+    """
+    addresses = list(dict.fromkeys(address for address in addresses if address))
+    if fresh:
+        results = await request_tokens_async(session, addresses)
+        for address, data in results.items():
+            cache.put(address, data)
+        return results
+    return await cache.get_many_async(addresses, lambda missing: request_tokens_async(session, missing))
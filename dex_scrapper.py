@@ -3,91 +3,93 @@ import json
 import os
 import time
 import schedule
-from dotenv import load_dotenv
+from birdeye_client import fetch_new_listings
+from dex_client import fetch_tokens, has_pairs
+from membership_index import MembershipSet
+from payload_archive import PayloadArchive
+from resilience import within_deadline
+from write_behind import get_writer
 
-load_dotenv()
+# Seconds between polls; also the deadline for all the requests of one poll
+POLL_INTERVAL = 5
 
-BIRDEYE_API_KEY = os.getenv("BIRDEYE_API_KEY")
-
-# File to store processed pairs
+# File to store processed pairs (the legacy JSON file is migrated once, then renamed
+# so nothing keeps reading a list that is no longer updated)
 PROCESSED_PAIRS_FILE = "processed_pairs.json"
+PROCESSED_PAIRS_INDEX = "processed_pairs.idx"
+
+# Raw lookup results of the coins found, packed into segment files
+payload_archive = PayloadArchive("./coin_data/archive")
 
-# Load processed pairs
-if os.path.exists(PROCESSED_PAIRS_FILE):
-    with open(PROCESSED_PAIRS_FILE, "r") as file:
-        try:
-            processed_pairs = set(json.load(file))
-        except json.JSONDecodeError:
-            processed_pairs = set()
-else:
-    processed_pairs = set()
+# Load processed pairs: map the index, or build it from the legacy JSON file
+processed_pairs = MembershipSet.open(PROCESSED_PAIRS_INDEX)
+if processed_pairs is None:
+    processed_pairs = MembershipSet()
+    if os.path.exists(PROCESSED_PAIRS_FILE):
+        with open(PROCESSED_PAIRS_FILE, "r") as file:
+            try:
+                processed_pairs.update(json.load(file))
+            except json.JSONDecodeError:
+                pass
+        processed_pairs.save(PROCESSED_PAIRS_INDEX)
+        os.replace(PROCESSED_PAIRS_FILE, f"{PROCESSED_PAIRS_FILE}.migrated")
 
 no_data_pairs = set()
 
 def save_processed_pairs():
-    """Save processed pairs to a file."""
-    with open(PROCESSED_PAIRS_FILE, "w") as file:
-        json.dump(list(processed_pairs), file, indent=4)
-
-def fetch_pair_data(pair_address):
-    """Fetch data for a given pair from Dex Screener API."""
-    # time.sleep(20)
+    """Save the newly processed pairs to the index (appended to its journal)."""
+    processed_pairs.save_changes(PROCESSED_PAIRS_INDEX)
 
+def save_pair_data(pair_address, data):
+    """Save the lookup result for a given pair, or mark it as having no data."""
+    if not has_pairs(data):
+        print(f"No data found for {pair_address}")
+        no_data_pairs.add(pair_address)  # Mark it as "no data"
+        return False
+    
+    # If data is found, remove it from no_data_pairs
     if pair_address in no_data_pairs:
-        return False  # Skip already marked addresses
+        no_data_pairs.remove(pair_address) 
 
-    url = f"https://api.dexscreener.com/latest/dex/search?q={pair_address}"
-    json_file = f"./coin_data/{pair_address}.json"
+    get_writer().append_payload(payload_archive, pair_address, data)
     
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+    print(f"New coin found! Data saved to {payload_archive.root}.")
+    return True
 
-        if 'pairs' not in data or not data['pairs']:
-            print(f"No data found for {pair_address}")
-            no_data_pairs.add(pair_address)  # Mark it as "no data"
-            return False
-        
-        # If data is found, remove it from no_data_pairs
-        if pair_address in no_data_pairs:
-            no_data_pairs.remove(pair_address) 
+def fetch_pairs_data(pair_addresses):
+    """Fetch data for several pairs from Dex Screener API with batched requests."""
+    # Skip already marked addresses
+    pair_addresses = [address for address in pair_addresses if address not in no_data_pairs]
+    results = fetch_tokens(pair_addresses)
+    return {
+        pair_address: save_pair_data(pair_address, results[pair_address])
+        for pair_address in pair_addresses
+        if pair_address in results
+    }
 
-        with open(json_file, 'w') as file:
-            json.dump(data, file, indent=4)
-        
-        print(f"New coin found! Data saved to {json_file}.")
-        return True
-    except requests.exceptions.RequestException as e:
-        print(f"API request failed for {pair_address}:", e)
-        return False
+def fetch_pair_data(pair_address):
+    """Fetch data for a given pair from Dex Screener API."""
+    return fetch_pairs_data([pair_address]).get(pair_address, False)
 
+@within_deadline(POLL_INTERVAL)
 def fetch_new_pairs():
     """Fetch new pairs from BirdEye API and process them."""
-    new_pairs_url = "https://public-api.birdeye.so/defi/v2/tokens/new_listing?limit=5&meme_platform_enabled=false"
-    headers = {
-        "accept": "application/json",
-        "x-chain": "solana",
-        "X-API-KEY": BIRDEYE_API_KEY
-    }
-    
     try:
-        response = requests.get(new_pairs_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        items = data.get("data", {}).get("items", [])
+        items = fetch_new_listings()
         
         if not items:
             return
         
         new_pairs_found = False
-        
+        new_addresses = []
         for item in items:
             pair_address = item.get("address")
             if not pair_address or pair_address in processed_pairs or pair_address in no_data_pairs:
                 continue
-            
-            if fetch_pair_data(pair_address):
+            new_addresses.append(pair_address)
+        
+        for pair_address, found in fetch_pairs_data(new_addresses).items():
+            if found:
                 processed_pairs.add(pair_address)
                 new_pairs_found = True
         
@@ -99,7 +101,7 @@ def fetch_new_pairs():
     except Exception as e:
         print("An error occurred while fetching new pairs:", e)
 
-schedule.every(5).seconds.do(fetch_new_pairs)
+schedule.every(POLL_INTERVAL).seconds.do(fetch_new_pairs)
 
 if __name__ == "__main__":
     while True:
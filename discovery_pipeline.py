@@ -0,0 +1,201 @@
+'''
+Asyncio discovery pipeline for new Solana pairs.
+
+Stages run concurrently and talk through bounded queues:
+
+    listing poll / no-data retry -> lookup queue -> social filter -> persist
+
+Polls are started on a timer (adapted to the listing rate, see
+listing_ingester.py), so a slow Birdeye or Dex Screener response no longer
+delays the next poll, and lookups for new listings are batched and screened
+in parallel over one pooled aiohttp session.
+'''
+
+import asyncio
+import time
+
+import new_pair_fetch
+from dex_client import TOKENS_BATCH_LIMIT, fetch_tokens_async
+from event_bus import publish
+from http_pool import create_session
+from listing_ingester import listing_time
+from filter_engine import get_filter
+from metrics import cycle_overruns, queue_depth, stage_failures, stage_seconds
+from resilience import deadline
+from write_behind import get_writer
+
+RETRY_INTERVAL = 5         # seconds between no-data retry sweeps
+MAX_CONCURRENT_POLLS = 2   # overlapping polls allowed when a poll is slow
+MAX_CONCURRENT_LOOKUPS = 4 # batched Dex Screener requests in flight
+QUEUE_SIZE = 1000
+POLL_DEADLINE = 10         # seconds a listing poll (with all its pages) may take
+LOOKUP_DEADLINE = 10       # seconds a batched lookup may take
+
+
+class DiscoveryPipeline:
+    """Producer/consumer pipeline: poll -> lookup -> filter -> persist."""
+
+    def __init__(self, session, max_concurrent_lookups=MAX_CONCURRENT_LOOKUPS):
+        self.session = session
+        self.lookup_queue = asyncio.Queue(QUEUE_SIZE)
+        self.filter_queue = asyncio.Queue(QUEUE_SIZE)
+        self.persist_queue = asyncio.Queue(QUEUE_SIZE)
+        self.lookup_slots = asyncio.Semaphore(max_concurrent_lookups)
+        self.poll_slots = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+        self.max_concurrent_lookups = max_concurrent_lookups
+        # Addresses queued or in flight, so a poll and a retry never look up the same one twice
+        self.pending = set()
+        queue_depth.set_function(self.lookup_queue.qsize, queue="lookup")
+        queue_depth.set_function(self.filter_queue.qsize, queue="filter")
+        queue_depth.set_function(self.persist_queue.qsize, queue="persist")
+        queue_depth.set_function(lambda: len(self.pending), queue="pending")
+        # Compile the filter now, so a bad filters.json fails at startup and not in a worker
+        get_filter()
+
+    async def enqueue(self, pair_address):
+        """Queue an address for lookup unless it is already known or in flight."""
+        if pair_address in self.pending:
+            return False
+        self.pending.add(pair_address)
+        await self.lookup_queue.put(pair_address)
+        return True
+
+    async def poll_listings(self):
+        """Fetch every listing since the last poll and queue the unseen addresses."""
+        async with self.poll_slots:
+            try:
+                with stage_seconds.time(stage="poll"), deadline(POLL_DEADLINE):
+                    items = await new_pair_fetch.listing_ingester.poll_async(self.session)
+            except Exception as e:
+                print("API request for new pairs failed:", e)
+                return
+            for item in items or []:
+                pair_address = item.get("address")
+                if pair_address:
+                    publish("listing", address=pair_address, listed_at=listing_time(item))
+                if (not pair_address or pair_address in new_pair_fetch.processed_pairs
+                        or pair_address in new_pair_fetch.no_data_pairs):
+                    continue
+                await self.enqueue(pair_address)
+
+    async def retry_no_data_pairs(self):
+        """Queue the no-data addresses whose backed-off retry is due."""
+        for pair_address in new_pair_fetch.due_no_data_pairs(block=False):
+            await self.enqueue(pair_address)
+
+    async def run_every(self, interval, job):
+        """Start `job` on a fixed-rate timer without waiting for the previous run."""
+        tasks = set()
+        next_run = time.monotonic()
+        while True:
+            if tasks:
+                cycle_overruns.inc(job=job.__name__)
+            task = asyncio.create_task(job())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_run += interval
+            await asyncio.sleep(max(0, next_run - time.monotonic()))
+
+    async def run_adaptive(self, job, next_interval):
+        """Like run_every, but asks `next_interval()` for the delay before each next run."""
+        tasks = set()
+        while True:
+            if tasks:
+                cycle_overruns.inc(job=job.__name__)
+            task = asyncio.create_task(job())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            await asyncio.sleep(next_interval())
+
+    async def next_batch(self):
+        """Wait for one address, then take whatever else is queued up to the batch limit."""
+        batch = [await self.lookup_queue.get()]
+        while len(batch) < TOKENS_BATCH_LIMIT and not self.lookup_queue.empty():
+            batch.append(self.lookup_queue.get_nowait())
+        return batch
+
+    async def lookup_worker(self):
+        """Consume the lookup queue with batched Dex Screener requests."""
+        while True:
+            batch = await self.next_batch()
+            async with self.lookup_slots:
+                with stage_seconds.time(stage="lookup"), deadline(LOOKUP_DEADLINE):
+                    results = await fetch_tokens_async(self.session, batch)
+            for pair_address in batch:
+                if pair_address in results:
+                    await self.filter_queue.put((pair_address, results[pair_address]))
+                else:
+                    # The request failed. The listing poll has already moved its mark past
+                    # the address, so hand it to the backed-off retries instead of dropping it.
+                    new_pair_fetch.retry_scheduler.add(pair_address)
+                    self.pending.discard(pair_address)
+            for _ in batch:
+                self.lookup_queue.task_done()
+
+    async def filter_worker(self):
+        """Screen whatever lookup results are queued as one vectorized batch."""
+        while True:
+            batch = [await self.filter_queue.get()]
+            while not self.filter_queue.empty():
+                batch.append(self.filter_queue.get_nowait())
+            results = dict(batch)
+            queued = set()
+            try:
+                with stage_seconds.time(stage="filter"):
+                    statuses = new_pair_fetch.screen_pairs_data(results)
+                for pair_address, data in results.items():
+                    await self.persist_queue.put((pair_address, statuses[pair_address], data))
+                    queued.add(pair_address)
+            except Exception as e:
+                print(f"Screening failed for {len(results)} pairs:", e)
+                stage_failures.inc(stage="filter")
+                # Look the unscreened ones up again later, like a failed lookup
+                for pair_address in results.keys() - queued:
+                    new_pair_fetch.retry_scheduler.add(pair_address)
+                    self.pending.discard(pair_address)
+            finally:
+                for _ in batch:
+                    self.filter_queue.task_done()
+
+    async def persist_worker(self):
+        """Record screened results; a single writer keeps the state sets consistent."""
+        while True:
+            pair_address, status, data = await self.persist_queue.get()
+            try:
+                # A stalled disk holds up this worker only, not the event loop
+                await get_writer().wait_for_room()
+                with stage_seconds.time(stage="persist"):
+                    new_pair_fetch.record_pair_status(pair_address, status, data, block=False)
+            except Exception as e:
+                print(f"Saving data failed for {pair_address}:", e)
+                stage_failures.inc(stage="persist")
+            finally:
+                self.pending.discard(pair_address)
+                self.persist_queue.task_done()
+
+    def producers(self):
+        """Coroutines that feed the lookup queue (listing polls and no-data retries)."""
+        return [
+            self.run_adaptive(self.poll_listings, new_pair_fetch.listing_ingester.next_interval),
+            self.run_every(RETRY_INTERVAL, self.retry_no_data_pairs),
+        ]
+
+    def workers(self):
+        """Coroutines that drain the queues (lookup, filter, persist)."""
+        workers = [self.filter_worker(), self.persist_worker()]
+        workers += [self.lookup_worker() for _ in range(self.max_concurrent_lookups)]
+        return workers
+
+    async def run(self):
+        """Run all stages until cancelled."""
+        await asyncio.gather(*self.producers(), *self.workers())
+
+
+async def run_pipeline():
+    """Run the discovery pipeline with a shared pooled session."""
+    async with create_session() as session:
+        await DiscoveryPipeline(session).run()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_pipeline())
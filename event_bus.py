@@ -0,0 +1,167 @@
+'''
+In-process pub/sub bus for discovery and snapshot events, with an SSE endpoint.
+
+Stages publish compact events as they happen:
+
+    listing   a new listing was ingested            {"address", "listed_at"}
+    socials   a new pair passed the socials check   {"address"}
+    snapshot  a watchlist coin's data changed       {"address", "ts", price, liquidity, ...}
+    alert     a rolling-window alert rule fired     {"rule", "address", "ts", "value", "baseline", ...}
+
+Every subscriber gets its own bounded queue. Publishing never blocks: when a
+slow subscriber's queue is full its oldest event is dropped (and counted), so
+one stuck consumer cannot stall the scrapers or the other subscribers.
+
+Consumers outside the process connect to the Server-Sent Events endpoint,
+over TCP or a Unix socket:
+
+    curl -N http://127.0.0.1:8780/events?topics=socials,snapshot
+    curl -N --unix-socket /tmp/dex-events.sock http://localhost/events
+'''
+
+import asyncio
+import json
+import math
+import time
+
+TOPICS = ("listing", "socials", "snapshot", "alert")
+SUBSCRIBER_QUEUE_SIZE = 1000
+KEEPALIVE_INTERVAL = 15  # seconds between SSE comments on an idle stream
+EVENTS_HOST = "127.0.0.1"
+EVENTS_PORT = 8780
+
+# Snapshot fields included in "snapshot" events
+SNAPSHOT_EVENT_FIELDS = ("price_usd", "liquidity_usd", "fdv", "market_cap",
+                         "volume_m5", "buys_m5", "sells_m5")
+
+
+class Subscription:
+    """One subscriber's bounded queue of encoded events."""
+
+    def __init__(self, bus, topics, maxsize):
+        self.bus = bus
+        self.topics = set(topics)
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()  # drop the oldest event rather than block the publisher
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = []
+        self.published = {topic: 0 for topic in TOPICS}
+
+    def subscribe(self, topics=TOPICS, maxsize=None):
+        subscription = Subscription(self, topics, maxsize or self.queue_size)
+        self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+    def publish(self, topic, **fields):
+        """Send an event to every subscriber of `topic`; cheap when nobody listens."""
+        self.published[topic] = self.published.get(topic, 0) + 1
+        if not self.subscribers:
+            return
+        event = encode_event(topic, fields)
+        for subscription in self.subscribers:
+            if topic in subscription.topics:
+                subscription.offer(event)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": dict(self.published),
+            "dropped": sum(subscription.dropped for subscription in self.subscribers),
+        }
+
+
+def encode_event(topic, fields):
+    """Compact JSON line for an event (NaN becomes null)."""
+    event = {"topic": topic, "time": int(time.time() * 1000)}
+    for key, value in fields.items():
+        event[key] = None if isinstance(value, float) and math.isnan(value) else value
+    return json.dumps(event, separators=(",", ":"))
+
+
+def snapshot_fields(snapshot):
+    """The fields of a PairSnapshot carried by a "snapshot" event."""
+    fields = {"ts": snapshot.ts}
+    fields.update((field, getattr(snapshot, field)) for field in SNAPSHOT_EVENT_FIELDS)
+    return fields
+
+
+bus = EventBus()
+
+
+def publish(topic, **fields):
+    """Publish on the process-wide bus."""
+    bus.publish(topic, **fields)
+
+
+async def stream_events(request):
+    """SSE handler: /events[?topics=listing,socials,snapshot]"""
+    from aiohttp import web
+
+    topics = [topic for topic in request.query.get("topics", ",".join(TOPICS)).split(",") if topic]
+    unknown = [topic for topic in topics if topic not in TOPICS]
+    if unknown:
+        raise web.HTTPBadRequest(text=f"unknown topics: {', '.join(unknown)}")
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+    })
+    await response.prepare(request)
+    subscription = bus.subscribe(topics)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                await response.write(b": keepalive\n\n")
+                continue
+            await response.write(f"data: {event}\n\n".encode())
+    except ConnectionResetError:
+        pass  # subscriber went away
+    finally:
+        subscription.close()
+    return response
+
+
+async def event_stats(request):
+    from aiohttp import web
+
+    return web.json_response(bus.stats())
+
+
+async def serve_events(host=EVENTS_HOST, port=EVENTS_PORT, unix_socket=None):
+    """Start the SSE endpoint on the running loop; returns the runner (call `cleanup()` to stop)."""
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get("/events", stream_events)
+    app.router.add_get("/stats", event_stats)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    if unix_socket:
+        site = web.UnixSite(runner, unix_socket)
+    else:
+        site = web.TCPSite(runner, host, port)
+    await site.start()
+    print(f"Event stream on {unix_socket or f'http://{host}:{port}'}/events")
+    return runner
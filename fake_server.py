@@ -0,0 +1,271 @@
+'''
+Local fake Dex Screener / Birdeye server that serves the saved fixtures.
+
+Run it and point the scrapers at it:
+    python fake_server.py --port 8765
+    DEX_SCREENER_BASE_URL=http://127.0.0.1:8765 BIRDEYE_BASE_URL=http://127.0.0.1:8765 python new_pair_fetch.py
+
+Fixtures are the payloads saved under `test_coin_data/` and `coin_data/`
+(archives and legacy `<address>.json` files, or the directories passed with
+--data), plus `--synthetic N` generated coins for load tests. Unknown
+addresses return an empty `pairs` list, just like the real API.
+
+Birdeye's new listing endpoint replays every fixture address as a new
+listing, `--listing-rate` per second from server start. `--latency`,
+`--error-rate` and `--throttle-rate` add response delay, 500s and 429s
+(with Retry-After) to every endpoint. For the resilience checks,
+`--tail-rate` delays that fraction of responses by `--tail-latency`,
+`--hang-rate` holds connections open without ever answering, and
+`--outage START:END` answers 503 between those seconds after start.
+'''
+
+import argparse
+import glob
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from payload_archive import PayloadArchive
+
+DEFAULT_FIXTURE_DIRS = ["./test_coin_data", "./coin_data"]
+
+HANG_SECONDS = 60  # how long a "hung" request holds its connection
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def load_fixtures(dirs=DEFAULT_FIXTURE_DIRS):
+    """Load `<address>.json` fixture files and payload archives into a dict of address -> pairs."""
+    fixtures = {}
+    for directory in dirs:
+        if os.path.isdir(os.path.join(directory, "archive")):
+            archive = PayloadArchive(os.path.join(directory, "archive"), readonly=True)
+            for address, _, data in archive.scan(latest_only=True):
+                fixtures[address] = data.get("pairs") or []
+            archive.close()
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            try:
+                with open(path, "r") as file:
+                    data = json.load(file)
+            except (OSError, json.JSONDecodeError):
+                continue
+            # Skip the state files (plain lists of addresses)
+            if isinstance(data, dict) and "pairs" in data:
+                address = os.path.splitext(os.path.basename(path))[0]
+                fixtures[address] = data.get("pairs") or []
+    return fixtures
+
+
+def random_address(rng):
+    """A Solana-style base58 address for 32 random bytes."""
+    number = int.from_bytes(rng.randbytes(32), "big")
+    chars = []
+    while number:
+        number, remainder = divmod(number, 58)
+        chars.append(BASE58_ALPHABET[remainder])
+    return "".join(reversed(chars)) or "1"
+
+
+def synthetic_pair(rng, address, with_socials):
+    """A Dex Screener pair with random market data, shaped like the real ones."""
+    price = 10 ** rng.uniform(-8, -2)
+    supply = 1_000_000_000
+    txns = {window: {"buys": rng.randint(0, scale), "sells": rng.randint(0, scale)}
+            for window, scale in (("m5", 100), ("h1", 1000), ("h6", 5000), ("h24", 20000))}
+    return {
+        "chainId": "solana",
+        "dexId": "raydium",
+        "pairAddress": random_address(rng),
+        "baseToken": {"address": address, "name": "Synthetic", "symbol": "SYN"},
+        "quoteToken": {"address": "So11111111111111111111111111111111111111112",
+                       "name": "Wrapped SOL", "symbol": "SOL"},
+        "priceUsd": f"{price:.10g}",
+        "txns": txns,
+        "volume": {window: round(rng.uniform(0, scale), 2)
+                   for window, scale in (("m5", 1e4), ("h1", 1e5), ("h6", 5e5), ("h24", 2e6))},
+        "liquidity": {"usd": round(rng.uniform(0, 2e5), 2)},
+        "fdv": round(price * supply),
+        "marketCap": round(price * supply),
+        "pairCreatedAt": int(time.time() * 1000) - rng.randint(0, 86400000),
+        "info": {"socials": [{"type": "twitter", "url": "https://x.com/synthetic"}] if with_socials else []},
+    }
+
+
+def synthetic_fixtures(count, socials_ratio=0.5, no_data_ratio=0.1, seed=0):
+    """Generate `count` coins: some without socials and some with no data at all."""
+    rng = random.Random(seed)
+    fixtures = {}
+    for _ in range(count):
+        address = random_address(rng)
+        if rng.random() < no_data_ratio:
+            fixtures[address] = []
+        else:
+            fixtures[address] = [synthetic_pair(rng, address, rng.random() < socials_ratio)]
+    return fixtures
+
+
+class FakeDexScreenerHandler(BaseHTTPRequestHandler):
+    """
+    Serves `/latest/dex/tokens/<a,b,c>`, `/latest/dex/search?q=<address>`
+    and Birdeye's `/defi/v2/tokens/new_listing?limit=&time_to=`.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        server = self.server
+        fixtures = server.fixtures
+        endpoint = "/latest/dex/tokens" if url.path.startswith("/latest/dex/tokens/") else url.path
+        with server.lock:
+            server.request_count += 1
+            server.path_counts[endpoint] = server.path_counts.get(endpoint, 0) + 1
+
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        if random.random() < server.tail_rate:
+            time.sleep(server.tail_latency)
+        if random.random() < server.hang_rate:
+            # Never answer; the client sees the connection drop only after hang_seconds
+            time.sleep(server.hang_seconds)
+            self.close_connection = True
+            return
+        if server.outage and server.outage[0] <= time.time() - server.started < server.outage[1]:
+            self.send_json({"error": "service unavailable"}, status=503)
+            return
+        roll = random.random()
+        if roll < server.throttle_rate:
+            self.send_json({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+            return
+        if roll < server.throttle_rate + server.error_rate:
+            self.send_json({"error": "internal error"}, status=500)
+            return
+
+        if url.path.startswith("/latest/dex/tokens/"):
+            addresses = unquote(url.path[len("/latest/dex/tokens/"):]).split(",")
+            pairs = [pair for address in addresses for pair in fixtures.get(address, [])]
+            self.send_json({"schemaVersion": "1.0.0", "pairs": pairs})
+        elif url.path == "/latest/dex/search":
+            query = parse_qs(url.query).get("q", [""])[0]
+            self.send_json({"schemaVersion": "1.0.0", "pairs": fixtures.get(query, [])})
+        elif url.path == "/defi/v2/tokens/new_listing":
+            query = parse_qs(url.query)
+            limit = int(query.get("limit", ["20"])[0])
+            time_to = int(query["time_to"][0]) if "time_to" in query else None
+            items = new_listing_items(server, limit, time_to)
+            self.send_json({"success": True, "data": {"items": items}})
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        with self.server.lock:
+            self.server.status_counts[status] = self.server.status_counts.get(status, 0) + 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timeout or a cancelled hedged request)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def new_listing_items(server, limit, time_to=None):
+    """The newest visible listings (at or before `time_to`), newest first."""
+    if not server.listing_rate:
+        return []
+    visible = min(len(server.listing_order), int((time.time() - server.started) * server.listing_rate) + 1)
+    items = []
+    for index in range(visible - 1, -1, -1):
+        address = server.listing_order[index]
+        listed_at = server.listed_at[address]
+        if time_to is not None and int(listed_at) > time_to:
+            continue
+        items.append({
+            "address": address,
+            "symbol": "SYN",
+            "decimals": 6,
+            "source": "raydium",
+            "liquidityAddedAt": datetime.fromtimestamp(int(listed_at), timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        if len(items) >= limit:
+            break
+    return items
+
+
+def configure_server(server, fixtures, latency=0.0, error_rate=0.0, throttle_rate=0.0, listing_rate=1.0,
+                     tail_rate=0.0, tail_latency=0.0, hang_rate=0.0, hang_seconds=HANG_SECONDS, outage=None):
+    """Attach fixtures, fault settings, the listing timeline and counters to a server."""
+    server.fixtures = fixtures
+    server.latency = latency
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.tail_rate = tail_rate
+    server.tail_latency = tail_latency
+    server.hang_rate = hang_rate
+    server.hang_seconds = hang_seconds
+    server.outage = outage  # (start, end) seconds after server start
+    server.listing_rate = listing_rate
+    server.started = time.time()
+    # Every fixture is listed once, in a fixed shuffled order; listed_at is when it becomes visible
+    server.listing_order = sorted(fixtures)
+    random.Random(0).shuffle(server.listing_order)
+    server.listed_at = {
+        address: server.started + index / listing_rate if listing_rate else None
+        for index, address in enumerate(server.listing_order)
+    }
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.path_counts = {}
+    server.status_counts = {}
+    return server
+
+
+def start_server(host="127.0.0.1", port=0, fixture_dirs=DEFAULT_FIXTURE_DIRS, synthetic=0, **options):
+    """
+    Start the fake server in a background thread and return (server, base_url).
+
+    `options` are the fault and listing settings of `configure_server`.
+    """
+    fixtures = load_fixtures(fixture_dirs)
+    fixtures.update(synthetic_fixtures(synthetic))
+    server = ThreadingHTTPServer((host, port), FakeDexScreenerHandler)
+    configure_server(server, fixtures, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Dex Screener / Birdeye server backed by fixtures.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", action="append", help="fixture directory (repeatable)")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of generated coins to add")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--listing-rate", type=float, default=1.0, help="new listings per second")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of responses delayed by --tail-latency")
+    parser.add_argument("--tail-latency", type=float, default=1.0, help="extra delay of slow responses in seconds")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of requests never answered")
+    parser.add_argument("--outage", help="START:END seconds after start during which every request gets a 503")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.data or DEFAULT_FIXTURE_DIRS)
+    fixtures.update(synthetic_fixtures(args.synthetic))
+    server = ThreadingHTTPServer((args.host, args.port), FakeDexScreenerHandler)
+    outage = tuple(float(value) for value in args.outage.split(":")) if args.outage else None
+    configure_server(server, fixtures, args.latency, args.error_rate, args.throttle_rate, args.listing_rate,
+                     args.tail_rate, args.tail_latency, args.hang_rate, outage=outage)
+    print(f"Serving {len(server.fixtures)} fixtures on http://{args.host}:{args.port}")
+    server.serve_forever()
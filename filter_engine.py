@@ -0,0 +1,237 @@
+'''
+Declarative pair filters, compiled into vectorized NumPy predicates.
+
+A filter is a JSON tree of rules loaded from filters.json (or the file named
+by DEX_FILTERS_FILE):
+
+    {"all": [
+        {"field": "has_socials", "op": "==", "value": true},
+        {"field": "liquidity_usd", "op": ">=", "value": 5000},
+        {"field": "dex_id", "op": "in", "value": ["raydium", "pumpswap"]},
+        {"field": "age_seconds", "op": "<", "value": 3600},
+        {"not": {"field": "sells_m5", "op": ">", "value": 200}}
+    ]}
+
+`all`, `any` and `not` nest freely. The tree is compiled once into a
+function over column arrays; screening a batch pulls the referenced fields
+of every pair of every response into one array per field and evaluates the
+whole batch in a single pass. An address passes when any of its pairs does.
+Missing numbers are NaN and fail every comparison.
+'''
+
+import json
+import os
+import time
+
+import numpy as np
+
+from pair_snapshot import WINDOWS, to_number
+
+FILTERS_FILE = os.getenv("DEX_FILTERS_FILE", "./filters.json")
+
+# The rule the scrapers have always applied
+DEFAULT_FILTER = {"all": [{"field": "has_socials", "op": "==", "value": True}]}
+
+
+def pair_value(path):
+    """Getter for a nested pair field, e.g. ("liquidity", "usd")."""
+    def get(pair):
+        value = pair
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return get
+
+
+def info_count(key):
+    return lambda pair: len((pair.get("info") or {}).get(key) or [])
+
+
+# Field -> (kind, getter); numbers become float64 columns, strings object columns
+FIELDS = {
+    "price_usd": ("number", pair_value(("priceUsd",))),
+    "fdv": ("number", pair_value(("fdv",))),
+    "market_cap": ("number", pair_value(("marketCap",))),
+    "liquidity_usd": ("number", pair_value(("liquidity", "usd"))),
+    "pair_created_at": ("number", pair_value(("pairCreatedAt",))),
+    "socials_count": ("number", info_count("socials")),
+    "websites_count": ("number", info_count("websites")),
+    "has_socials": ("bool", info_count("socials")),
+    "has_websites": ("bool", info_count("websites")),
+    "dex_id": ("string", pair_value(("dexId",))),
+    "chain_id": ("string", pair_value(("chainId",))),
+    "quote_symbol": ("string", pair_value(("quoteToken", "symbol"))),
+}
+FIELDS.update({
+    f"{side}_{window}": ("number", pair_value(("txns", window, side)))
+    for window in WINDOWS for side in ("buys", "sells")
+})
+FIELDS.update({f"volume_{window}": ("number", pair_value(("volume", window))) for window in WINDOWS})
+
+# Derived from pair_created_at at screening time
+DERIVED_FIELDS = {"age_seconds": ("pair_created_at",)}
+
+COMPARISONS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+class FilterError(ValueError):
+    pass
+
+
+def compile_rule(rule, fields):
+    """Compile one node of the filter tree; adds the fields it reads to `fields`."""
+    if not isinstance(rule, dict):
+        raise FilterError(f"rule must be an object: {rule!r}")
+    if "all" in rule or "any" in rule:
+        combine = np.logical_and if "all" in rule else np.logical_or
+        parts = [compile_rule(part, fields) for part in rule.get("all", rule.get("any"))]
+        if not parts:
+            return lambda columns, n: np.full(n, combine is np.logical_and)
+        def combined(columns, n):
+            mask = parts[0](columns, n)
+            for part in parts[1:]:
+                mask = combine(mask, part(columns, n))
+            return mask
+        return combined
+    if "not" in rule:
+        inner = compile_rule(rule["not"], fields)
+        return lambda columns, n: ~inner(columns, n)
+
+    field, op, value = rule.get("field"), rule.get("op"), rule.get("value")
+    if field not in FIELDS and field not in DERIVED_FIELDS:
+        raise FilterError(f"unknown field: {field!r}")
+    fields.add(field)
+    kind = FIELDS[field][0] if field in FIELDS else "number"
+
+    if op in ("in", "not_in"):
+        if not isinstance(value, list):
+            raise FilterError(f"{op} needs a list value: {rule!r}")
+        try:
+            values = np.array(value, dtype=object if kind == "string" else float)
+        except (TypeError, ValueError):
+            raise FilterError(f"{field} needs numbers: {rule!r}")
+        negate = op == "not_in"
+        return lambda columns, n: np.isin(columns[field], values) != negate
+    if op not in COMPARISONS:
+        raise FilterError(f"unknown op: {op!r}")
+    compare = COMPARISONS[op]
+    if kind == "string":
+        if op not in ("==", "!="):
+            raise FilterError(f"{field} only supports ==, !=, in and not_in")
+        return lambda columns, n: compare(columns[field], value)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise FilterError(f"{field} needs a number value: {rule!r}")
+    return lambda columns, n: compare(columns[field], value)
+
+
+class PairFilter:
+    """A compiled filter tree."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.fields = set()
+        self.predicate = compile_rule(spec, self.fields)
+
+    def needed_fields(self):
+        """Stored fields the filter reads, including the sources of derived fields."""
+        needed = set(self.fields)
+        for field, sources in DERIVED_FIELDS.items():
+            if field in needed:
+                needed.update(sources)
+        return needed & FIELDS.keys()
+
+    def add_derived(self, columns, now=None):
+        if "age_seconds" in self.fields:
+            now = time.time() if now is None else now
+            columns["age_seconds"] = now - columns["pair_created_at"] / 1000
+        return columns
+
+    def columns(self, pairs, now=None):
+        """One array per referenced field over a flat list of pairs."""
+        columns = {}
+        for field in self.needed_fields():
+            kind, get = FIELDS[field]
+            if kind == "string":
+                columns[field] = np.array([get(pair) for pair in pairs], dtype=object)
+            elif kind == "bool":
+                columns[field] = np.array([bool(get(pair)) for pair in pairs], dtype=bool)
+            else:
+                columns[field] = np.array([to_number(get(pair), "<f8") for pair in pairs], dtype=float)
+        return self.add_derived(columns, now)
+
+    def mask_columns(self, columns, n, now=None):
+        """
+        Boolean array over rows already in column form (e.g. replayed history).
+
+        Fields missing from `columns` count as missing values; `now` may be an
+        array of per-row times in seconds.
+        """
+        columns = dict(columns)
+        for field in self.needed_fields() - columns.keys():
+            kind = FIELDS[field][0]
+            if kind == "string":
+                columns[field] = np.full(n, None, dtype=object)
+            elif kind == "bool":
+                columns[field] = np.zeros(n, dtype=bool)
+            else:
+                columns[field] = np.full(n, np.nan)
+        return np.asarray(self.predicate(self.add_derived(columns, now), n), dtype=bool)
+
+    def mask(self, pairs, now=None):
+        """Boolean array: which pairs pass."""
+        if not pairs:
+            return np.zeros(0, dtype=bool)
+        return np.asarray(self.predicate(self.columns(pairs, now), len(pairs)), dtype=bool)
+
+    def screen(self, responses, now=None):
+        """
+        Screen a batch of lookup results (address -> response dict) at once.
+
+        Returns address -> None (no pairs at all), True (some pair passed) or False.
+        """
+        pairs, owners, results = [], [], {}
+        addresses = list(responses)
+        for index, address in enumerate(addresses):
+            address_pairs = (responses[address] or {}).get("pairs") or []
+            results[address] = None if not address_pairs else False
+            pairs.extend(address_pairs)
+            owners.extend([index] * len(address_pairs))
+        if pairs:
+            passed = np.bincount(np.array(owners), weights=self.mask(pairs, now),
+                                 minlength=len(addresses)) > 0
+            for index, address in enumerate(addresses):
+                if results[address] is not None:
+                    results[address] = bool(passed[index])
+        return results
+
+
+def load_filter(path=FILTERS_FILE):
+    """Compile the filter in `path`, or DEFAULT_FILTER if there is no such file."""
+    try:
+        with open(path, "r") as file:
+            spec = json.load(file)
+    except FileNotFoundError:
+        spec = DEFAULT_FILTER
+    return PairFilter(spec)
+
+
+pair_filter = None
+
+
+def get_filter():
+    """The process-wide filter, compiled on first use."""
+    global pair_filter
+    if pair_filter is None:
+        pair_filter = load_filter()
+    return pair_filter
@@ -0,0 +1,20 @@
+'''
+Shared aiohttp session factory.
+
+One keep-alive connection pool per process, shared by every async stage
+(discovery, retries, live refresh), instead of a new session per cycle.
+'''
+
+import aiohttp
+
+MAX_CONNECTIONS = 20       # size of the shared keep-alive connection pool
+REQUEST_TIMEOUT = 15       # seconds
+
+
+def create_session(max_connections=MAX_CONNECTIONS, timeout=REQUEST_TIMEOUT):
+    """Create the shared aiohttp session with a pooled keep-alive connector."""
+    connector = aiohttp.TCPConnector(limit=max_connections, ttl_dns_cache=300)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
@@ -0,0 +1,197 @@
+'''
+Gap-free incremental ingestion of Birdeye new listings.
+
+Keeps a high-water mark (the newest listing time and the addresses listed at
+that time) and, on each poll, pages backwards with `time_to` until it reaches
+the mark, so bursts of more than one page between polls are not lost. The
+poll interval adapts to the observed listing rate, and paging that runs out
+before reaching the mark is reported as a gap.
+'''
+
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from birdeye_client import fetch_new_listings, fetch_new_listings_async
+from write_behind import get_writer
+
+PAGE_LIMIT = 20           # Birdeye's maximum page size for new listings
+MAX_PAGES_PER_POLL = 10   # stop paging (and report a gap) after this many pages
+MIN_POLL_INTERVAL = 2     # seconds
+MAX_POLL_INTERVAL = 60    # seconds
+TARGET_PER_POLL = PAGE_LIMIT / 2  # aim for half a page of new listings per poll
+RATE_SMOOTHING = 0.3      # EWMA weight of the latest observed listing rate
+CURSOR_KEY = "listing_cursor"
+
+
+def listing_time(item):
+    """Listing time of a new-listing item in unix seconds, or None if unknown."""
+    value = item.get("liquidityAddedAt")
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+class ListingIngester:
+    """Cursor-based new listing poller; `store` (a StateStore) persists the cursor."""
+
+    def __init__(self, store=None, page_limit=PAGE_LIMIT, max_pages=MAX_PAGES_PER_POLL):
+        self.store = store
+        self.page_limit = page_limit
+        self.max_pages = max_pages
+        self.mark_time = None
+        self.mark_addresses = set()
+        # Recently ingested addresses, to drop repeats of items without a listing time
+        self.recent = deque(maxlen=1000)
+        self.recent_set = set()
+        self.rate = None  # listings per second (EWMA)
+        self.last_poll = None
+        self.polls = 0
+        self.requests = 0
+        self.gaps = 0
+        self.lock = asyncio.Lock()
+        self.load_cursor()
+
+    def load_cursor(self):
+        if not self.store:
+            return
+        cursor = self.store.get_meta(CURSOR_KEY)
+        if cursor:
+            cursor = json.loads(cursor)
+            self.mark_time = cursor["time"]
+            self.mark_addresses = set(cursor["addresses"])
+
+    def save_cursor(self):
+        if self.store and self.mark_time is not None:
+            cursor = {"time": self.mark_time, "addresses": sorted(self.mark_addresses)}
+            # The store's lock may be held by a compaction; never wait for it on the event loop
+            get_writer().set_meta(self.store, CURSOR_KEY, json.dumps(cursor), block=False)
+
+    def remember(self, address):
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_set.discard(self.recent[0])
+        self.recent.append(address)
+        self.recent_set.add(address)
+
+    def is_new(self, address, listed_at):
+        """True if an item is newer than the high-water mark."""
+        if address in self.recent_set:
+            return False
+        if listed_at is None or self.mark_time is None:
+            return True
+        if listed_at == self.mark_time:
+            return address not in self.mark_addresses
+        return listed_at > self.mark_time
+
+    def process_page(self, items, collected, time_to=None):
+        """
+        Collect the new items of one page (newest first) fetched with `time_to`.
+
+        Returns (reached_mark, time_to for the next page or None to stop).
+        """
+        oldest = None
+        for item in items:
+            address = item.get("address")
+            if not address:
+                continue
+            listed_at = listing_time(item)
+            if listed_at is not None:
+                oldest = listed_at if oldest is None else min(oldest, listed_at)
+            if self.mark_time is not None and listed_at is not None and listed_at < self.mark_time:
+                return True, None
+            if address in collected or not self.is_new(address, listed_at):
+                if listed_at is not None and listed_at == self.mark_time:
+                    return True, None
+                continue
+            collected[address] = (listed_at, item)
+        if self.mark_time is None:
+            return True, None  # first run: start from the newest page, no backfill
+        if len(items) < self.page_limit or oldest is None:
+            return True, None  # nothing older to page through
+        if time_to is not None and oldest >= time_to:
+            # A whole page listed within one second; step past it (the rest of that second is lost)
+            self.gaps += 1
+            print(f"Listing gap: more than {self.page_limit} listings at {oldest}.")
+            return False, oldest - 1
+        return False, oldest
+
+    def finish_poll(self, collected, reached_mark, pages):
+        """Advance the mark, update the rate estimate and return new items oldest first."""
+        self.polls += 1
+        if not reached_mark:
+            self.gaps += 1
+            print(f"Listing gap: paged back {pages} pages without reaching the last seen listing.")
+
+        new_items = sorted(collected.values(), key=lambda entry: entry[0] or 0)
+        for listed_at, item in new_items:
+            self.remember(item["address"])
+            if listed_at is None:
+                continue
+            if self.mark_time is None or listed_at > self.mark_time:
+                self.mark_time = listed_at
+                self.mark_addresses = {item["address"]}
+            elif listed_at == self.mark_time:
+                self.mark_addresses.add(item["address"])
+        self.save_cursor()
+
+        now = time.monotonic()
+        if self.last_poll is not None and now > self.last_poll:
+            observed = len(new_items) / (now - self.last_poll)
+            self.rate = observed if self.rate is None else (
+                RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * self.rate)
+        self.last_poll = now
+        return [item for _, item in new_items]
+
+    def next_interval(self):
+        """Seconds until the next poll: sooner when listings are frequent, later when quiet."""
+        if self.rate is None:
+            return MIN_POLL_INTERVAL
+        if self.rate <= 0:
+            return MAX_POLL_INTERVAL
+        return max(MIN_POLL_INTERVAL, min(MAX_POLL_INTERVAL, TARGET_PER_POLL / self.rate))
+
+    def poll(self, session=None):
+        """Fetch every listing newer than the mark (blocking); returns items oldest first."""
+        collected, time_to, pages, reached_mark = {}, None, 0, False
+        while pages < self.max_pages:
+            items = fetch_new_listings(self.page_limit, session, time_to)
+            pages += 1
+            self.requests += 1
+            reached_mark, time_to = self.process_page(items, collected, time_to)
+            if reached_mark:
+                break
+        return self.finish_poll(collected, reached_mark, pages)
+
+    async def poll_async(self, session):
+        """Async variant of poll. Returns None if another poll is still paging."""
+        if self.lock.locked():
+            return None  # the running poll will page back far enough to cover this tick
+        async with self.lock:
+            collected, time_to, pages, reached_mark = {}, None, 0, False
+            while pages < self.max_pages:
+                items = await fetch_new_listings_async(session, self.page_limit, time_to)
+                pages += 1
+                self.requests += 1
+                reached_mark, time_to = self.process_page(items, collected, time_to)
+                if reached_mark:
+                    break
+            return self.finish_poll(collected, reached_mark, pages)
+
+    def stats(self):
+        return {
+            "polls": self.polls,
+            "requests": self.requests,
+            "gaps": self.gaps,
+            "listing_rate": self.rate or 0.0,
+            "poll_interval": self.next_interval(),
+        }
@@ -1,9 +1,20 @@
 import asyncio
-import aiohttp
 import json
-import os
 import time
-import schedule
+from alert_engine import check_alerts, get_engine as get_alert_engine
+from change_detector import ChangeDetector
+from dex_client import fetch_tokens_async
+from event_bus import publish, snapshot_fields
+from http_pool import create_session
+from metrics import stage_seconds
+from pair_snapshot import parse_response
+from refresh_tiers import TieredScheduler
+from resilience import deadline
+from snapshot_store import SnapshotStore
+from write_behind import get_writer
+
+# Seconds between refreshes of the whole watchlist
+REFRESH_INTERVAL = 10
 
 def load_coin_addresses():
     """Load coin addresses from coins_with_socials.json."""
@@ -23,43 +34,92 @@ def load_coin_addresses():
         print("Error loading coin addresses:", e)
         return []
 
-async def fetch_pair_data(session, pair_address):
-    """Fetch data for a specific pair address and save it to a JSON file asynchronously."""
-    url = f"https://api.dexscreener.com/latest/dex/search?q={pair_address}"
-    json_file = f"./test_coin_data/{pair_address}.json"
-    
-    try:
-        async with session.get(url) as response:
-            response.raise_for_status()
-            data = await response.json()
-            
-            # Write to file asynchronously (if needed, you might use aiofiles here)
-            with open(json_file, 'w') as file:
-                json.dump(data, file, indent=4)
-            print(f"Updated data for {pair_address}")
-    except Exception as e:
-        print(f"API request failed for {pair_address}:", e)
-
-async def update_all_coins_async():
-    print("UPDATING DATA")
-    """Fetch and update data for all coins in coins_with_socials.json concurrently."""
-    coin_addresses = load_coin_addresses()
-    if not coin_addresses:
-        print("No coin addresses found. Skipping update.")
-        return
-
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_pair_data(session, pair_address) for pair_address in coin_addresses]
-        await asyncio.gather(*tasks)
-
-def update_all_coins():
-    """Wrapper to run the async update in the event loop."""
-    asyncio.run(update_all_coins_async())
-
-# Schedule the function to run every 10 seconds
-schedule.every(10).seconds.do(update_all_coins)
+# Price, FDV, liquidity, txns and volume history, one row per refresh
+snapshot_store = SnapshotStore()
 
-if __name__ == "__main__":
+# Skips rows identical to the last one stored for the same address
+change_detector = ChangeDetector(load_last=snapshot_store.latest)
+
+def save_snapshot(pair_address, snapshot):
+    """
+    Append a parsed PairSnapshot to the history of its pair, if it changed.
+
+    Runs on the event loop, so the write is queued without blocking; callers
+    await the writer's wait_for_room() first.
+    """
+    if snapshot is None:
+        print(f"No data found for {pair_address}")
+        return False
+
+    # Every refresh counts for the alert windows, changed or not
+    check_alerts(snapshot)
+
+    if not change_detector.changed(pair_address, snapshot):
+        return False
+
+    get_writer().append_snapshot(snapshot_store, pair_address, snapshot, block=False)
+    publish("snapshot", address=pair_address, **snapshot_fields(snapshot))
+    print(f"Updated data for {pair_address}")
+    return True
+
+def forget_coin(pair_address):
+    """Drop the in-memory state kept for a coin that left the watchlist."""
+    change_detector.forget(pair_address)
+    get_alert_engine().forget(pair_address)
+
+async def fetch_pairs_data(session, pair_addresses):
+    """Fetch data for all pair addresses with batched requests and save it; returns the parsed snapshots."""
+    results = await fetch_tokens_async(session, pair_addresses, fresh=True)
+    # The first refresh of an address reads its stored history; do that off the loop
+    await asyncio.get_running_loop().run_in_executor(None, change_detector.seed, list(results))
+    snapshots = {}
+    writer = get_writer()
+    for pair_address, data in results.items():
+        await writer.wait_for_room()
+        try:
+            snapshots[pair_address] = parse_response(data, pair_address)
+            save_snapshot(pair_address, snapshots[pair_address])
+        except Exception as e:
+            print(f"Saving data failed for {pair_address}:", e)
+    return snapshots
+
+async def run_live_refresh(session, load_addresses=load_coin_addresses, interval=REFRESH_INTERVAL,
+                           scheduler=None):
+    """
+    Refresh each coin as often as its activity tier asks, reusing one session and event loop.
+
+    The watchlist is reloaded every `interval` seconds.
+    """
+    if scheduler is None:
+        scheduler = TieredScheduler()
+    next_reload = time.monotonic()
     while True:
-        schedule.run_pending()
-        time.sleep(1)
+        if time.monotonic() >= next_reload:
+            for pair_address in scheduler.sync(load_addresses()):
+                forget_coin(pair_address)
+            next_reload = time.monotonic() + interval
+            stats = change_detector.stats()
+            print(f"Refresh tiers: {scheduler.stats()}; snapshots written: {stats['written']}, "
+                  f"unchanged and skipped: {stats['suppressed']}")
+
+        due = scheduler.pop_due()
+        if due:
+            try:
+                with stage_seconds.time(stage="refresh"), deadline(interval):
+                    snapshots = await fetch_pairs_data(session, due)
+                # Failed lookups keep their tier; pop_due already rescheduled them
+                for pair_address, snapshot in snapshots.items():
+                    scheduler.observe(pair_address, snapshot)
+            except Exception as e:
+                print("Live refresh failed:", e)
+
+        wake = scheduler.next_wake()
+        wake = interval if wake is None else min(wake, interval)
+        await asyncio.sleep(max(0, min(wake, next_reload - time.monotonic())))
+
+async def main():
+    async with create_session() as session:
+        await run_live_refresh(session)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,285 @@
+'''
+Compact, memory-mapped membership sets of Solana addresses.
+
+Addresses are stored as their decoded 32-byte keys in one sorted array,
+preceded by a Bloom filter, in a single file that is memory-mapped on load:
+a restart maps the file instead of parsing millions of base58 strings, and
+the pages are shared with the OS cache rather than copied into the heap.
+"Already seen?" checks hit the Bloom filter first, so most new listings are
+rejected without touching the key array; the rest binary-search it.
+
+Changes since the file was written live in small in-memory add / remove
+sets until the next `save`. Strings that do not decode to 32 bytes are kept
+as-is in a side list.
+
+Writers that change the set a little at a time call `save_changes`, which
+appends just the new changes to a journal next to the file (`<path>.log`,
+one "+address" or "-address" line each) and only rewrites the whole file
+once the journal passes JOURNAL_COMPACT_RATIO of its keys. A "#stamp" line
+moves the stamp forward. `open` replays the journal.
+'''
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+KEY_SIZE = 32
+MAGIC = b"DXMI"
+FORMAT_VERSION = 1
+# magic, format version, hash count, key count, bloom size in bytes, stamp
+HEADER = struct.Struct("<4sHHQQQ")
+BLOOM_BITS_PER_KEY = 10  # about 1% false positives
+BLOOM_HASHES = 7
+MASK64 = (1 << 64) - 1
+JOURNAL_SUFFIX = ".log"
+JOURNAL_COMPACT_RATIO = 0.125  # rewrite the file once the journal has this many lines per key
+JOURNAL_MIN_COMPACT = 1024
+
+
+def b58decode(address):
+    """Decode a base58 address to bytes, or None if it is not valid base58."""
+    number = 0
+    try:
+        for char in address:
+            number = number * 58 + BASE58_INDEX[char]
+    except (KeyError, TypeError):
+        return None
+    body = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    leading = len(address) - len(address.lstrip("1"))
+    return b"\0" * leading + body
+
+
+def b58encode(key):
+    number = int.from_bytes(key, "big")
+    chars = []
+    while number:
+        number, remainder = divmod(number, 58)
+        chars.append(BASE58_ALPHABET[remainder])
+    leading = len(key) - len(key.lstrip(b"\0"))
+    return "1" * leading + "".join(reversed(chars))
+
+
+def to_key(address):
+    """The 32-byte key of an address, or None if it is not a 32-byte base58 string."""
+    key = b58decode(address)
+    return key if key is not None and len(key) == KEY_SIZE else None
+
+
+def bloom_positions(key, bits, hashes=BLOOM_HASHES):
+    """
+    Bit positions of a key (double hashing, in uint64 arithmetic like `build_bloom`).
+
+    Keys are ed25519 public keys, i.e. already uniformly random bytes, so
+    their first two 64-bit words serve as the two hashes.
+    """
+    first = int.from_bytes(key[:8], "little")
+    step = int.from_bytes(key[8:16], "little") | 1
+    return [((first + i * step) & MASK64) % bits for i in range(hashes)]
+
+
+def build_bloom(keys, bloom_bytes, hashes=BLOOM_HASHES):
+    """Bloom filter bytes for a sorted S32 key array, computed for all keys at once."""
+    bloom = np.zeros(bloom_bytes, dtype=np.uint8)
+    if not len(keys):
+        return bloom
+    words = np.frombuffer(keys.tobytes(), dtype="<u8").reshape(-1, KEY_SIZE // 8)
+    first, step = words[:, 0], words[:, 1] | np.uint64(1)
+    bits = np.uint64(bloom_bytes * 8)
+    with np.errstate(over="ignore"):
+        for i in range(hashes):
+            positions = (first + np.uint64(i) * step) % bits
+            np.bitwise_or.at(bloom, (positions >> np.uint64(3)).astype(np.intp),
+                             (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+    return bloom
+
+
+class MembershipSet:
+    """Set-like container of addresses backed by a memory-mapped sorted key file."""
+
+    def __init__(self, addresses=(), stamp=0):
+        self.keys = np.zeros(0, dtype=f"S{KEY_SIZE}")
+        self.bloom = np.zeros(0, dtype=np.uint8)
+        self.hashes = BLOOM_HASHES
+        self.other = set()    # addresses that are not 32-byte base58 keys
+        self.added = set()    # keys added since the file was written
+        self.removed = set()  # file keys removed since then
+        self.stamp = stamp
+        self.mapped = None
+        # What the file plus its journal hold, as of the last save / save_changes
+        self.logged_added, self.logged_removed, self.logged_other = set(), set(), set()
+        self.journal_lines = 0
+        self.update(addresses)
+
+    @classmethod
+    def open(cls, path):
+        """Map an index file; returns None if it is missing or unreadable."""
+        try:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(mapped) < HEADER.size:
+            return None
+        magic, version, hashes, count, bloom_bytes, stamp = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        index = cls(stamp=stamp)
+        index.mapped = mapped
+        index.hashes = hashes
+        index.bloom = np.frombuffer(mapped, dtype=np.uint8, count=bloom_bytes, offset=HEADER.size)
+        keys_offset = HEADER.size + bloom_bytes
+        index.keys = np.frombuffer(mapped, dtype=f"S{KEY_SIZE}", count=count, offset=keys_offset)
+        tail = mapped[keys_offset + count * KEY_SIZE:]
+        index.other = set(json.loads(tail)) if tail else set()
+        index.replay_journal(path)
+        return index
+
+    def replay_journal(self, path):
+        """Apply the changes appended to `path`'s journal since the file was written."""
+        try:
+            with open(path + JOURNAL_SUFFIX, "rb") as file:
+                lines = file.read().split(b"\n")
+        except OSError:
+            return
+        # The last piece is empty, or a line torn by a crash
+        for line in lines[:-1]:
+            op, address = line[:1], line[1:].decode()
+            if op == b"+":
+                self.add(address)
+            elif op == b"-":
+                self.discard(address)
+            elif op == b"#":
+                self.stamp = int(address)
+        self.journal_lines = len(lines) - 1
+        self.mark_logged()
+
+    def mark_logged(self):
+        self.logged_added, self.logged_removed = set(self.added), set(self.removed)
+        self.logged_other = set(self.other)
+
+    def in_file(self, key):
+        """True if `key` is in the mapped key array (Bloom filter first)."""
+        if not len(self.keys):
+            return False
+        bits = len(self.bloom) * 8
+        for position in bloom_positions(key, bits, self.hashes):
+            if not self.bloom[position >> 3] & (1 << (position & 7)):
+                return False
+        # numpy compares S32 values with trailing NUL bytes stripped, consistently on both sides
+        i = np.searchsorted(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key.rstrip(b"\0")
+
+    def __contains__(self, address):
+        key = to_key(address)
+        if key is None:
+            return address in self.other
+        if key in self.added:
+            return True
+        if key in self.removed:
+            return False
+        return self.in_file(key)
+
+    def add(self, address):
+        key = to_key(address)
+        if key is None:
+            self.other.add(address)
+        elif key in self.removed:
+            self.removed.discard(key)
+        elif not self.in_file(key):
+            self.added.add(key)
+
+    def discard(self, address):
+        key = to_key(address)
+        if key is None:
+            self.other.discard(address)
+        elif key in self.added:
+            self.added.discard(key)
+        elif self.in_file(key):
+            self.removed.add(key)
+
+    def update(self, addresses):
+        for address in addresses:
+            self.add(address)
+
+    def difference_update(self, addresses):
+        for address in addresses:
+            self.discard(address)
+
+    def __len__(self):
+        return len(self.keys) - len(self.removed) + len(self.added) + len(self.other)
+
+    def all_keys(self):
+        """Sorted array of every current key."""
+        keys = self.keys
+        if self.removed:
+            keys = keys[~np.isin(keys, np.array(sorted(self.removed), dtype=keys.dtype))]
+        if self.added:
+            keys = np.concatenate([keys, np.array(sorted(self.added), dtype=keys.dtype)])
+            keys.sort(kind="stable")
+        return keys
+
+    def __iter__(self):
+        for key in self.all_keys():
+            yield b58encode(key.ljust(KEY_SIZE, b"\0"))
+        yield from list(self.other)
+
+    def save(self, path, stamp=None):
+        """Write every current address to `path` atomically (the mapping stays valid)."""
+        stamp = self.stamp if stamp is None else stamp
+        keys = self.all_keys()
+        bloom_bytes = max(1, (len(keys) * BLOOM_BITS_PER_KEY + 7) // 8)
+        bloom = build_bloom(keys, bloom_bytes)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, BLOOM_HASHES, len(keys), bloom_bytes, stamp))
+            file.write(bloom.tobytes())
+            file.write(keys.tobytes())
+            if self.other:
+                file.write(json.dumps(sorted(self.other)).encode())
+        os.replace(tmp_path, path)
+        try:
+            os.remove(path + JOURNAL_SUFFIX)  # folded into the file
+        except FileNotFoundError:
+            pass
+        self.stamp = stamp
+        self.journal_lines = 0
+        self.mark_logged()
+
+    def save_changes(self, path, stamp=None):
+        """
+        Persist the changes since the last save by appending them to the journal,
+        O(changes); the file is rewritten (and re-mapped) once the journal is large.
+
+        A new `stamp` is journaled too, even when nothing else changed.
+        """
+        stamp = self.stamp if stamp is None else stamp
+        added = [b58encode(key) for key in self.added - self.logged_added]
+        added += [b58encode(key) for key in self.logged_removed - self.removed]
+        added += list(self.other - self.logged_other)
+        removed = [b58encode(key) for key in self.logged_added - self.added]
+        removed += [b58encode(key) for key in self.removed - self.logged_removed]
+        removed += list(self.logged_other - self.other)
+        if not added and not removed and stamp == self.stamp:
+            return
+        if self.journal_lines + len(added) + len(removed) > max(JOURNAL_MIN_COMPACT,
+                                                                len(self) * JOURNAL_COMPACT_RATIO):
+            self.save(path, stamp)
+            fresh = MembershipSet.open(path)
+            if fresh is not None:
+                self.__dict__.update(fresh.__dict__)
+            return
+        lines = [f"+{address}\n" for address in added] + [f"-{address}\n" for address in removed]
+        if stamp != self.stamp:
+            lines.append(f"#{stamp}\n")
+        with open(path + JOURNAL_SUFFIX, "ab") as file:
+            file.write("".join(lines).encode())
+        self.stamp = stamp
+        self.journal_lines += len(lines)
+        self.mark_logged()
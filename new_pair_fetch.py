@@ -1,182 +1,158 @@
-import requests
-import json
-import os
-import time
-import schedule
-from dotenv import load_dotenv
+import atexit
 
-load_dotenv()
-
-BIRDEYE_API_KEY = os.getenv("BIRDEYE_API_KEY")
+from event_bus import publish
+from filter_engine import get_filter
+from listing_ingester import ListingIngester
+from metrics import state_set_size
+from payload_archive import PayloadArchive
+from retry_scheduler import RetryScheduler
+from state_store import StateStore
+from write_behind import get_writer
 
 # Files to store processed pairs, no-data pairs, and coins with socials
 PROCESSED_PAIRS_FILE = "./test_coin_data/processed_pairs.json"
 NO_DATA_PAIRS_FILE = "./test_coin_data/no_data_pairs.json"
 COINS_WITH_SOCIALS_FILE = "./test_coin_data/coins_with_socials.json"
 
-# Load processed pairs
-if os.path.exists(PROCESSED_PAIRS_FILE):
-    with open(PROCESSED_PAIRS_FILE, "r") as file:
-        try:
-            processed_pairs = set(json.load(file))
-        except json.JSONDecodeError:
-            processed_pairs = set()
-else:
-    processed_pairs = set()
-
-# Load no-data pairs
-if os.path.exists(NO_DATA_PAIRS_FILE):
-    with open(NO_DATA_PAIRS_FILE, "r") as file:
-        try:
-            no_data_pairs = set(json.load(file))
-        except json.JSONDecodeError:
-            no_data_pairs = set()
-else:
-    no_data_pairs = set()
-
-# Load coins with socials
-if os.path.exists(COINS_WITH_SOCIALS_FILE):
-    with open(COINS_WITH_SOCIALS_FILE, "r") as file:
-        try:
-            coins_with_socials = set(json.load(file))
-        except json.JSONDecodeError:
-            coins_with_socials = set()
-else:
-    coins_with_socials = set()
-
-def save_processed_pairs():
-    """Save processed pairs to a file."""
-    with open(PROCESSED_PAIRS_FILE, "w") as file:
-        json.dump(list(processed_pairs), file, indent=4)
-
-def save_no_data_pairs():
-    """Save no-data pairs to a file."""
-    with open(NO_DATA_PAIRS_FILE, "w") as file:
-        json.dump(list(no_data_pairs), file, indent=4)
-
-def save_coins_with_socials():
-    """Save coins with socials to a file."""
-    with open(COINS_WITH_SOCIALS_FILE, "w") as file:
-        json.dump(list(coins_with_socials), file, indent=4)
-
-def fetch_pair_data(pair_address):
+# Memory-mapped membership indexes for the two sets that grow with every listing
+PROCESSED_PAIRS_INDEX = "./test_coin_data/processed_pairs.idx"
+NO_DATA_PAIRS_INDEX = "./test_coin_data/no_data_pairs.idx"
+
+# Raw lookup results of the coins with socials, packed into segment files
+PAYLOAD_ARCHIVE_DIR = "./test_coin_data/archive"
+
+# All three sets live in one SQLite WAL store; the JSON files are migrated
+# once. Only coins_with_socials.json is kept up to date afterwards, as a
+# read-only view; the files of the two indexed sets are renamed to .migrated.
+store = StateStore(json_files={
+    "processed_pairs": PROCESSED_PAIRS_FILE,
+    "no_data_pairs": NO_DATA_PAIRS_FILE,
+    "coins_with_socials": COINS_WITH_SOCIALS_FILE,
+})
+# Changes reach the store through the write-behind thread (see update_state);
+# registered after the store, so at exit they are flushed before it closes.
+atexit.register(get_writer().flush)
+
+processed_pairs = store.load_index("processed_pairs", PROCESSED_PAIRS_INDEX)
+no_data_pairs = store.load_index("no_data_pairs", NO_DATA_PAIRS_INDEX)
+coins_with_socials = store.load("coins_with_socials")
+
+payload_archive = PayloadArchive(PAYLOAD_ARCHIVE_DIR)
+
+# Per-address retry times for no_data_pairs. The backoff restarts after a restart,
+# but the TTL keeps counting from when the address was first added.
+retry_scheduler = RetryScheduler()
+for pair_address, first_seen in store.added_times("no_data_pairs").items():
+    retry_scheduler.add(pair_address, first_seen=first_seen)
+
+# Manually added pairs (see daemon.manual_stage): retried on the same backoff and TTL
+# as no-data pairs while they have no socials, instead of dropped after one look
+manual_pairs = set()
+
+# Cursor-based new listing poller; its high-water mark is kept in the state store
+listing_ingester = ListingIngester(store)
+
+STATE_SETS = {
+    "processed_pairs": processed_pairs,
+    "no_data_pairs": no_data_pairs,
+    "coins_with_socials": coins_with_socials,
+}
+for set_name, addresses in STATE_SETS.items():
+    state_set_size.set_function(addresses.__len__, set=set_name)
+
+def update_state(add=None, remove=None, block=True):
     """
-    Fetch data for a given pair from Dex Screener API.
-    
-    Returns:
+    Apply one atomic change to the tracked sets: in memory now, on disk in the background.
+
+    `add` / `remove` map a set name to the addresses to add to / remove from it.
+    The writer thread commits changes in order, so the store never sees them
+    reordered. Pass block=False on the event loop.
+    """
+    # Memory first: the store's compaction thread journals the indexes stamped
+    # with the committed change counters, which must never run ahead of them
+    with store.index_lock:
+        for set_name, addresses in (remove or {}).items():
+            STATE_SETS[set_name].difference_update(addresses)
+        for set_name, addresses in (add or {}).items():
+            STATE_SETS[set_name].update(addresses)
+    get_writer().apply_state(store, add=add, remove=remove, block=block)
+
+def screen_pairs_data(results):
+    """
+    Classify a batch of lookup results (address -> response) without touching any state.
+
+    Every pair of every response is checked against the configured filter
+    (filters.json; by default "has socials") in one vectorized pass.
+
+    Returns a dict of address -> status:
         "no_data"    : if no data is returned (coin remains in no_data_pairs).
-        "no_socials" : if data is returned but no socials are found (coin will be removed permanently).
-        "success"    : if data with socials is returned.
+        "no_socials" : if data is returned but no pair passes the filter (coin will be removed permanently).
+        "success"    : if some pair passes the filter.
+    """
+    statuses = {}
+    for pair_address, passed in get_filter().screen(results).items():
+        if passed is None:
+            statuses[pair_address] = "no_data"
+        else:
+            statuses[pair_address] = "success" if passed else "no_socials"
+    return statuses
+
+def record_pair_status(pair_address, status, data, block=True):
     """
-    url = f"https://api.dexscreener.com/latest/dex/search?q={pair_address}"
-    json_file = f"./test_coin_data/{pair_address}.json"
+    Update the tracked sets (and save the data) for a screened address.
+
+    Pass block=False on the event loop, after awaiting the writer's wait_for_room().
+    """
+    if status == "no_data":
+        print(f"No data found for {pair_address}")
+        if pair_address not in no_data_pairs:
+            update_state(add={"no_data_pairs": [pair_address]}, block=block)
+        retry_scheduler.add(pair_address)
+        return
     
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        # Check if any data was returned
-        if 'pairs' not in data or not data['pairs']:
-            print(f"No data found for {pair_address}")
-            no_data_pairs.add(pair_address)
-            save_no_data_pairs()
-            return "no_data"
-        
-        # Data is returned; now check for socials
-        pair = data['pairs'][0]
-        socials = pair.get("info", {}).get("socials", [])
-        
-        if not socials:
-            print(f"Skipping {pair_address}, no socials found.")
-            # Remove coin from no_data_pairs (if present) so it isn't retried further.
-            if pair_address in no_data_pairs:
-                no_data_pairs.remove(pair_address)
-                save_no_data_pairs()
-            return "no_socials"
-        
-        # Data with socials is available:
+    if status == "no_socials" and pair_address in manual_pairs:
+        print(f"Manual pair {pair_address} has no socials yet; will retry later.")
+        retry_scheduler.add(pair_address)
+        return
+
+    # Data was found, so the address needs no further retries either way.
+    retry_scheduler.discard(pair_address)
+
+    if status == "no_socials":
+        print(f"Skipping {pair_address}, no socials found.")
+        # Remove coin from no_data_pairs (if present) so it isn't retried further.
         if pair_address in no_data_pairs:
-            no_data_pairs.remove(pair_address)
-            save_no_data_pairs()
-        
-        processed_pairs.add(pair_address)
-        coins_with_socials.add(pair_address)
-        save_processed_pairs()
-        save_coins_with_socials()
-
-        with open(json_file, 'w') as file:
-            json.dump(data, file, indent=4)
-        
-        print(f"New coin with socials found! Data saved to {json_file}.")
-        return "success"
-    except requests.exceptions.RequestException as e:
-        print(f"API request failed for {pair_address}:", e)
-        return "no_data"  # On failure, treat it as no data for now.
-
-def fetch_new_pairs():
-    """Fetch new pairs from BirdEye API and process them."""
-    new_pairs_url = "https://public-api.birdeye.so/defi/v2/tokens/new_listing?limit=5&meme_platform_enabled=false"
-    headers = {
-        "accept": "application/json",
-        "x-chain": "solana",
-        "X-API-KEY": BIRDEYE_API_KEY
-    }
+            update_state(remove={"no_data_pairs": [pair_address]}, block=block)
+        return
     
-    try:
-        response = requests.get(new_pairs_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        items = data.get("data", {}).get("items", [])
-        
-        if not items:
-            return
-        
-        for item in items:
-            pair_address = item.get("address")
-            if not pair_address or pair_address in processed_pairs or pair_address in no_data_pairs:
-                continue
-            
-            # We process only if fetch_pair_data returns "success"
-            status = fetch_pair_data(pair_address)
-            if status == "success":
-                # Already saved and updated processed lists in fetch_pair_data
-                pass
+    # Data with socials is available: one atomic update for all three sets
+    update_state(
+        add={"processed_pairs": [pair_address], "coins_with_socials": [pair_address]},
+        remove={"no_data_pairs": [pair_address]},
+        block=block,
+    )
+    publish("socials", address=pair_address)
+
+    get_writer().append_payload(payload_archive, pair_address, data, block=block)
     
-    except requests.exceptions.RequestException as e:
-        print("API request for new pairs failed:", e)
-    except Exception as e:
-        print("An error occurred while fetching new pairs:", e)
+    print(f"New coin with socials found! Data saved to {payload_archive.root}.")
 
-def retry_no_data_pairs():
-    """
-    Retry fetching data for pairs previously marked as having no data.
-    Remove a coin from no_data_pairs only if:
-      - It now returns data with socials ("success") OR 
-      - It returns data but no socials ("no_socials").
-    If it still returns "no_data", keep it in no_data_pairs for future retries.
+def due_no_data_pairs(block=True):
     """
-    print("Retrying no data pairs...")
-    to_remove = set()
-    
-    for pair_address in list(no_data_pairs):
-        status = fetch_pair_data(pair_address)
-        if status in ("success", "no_socials"):
-            print(f"Removing {pair_address} from no_data_pairs permanently.")
-            to_remove.add(pair_address)
-        else:
-            # Status is "no_data": leave it for future retries.
-            print(f"{pair_address} still has no data; will retry later.")
-    
-    if to_remove:
-        no_data_pairs.difference_update(to_remove)
-        save_no_data_pairs()
+    Return the no-data pairs whose retry is due this cycle.
 
-# Schedule tasks
-schedule.every(5).seconds.do(fetch_new_pairs)
-schedule.every(5).seconds.do(retry_no_data_pairs)
+    Pairs past the retry TTL are dropped from no_data_pairs here (pass
+    block=False on the event loop).
+    """
+    due, expired = retry_scheduler.pop_due()
+    if expired:
+        print(f"Giving up on {len(expired)} pairs that never returned data.")
+        update_state(remove={"no_data_pairs": expired}, block=block)
+    return due
 
 if __name__ == "__main__":
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    # Discovery and retries run on the asyncio pipeline (see discovery_pipeline.py)
+    import asyncio
+    from discovery_pipeline import run_pipeline
+
+    asyncio.run(run_pipeline())
@@ -8,45 +8,36 @@ import csv
 import os
 import schedule
 import time
-from dotenv import load_dotenv
+from birdeye_client import fetch_new_listings
+from dex_client import fetch_tokens
+from filter_engine import get_filter
+from resilience import within_deadline
 # import dontshare
 
 # Directory to store CSV files
 output_dir = "./coin_data"
 os.makedirs(output_dir, exist_ok=True)
 
-load_dotenv()
-
 # Keep track of processed pairs
 processed_pairs = set()
-BIRDEYE_API_KEY=os.getenv("BIRDEYE_API_KEY")
+
+# Seconds between polls; also the deadline for all the requests of one poll
+POLL_INTERVAL = 10
 
 
+@within_deadline(POLL_INTERVAL)
 def fetch_new_pairs():
     print("Fetching new pairs...")  #<--------------------------------------------------------------------------
 
-    # BirdEye API endpoint for new pairs
-    new_pairs_url = "https://public-api.birdeye.so/defi/v2/tokens/new_listing?limit=5&meme_platform_enabled=false"
-
-    headers = {
-        "accept": "application/json",
-        "x-chain": "solana",  # Update the chain if necessary
-        "X-API-KEY": f"{BIRDEYE_API_KEY}"  # Include the API key in the headers
-    }
-
     try:
-        # Fetch new pairs data
-        response = requests.get(new_pairs_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        # Navigate through the response to get the list of items
-        items = data.get("data", {}).get("items", [])
+        # Fetch new pairs data from the BirdEye new listing endpoint (rate limited)
+        items = fetch_new_listings()
 
         if not items:
             print("No new pairs found.")
             return
 
+        new_addresses = []
         for item in items:
             # Extract token address
             pair_address = item.get("address")  # Ensure key matches the BirdEye API response
@@ -59,8 +50,11 @@ def fetch_new_pairs():
                 # print(f"Skipping {pair_address} as it has already been processed.") #<--------------------------------------------------------------------------
                 continue
 
-            # Fetch data for the pair using Dex Screener API
-            if fetch_pair_data(pair_address):
+            new_addresses.append(pair_address)
+
+        # Fetch data for all new pairs using batched Dex Screener requests
+        for pair_address, saved in fetch_pairs_data(new_addresses).items():
+            if saved:
                 processed_pairs.add(pair_address)
 
     except requests.exceptions.RequestException as e:
@@ -68,34 +62,32 @@ def fetch_new_pairs():
     except Exception as e:
         print("An error occurred while fetching new pairs:", e)
 
-def fetch_pair_data(pair_address):
-    print(f"Fetching data for pair: {pair_address}...") #<--------------------------------------------------------------------------
-
-    # Dex Screener API endpoint for pair data
-    url = f"https://api.dexscreener.com/latest/dex/search?q={pair_address}"
+def fetch_pairs_data(pair_addresses):
+    if not pair_addresses:
+        return {}
+    print(f"Fetching data for {len(pair_addresses)} pairs...") #<--------------------------------------------------------------------------
+
+    # One Dex Screener request per batch of addresses, screened as one batch
+    results = fetch_tokens(pair_addresses)
+    screened = get_filter().screen(results)
+    return {
+        pair_address: save_pair_data(pair_address, results[pair_address], screened[pair_address])
+        for pair_address in pair_addresses
+        if pair_address in results
+    }
 
+def save_pair_data(pair_address, data, passed):
     # Output CSV file name
     csv_file = os.path.join(output_dir, "new_pairs_address.csv")
 
     try:
-        # Fetch data from the API
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        # Check if 'pairs' key exists
-        if 'pairs' not in data or len(data['pairs']) == 0:
+        if passed is None:
             print(f"No data found for the pair address: {pair_address}.") 
             return False
 
-        # Extract the first pair (assuming single match)
-        pair = data['pairs'][0]
-
-        # Check if socials exist in 'info' section
-        socials = pair.get("info", {}).get("socials", [])
-
-        if not socials:
-            print(f"Pair {pair_address} has data but no social links, skipping.") 
+        # Check if any pair passed the filters (by default: socials exist in 'info' section)
+        if not passed:
+            print(f"Pair {pair_address} has data but did not pass the filters, skipping.") 
             return False
 
         # Extract required fields
@@ -173,17 +165,16 @@ def fetch_pair_data(pair_address):
         print(f"Data saved to {csv_file}.")
         return True
 
-    except requests.exceptions.RequestException as e:
-        print(f"API request failed for pair {pair_address}:", e)
     except KeyError as e:
         print(f"KeyError for pair {pair_address}: {e} - Check API response structure.")
     except Exception as e:
         print(f"An error occurred for pair {pair_address}: {e}")
     return False
 
-# Schedule the tasks
-schedule.every(10).seconds.do(fetch_new_pairs)
+if __name__ == "__main__":
+    # Schedule the tasks
+    schedule.every(POLL_INTERVAL).seconds.do(fetch_new_pairs)
 
-while True:
-    schedule.run_pending()
-    time.sleep(1)
+    while True:
+        schedule.run_pending()
+        time.sleep(1)
@@ -0,0 +1,99 @@
+'''
+Compact typed record for one Dex Screener pair.
+
+Responses are parsed once into a PairSnapshot holding only the fields the
+scrapers use (price, FDV, market cap, liquidity, txns and volume per window,
+socials flag, creation time). Every stage passes this record around instead
+of the raw nested response dict.
+'''
+
+import time
+
+WINDOWS = ("m5", "h1", "h6", "h24")
+
+# Numeric fields and their storage dtypes (see snapshot_store.py)
+NUMERIC_FIELDS = (
+    [("price_usd", "<f8"), ("fdv", "<f8"), ("market_cap", "<f8"), ("liquidity_usd", "<f8")]
+    + [(f"{side}_{window}", "<i4") for window in WINDOWS for side in ("buys", "sells")]
+    + [(f"volume_{window}", "<f8") for window in WINDOWS]
+)
+
+# Stored for values the API did not return
+MISSING_INT = -1
+MISSING_FLOAT = float("nan")
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def to_number(value, dtype):
+    """Convert an API value (number, numeric string or missing) to a typed value."""
+    missing = MISSING_INT if dtype == "<i4" else MISSING_FLOAT
+    if value is None or value == "" or value == "N/A":
+        return missing
+    try:
+        return int(value) if dtype == "<i4" else float(value)
+    except (TypeError, ValueError):
+        return missing
+
+
+class PairSnapshot:
+    """One observation of a pair; `ts` is when it was observed, in milliseconds."""
+
+    __slots__ = ("address", "ts", "has_socials", "pair_created_at") + tuple(field for field, _ in NUMERIC_FIELDS)
+
+    def __init__(self, address=None, ts=None, has_socials=None, pair_created_at=None, **numbers):
+        self.address = address
+        self.ts = now_ms() if ts is None else int(ts)
+        self.has_socials = has_socials
+        self.pair_created_at = pair_created_at
+        for field, dtype in NUMERIC_FIELDS:
+            setattr(self, field, numbers.get(field, MISSING_INT if dtype == "<i4" else MISSING_FLOAT))
+
+    def row(self):
+        """Storage row: `ts` plus every numeric field."""
+        row = {"ts": self.ts}
+        row.update((field, getattr(self, field)) for field, _ in NUMERIC_FIELDS)
+        return row
+
+    @classmethod
+    def from_row(cls, address, row):
+        """Rebuild a snapshot from a stored row (socials and creation time are not stored)."""
+        return cls(address=address, **row)
+
+    def __repr__(self):
+        return (f"PairSnapshot({self.address}, ts={self.ts}, price_usd={self.price_usd}, "
+                f"liquidity_usd={self.liquidity_usd}, has_socials={self.has_socials})")
+
+
+def parse_pair(pair, address=None, ts=None):
+    """Parse one entry of a response's `pairs` list."""
+    txns = pair.get("txns") or {}
+    volume = pair.get("volume") or {}
+    raw = {
+        "price_usd": pair.get("priceUsd"),
+        "fdv": pair.get("fdv"),
+        "market_cap": pair.get("marketCap"),
+        "liquidity_usd": (pair.get("liquidity") or {}).get("usd"),
+    }
+    for window in WINDOWS:
+        raw[f"buys_{window}"] = (txns.get(window) or {}).get("buys")
+        raw[f"sells_{window}"] = (txns.get(window) or {}).get("sells")
+        raw[f"volume_{window}"] = volume.get(window)
+    numbers = {field: to_number(raw[field], dtype) for field, dtype in NUMERIC_FIELDS}
+    return PairSnapshot(
+        address=address or (pair.get("baseToken") or {}).get("address"),
+        ts=ts,
+        has_socials=bool((pair.get("info") or {}).get("socials")),
+        pair_created_at=pair.get("pairCreatedAt"),
+        **numbers,
+    )
+
+
+def parse_response(data, address=None, ts=None):
+    """Parse the first pair of a response, or return None if it has no pairs."""
+    pairs = (data or {}).get("pairs") or []
+    if not pairs:
+        return None
+    return parse_pair(pairs[0], address, ts)
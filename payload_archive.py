@@ -0,0 +1,316 @@
+'''
+Packed archive of raw discovery payloads.
+
+Instead of one `<address>.json` file per coin, payloads are appended as
+compressed records to rolling segment files in an archive directory:
+
+    coin_data/archive/000001.seg, 000002.seg, ...   records
+    coin_data/archive/index.json                    address -> latest record
+
+A record is a small header (payload length, CRC-32, timestamp, address
+length), the address and the zlib-compressed compact JSON payload. Segments
+are append-only; a new one is started once the current one passes
+SEGMENT_BYTES. The index maps every address to its latest record, so `get`
+is a single positioned read; it is saved on `close` and, on open, the
+records written after the saved position are scanned back in (a torn record
+at the end of the last segment, e.g. after a crash, is cut off).
+
+Readers that may run next to the writing process (replay, the fake server,
+analytics, the get / stats commands) open archives with `readonly=True`:
+they never truncate a segment or rewrite the index, and just stop at a
+record that is still being written.
+
+Several processes can write the same archive (dex_scrapper.py,
+coin_data_json_format.py and `migrate` all use ./coin_data/archive). Writers
+hold an exclusive lock on archive/.lock while they append or save the index;
+under it they first index the records the others appended since they last
+looked, so offsets come from the file as it is on disk and the saved index
+covers every writer's records.
+
+    python payload_archive.py migrate ./coin_data ./test_coin_data --delete
+    python payload_archive.py get <address> --archive ./test_coin_data/archive
+    python payload_archive.py stats --archive ./coin_data/archive
+'''
+
+import argparse
+import atexit
+import fcntl
+import glob
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from serialization import dumps, loads, write_json
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+COMPRESS_LEVEL = 6
+# payload length, CRC-32 of address + payload, timestamp (ms), address length
+RECORD_HEADER = struct.Struct("<IIqH")
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+
+
+def segment_name(number):
+    return f"{number:06d}.seg"
+
+
+def read_records(path, start=0):
+    """
+    Yield (offset, length, address, ts, compressed payload) for each record
+    of a segment file from `start`, stopping at the first torn or corrupt one.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        offset = start
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            size, crc, ts, address_size = RECORD_HEADER.unpack(header)
+            body = file.read(address_size + size)
+            if len(body) < address_size + size or zlib.crc32(body) != crc:
+                return
+            length = RECORD_HEADER.size + len(body)
+            yield offset, length, body[:address_size].decode(), ts, body[address_size:]
+            offset += length
+
+
+class PayloadArchive:
+    """Append-only segment files with an in-memory address -> latest record index."""
+
+    def __init__(self, root, segment_bytes=SEGMENT_BYTES, readonly=False):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.index = {}  # address -> [segment number, offset, length, ts]
+        self.segment = 1
+        self.position = (0, 0)  # (segment, offset) the index covers the records up to
+        self.file = None  # current segment, opened for appending on first write
+        self.readers = {}  # segment number -> read-only file descriptor
+        self.dirty = False
+        if not readonly:
+            os.makedirs(root, exist_ok=True)
+        self.load_index()
+        atexit.register(self.close)
+
+    def segment_path(self, number):
+        return os.path.join(self.root, segment_name(number))
+
+    def segments(self):
+        """Numbers of the segment files on disk, in order."""
+        names = glob.glob(os.path.join(self.root, "*.seg"))
+        return sorted(int(os.path.basename(name)[:-4]) for name in names)
+
+    @contextmanager
+    def locked(self):
+        """Hold the archive lock against other threads and other writing processes."""
+        with self.lock, open(os.path.join(self.root, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file is closed
+            yield
+
+    def load_index(self):
+        """Load the saved index, then scan in any records written after it was saved."""
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), "rb") as file:
+                saved = loads(file.read())
+            self.index = saved["entries"]
+            self.position = tuple(saved["position"])
+        except (OSError, ValueError, KeyError, TypeError):
+            self.index = {}
+            self.position = (0, 0)
+        if self.readonly:
+            self.catch_up()
+            return
+        with self.locked():
+            self.catch_up()
+            number, end = self.position
+            path = self.segment_path(number)
+            if number and end < os.path.getsize(path):
+                # A torn write at the tail: drop it so appends start clean
+                with open(path, "r+b") as file:
+                    file.truncate(end)
+
+    def catch_up(self):
+        """Index the records appended after `position`, by this or another process."""
+        number, start = self.position
+        for segment in self.segments():
+            if segment < number:
+                continue
+            end = start if segment == number else 0
+            for offset, length, address, ts, _ in read_records(self.segment_path(segment), end):
+                self.index[address] = [segment, offset, length, ts]
+                end = offset + length
+                self.dirty = True
+            self.position = (segment, end)
+        self.segment = max(self.position[0], 1)
+
+    def save_index(self):
+        """Write the index and the position it covers up to."""
+        if self.readonly:
+            raise ValueError(f"archive {self.root} is open read-only")
+        with self.locked():
+            if self.file:
+                self.file.flush()
+            self.catch_up()  # so the index written covers the other writers' records too
+            write_json(os.path.join(self.root, INDEX_FILE),
+                       {"position": list(self.position), "entries": self.index}, pretty=False)
+            self.dirty = False
+
+    def append(self, address, payload, ts=None):
+        """Append a payload for `address`; it becomes the one `get` returns."""
+        if self.readonly:
+            raise ValueError(f"archive {self.root} is open read-only")
+        ts = int(time.time() * 1000) if ts is None else ts
+        address_bytes = address.encode()
+        body = address_bytes + zlib.compress(dumps(payload, pretty=False), COMPRESS_LEVEL)
+        header = RECORD_HEADER.pack(len(body) - len(address_bytes), zlib.crc32(body), ts, len(address_bytes))
+        length = len(header) + len(body)
+        with self.locked():
+            self.catch_up()
+            if self.file is not None and self.file.name != self.segment_path(self.segment):
+                self.file.close()  # another writer has started a newer segment
+                self.file = None
+            if self.file is None:
+                self.file = open(self.segment_path(self.segment), "ab")
+            size = os.fstat(self.file.fileno()).st_size
+            if self.position[0] == self.segment and size > self.position[1]:
+                # Left by a writer that died mid-record; nobody else writes while we hold the lock
+                self.file.truncate(self.position[1])
+                size = self.position[1]
+            if size and size + length > self.segment_bytes:
+                self.file.close()
+                self.segment += 1
+                self.file = open(self.segment_path(self.segment), "ab")
+                size = 0
+            self.file.write(header + body)
+            self.file.flush()  # so readers see the record straight away
+            self.index[address] = [self.segment, size, length, ts]
+            self.position = (self.segment, size + length)
+            self.dirty = True
+
+    def reader(self, number):
+        if number not in self.readers:
+            self.readers[number] = os.open(self.segment_path(number), os.O_RDONLY)
+        return self.readers[number]
+
+    def get(self, address):
+        """The latest payload saved for `address`, or None."""
+        with self.lock:
+            entry = self.index.get(address)
+            if entry is None:
+                return None
+            number, offset, length, _ = entry
+            record = os.pread(self.reader(number), length, offset)
+        _, _, _, address_size = RECORD_HEADER.unpack_from(record)
+        return loads(zlib.decompress(record[RECORD_HEADER.size + address_size:]))
+
+    def saved_at(self, address):
+        """Timestamp (ms) of the latest payload for `address`, or None."""
+        entry = self.index.get(address)
+        return entry[3] if entry else None
+
+    def __contains__(self, address):
+        return address in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def addresses(self):
+        return list(self.index)
+
+    def scan(self, latest_only=False):
+        """
+        Yield (address, ts, payload) for every record in write order.
+
+        With `latest_only`, superseded payloads of an address are skipped.
+        """
+        with self.lock:
+            if self.file:
+                self.file.flush()
+            segments = self.segments()
+        for number in segments:
+            for offset, _, address, ts, compressed in read_records(self.segment_path(number)):
+                if latest_only and self.index.get(address, [None, None])[:2] != [number, offset]:
+                    continue
+                yield address, ts, loads(zlib.decompress(compressed))
+
+    def stats(self):
+        segments = self.segments()
+        return {
+            "addresses": len(self.index),
+            "segments": len(segments),
+            "bytes": sum(os.path.getsize(self.segment_path(number)) for number in segments),
+        }
+
+    def close(self):
+        """Save the index (if anything changed) and close the segment files."""
+        if self.dirty and not self.readonly:
+            self.save_index()
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+            for fd in self.readers.values():
+                os.close(fd)
+            self.readers = {}
+
+
+def migrate(directory, archive=None, delete=False):
+    """
+    Append every `<address>.json` payload in `directory` to its archive.
+
+    The file's modification time becomes the record timestamp. State files
+    (plain lists of addresses) are left alone, and files already packed are
+    not appended again. Returns (files packed, their bytes, archive bytes).
+    """
+    if archive is None:  # an empty archive is falsy (len 0)
+        archive = PayloadArchive(os.path.join(directory, "archive"))
+    migrated, source_bytes = [], 0
+    for path in sorted(glob.glob(os.path.join(directory, "*.json")), key=os.path.getmtime):
+        try:
+            with open(path, "rb") as file:
+                raw = file.read()
+            data = loads(raw)
+        except (OSError, ValueError):
+            continue
+        if not (isinstance(data, dict) and "pairs" in data):
+            continue
+        address = os.path.splitext(os.path.basename(path))[0]
+        ts = int(os.path.getmtime(path) * 1000)
+        if (archive.saved_at(address) or 0) < ts:  # re-running skips what is already packed
+            archive.append(address, data, ts=ts)
+        migrated.append(path)
+        source_bytes += len(raw)
+    archive.save_index()
+    if delete:
+        for path in migrated:
+            os.remove(path)
+    return len(migrated), source_bytes, archive.stats()["bytes"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or build packed payload archives.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="pack the <address>.json files of directories")
+    migrate_parser.add_argument("directories", nargs="*", default=["./coin_data", "./test_coin_data"])
+    migrate_parser.add_argument("--delete", action="store_true", help="remove the files once packed")
+    get_parser = subparsers.add_parser("get", help="print the latest payload of an address")
+    get_parser.add_argument("address")
+    get_parser.add_argument("--archive", default="./test_coin_data/archive")
+    stats_parser = subparsers.add_parser("stats", help="print the size of an archive")
+    stats_parser.add_argument("--archive", default="./test_coin_data/archive")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        for directory in args.directories:
+            count, before, after = migrate(directory, delete=args.delete)
+            print(f"{directory}: packed {count} files, {before} bytes -> archive of {after} bytes.")
+    elif args.command == "get":
+        payload = PayloadArchive(args.archive, readonly=True).get(args.address)
+        print(dumps(payload, pretty=True).decode() if payload is not None else "Not found.")
+    else:
+        print(PayloadArchive(args.archive, readonly=True).stats())
@@ -0,0 +1,211 @@
+'''
+Shared adaptive rate limiting for the Birdeye and Dex Screener clients.
+
+Every upstream gets one token bucket (see get_limiter) that all fetch paths in
+the process draw from. The bucket slows down multiplicatively on 429 / 5xx
+responses, honours Retry-After, and creeps back up towards the configured
+quota while responses are healthy, so we run right at the limit without
+getting throttled. Every request also gets a deadline-bound timeout, a
+circuit breaker check and, optionally, a hedged duplicate (see
+resilience.py).
+'''
+
+import asyncio
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+from metrics import upstream_request_seconds, upstream_responses
+from resilience import (CONNECT_TIMEOUT, HEDGE_REQUESTS, get_breaker, get_latency, hedged_call,
+                        hedged_call_async, request_timeout)
+from serialization import loads
+
+# Requests per second per upstream (Dex Screener allows 300 requests per minute)
+UPSTREAM_RATES = {
+    "dexscreener": float(os.getenv("DEX_SCREENER_RATE_LIMIT", "5")),
+    "birdeye": float(os.getenv("BIRDEYE_RATE_LIMIT", "1")),
+}
+
+MAX_THROTTLE_RETRIES = 3   # re-send a request this many times after a 429
+DECREASE_FACTOR = 0.5      # rate multiplier on 429 / 5xx
+INCREASE_FRACTION = 0.05   # of the max rate, added back per healthy response
+DECREASE_COOLDOWN = 1.0    # seconds; one burst of 429s only halves the rate once
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate adapts to upstream feedback (AIMD)."""
+
+    def __init__(self, rate, burst=None, min_rate=None, clock=time.monotonic, name=None):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 20
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self.last_decrease = float("-inf")
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take one token and return how long the caller must wait before sending."""
+        with self.lock:
+            now = self.clock()
+            self.refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """Take a token only if one is available right now (used for hedged requests)."""
+        with self.lock:
+            now = self.clock()
+            self.refill(now)
+            if self.tokens < 1 or now < self.blocked_until:
+                return False
+            self.tokens -= 1
+            return True
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, status, retry_after=None):
+        """Adapt the rate to one response status (and its Retry-After header)."""
+        with self.lock:
+            now = self.clock()
+            if status == 429 or status >= 500:
+                delay = parse_retry_after(retry_after)
+                if delay:
+                    self.blocked_until = max(self.blocked_until, now + delay)
+                if now - self.last_decrease >= DECREASE_COOLDOWN:
+                    self.refill(now)
+                    self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+                    self.tokens = min(self.tokens, 0.0)
+                    self.last_decrease = now
+            elif status < 400:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * INCREASE_FRACTION)
+
+
+limiters = {}
+limiters_lock = threading.Lock()
+
+
+def get_limiter(upstream):
+    """Return the process-wide limiter for an upstream, creating it on first use."""
+    with limiters_lock:
+        if upstream not in limiters:
+            limiters[upstream] = AdaptiveRateLimiter(UPSTREAM_RATES.get(upstream, 1.0), name=upstream)
+        return limiters[upstream]
+
+
+def limited_get(limiter, http, url, hedge=HEDGE_REQUESTS, **kwargs):
+    """
+    `requests`-style GET that waits for the limiter and re-sends after a 429.
+
+    The request times out with the current deadline (see resilience.py),
+    fails fast while the upstream's circuit is open and, with `hedge`, is
+    duplicated when it is slower than usual. Returns the last response; the
+    caller still calls raise_for_status().
+    """
+    breaker, latency = get_breaker(limiter.name), get_latency(limiter.name)
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        # Checked first, so failing fast does not use up a rate-limit token
+        probe = breaker.allow()
+        try:
+            limiter.acquire()
+            timeout = request_timeout()
+            send = lambda: http.get(url, timeout=(min(CONNECT_TIMEOUT, timeout), timeout), **kwargs)
+            started = time.perf_counter()
+            try:
+                if hedge:
+                    response = hedged_call(send, latency.hedge_delay(), limiter.try_acquire, limiter.name)
+                else:
+                    response = send()
+            except Exception:
+                breaker.record_failure()
+                upstream_responses.inc(upstream=limiter.name, status="error")
+                raise
+            breaker.record_status(response.status_code)
+        finally:
+            if probe:
+                breaker.release_probe()  # no-op once an outcome was recorded
+        elapsed = time.perf_counter() - started
+        latency.observe(elapsed)
+        upstream_request_seconds.observe(elapsed, upstream=limiter.name)
+        upstream_responses.inc(upstream=limiter.name, status=response.status_code)
+        limiter.record(response.status_code, response.headers.get("Retry-After"))
+        if response.status_code != 429:
+            break
+    return response
+
+
+async def limited_get_json_async(limiter, session, url, hedge=HEDGE_REQUESTS, **kwargs):
+    """aiohttp GET that waits for the limiter, re-sends after a 429 and decodes the JSON body."""
+    breaker, latency = get_breaker(limiter.name), get_latency(limiter.name)
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        probe = breaker.allow()
+        try:
+            await limiter.acquire_async()
+            timeout = request_timeout()
+
+            async def send():
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as response:
+                    data = await response.json(loads=loads, content_type=None) if response.status < 400 else None
+                    return response, data
+
+            started = time.perf_counter()
+            try:
+                if hedge:
+                    response, data = await hedged_call_async(send, latency.hedge_delay(), limiter.try_acquire,
+                                                             limiter.name)
+                else:
+                    response, data = await send()
+            except Exception:
+                breaker.record_failure()
+                upstream_responses.inc(upstream=limiter.name, status="error")
+                raise
+            breaker.record_status(response.status)
+        finally:
+            # A cancelled probe records nothing; free the half-open slot for the next request
+            if probe:
+                breaker.release_probe()
+        elapsed = time.perf_counter() - started
+        latency.observe(elapsed)
+        upstream_request_seconds.observe(elapsed, upstream=limiter.name)
+        upstream_responses.inc(upstream=limiter.name, status=response.status)
+        limiter.record(response.status, response.headers.get("Retry-After"))
+        if response.status == 429 and attempt < MAX_THROTTLE_RETRIES:
+            continue
+        response.raise_for_status()
+        return data
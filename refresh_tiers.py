@@ -0,0 +1,150 @@
+'''
+Activity-tiered refresh scheduling for the watchlist.
+
+Each coin is put into a tier from its latest txns.m5 and volume.m5: hot coins
+are refreshed every few seconds, warm ones every half minute and dead ones
+every few minutes. Every refresh re-classifies the coin, so it moves between
+tiers as its activity changes. Coins without data yet start hot, so new
+additions are looked at straight away.
+
+Due coins are fetched in batches of up to 30 addresses, and a partial batch
+is topped up with the coins due next, which refreshes them early for free.
+At most MAX_BATCHES_PER_CYCLE batches are handed out at once; the rest stay
+due for the next cycle, so a startup with the whole watchlist hot and due
+is spread out instead of fetched in one burst.
+
+Live refreshes bypass the tokens cache (see dex_client.fetch_tokens_async),
+so the hot interval is a real refresh rate.
+'''
+
+import heapq
+import math
+import time
+
+from dex_client import TOKENS_BATCH_LIMIT
+
+MAX_BATCHES_PER_CYCLE = 10
+
+# Tier -> seconds between refreshes
+TIER_INTERVALS = {
+    "hot": 3,
+    "warm": 30,
+    "cold": 5 * 60,
+}
+
+# Tier -> (min txns.m5, min volume.m5 in USD); a coin meeting either goes in the tier
+TIER_THRESHOLDS = {
+    "hot": (50, 10000),
+    "warm": (5, 500),
+}
+
+
+def classify(snapshot, thresholds=TIER_THRESHOLDS):
+    """Tier of a coin from its latest PairSnapshot (None means no data: cold)."""
+    if snapshot is None:
+        return "cold"
+    txns = max(snapshot.buys_m5, 0) + max(snapshot.sells_m5, 0)
+    volume = snapshot.volume_m5 if not math.isnan(snapshot.volume_m5) else 0.0
+    for tier in ("hot", "warm"):
+        min_txns, min_volume = thresholds[tier]
+        if txns >= min_txns or volume >= min_volume:
+            return tier
+    return "cold"
+
+
+class TieredScheduler:
+    """Min-heap of (due time, address) with lazy deletion, one tier per address."""
+
+    def __init__(self, intervals=TIER_INTERVALS, thresholds=TIER_THRESHOLDS,
+                 batch_size=TOKENS_BATCH_LIMIT, max_batches=MAX_BATCHES_PER_CYCLE, clock=time.monotonic):
+        self.intervals = intervals
+        self.thresholds = thresholds
+        self.batch_size = batch_size
+        self.max_due = batch_size * max_batches
+        self.clock = clock
+        self.heap = []
+        self.due = {}    # address -> due time
+        self.tiers = {}  # address -> tier
+        self.promotions = 0
+        self.demotions = 0
+
+    def __len__(self):
+        return len(self.due)
+
+    def schedule(self, address, due):
+        self.due[address] = due
+        heapq.heappush(self.heap, (due, address))
+
+    def sync(self, addresses):
+        """
+        Track exactly `addresses`: new ones are due now (hot), removed ones are dropped.
+
+        Returns the removed addresses, so callers can drop their own per-coin state.
+        """
+        addresses = set(addresses)
+        removed = [address for address in self.due if address not in addresses]
+        for address in removed:
+            del self.due[address]
+            self.tiers.pop(address, None)
+        now = self.clock()
+        for address in addresses - self.due.keys():
+            self.tiers[address] = "hot"
+            self.schedule(address, now)
+        return removed
+
+    def pop_due(self):
+        """
+        Hand out the addresses due now (at most max_batches batches), topping
+        the last batch up with the ones due next.
+
+        Handed-out addresses are rescheduled one interval of their tier later,
+        so a failed lookup is simply tried again then; `observe` reschedules
+        them from their new tier.
+        """
+        now = self.clock()
+        picked = {}  # insertion-ordered set
+        while self.heap:
+            due_time, address = self.heap[0]
+            if self.due.get(address) != due_time or address in picked:
+                heapq.heappop(self.heap)  # stale or duplicate heap item
+                continue
+            if len(picked) >= self.max_due or (due_time > now and len(picked) % self.batch_size == 0):
+                break
+            heapq.heappop(self.heap)
+            picked[address] = None
+        for address in picked:
+            self.schedule(address, now + self.intervals[self.tiers[address]])
+        # Drop stale items once they outnumber live ones, keeping the heap bounded
+        if len(self.heap) > 2 * len(self.due) + 64:
+            self.heap = [(due, address) for address, due in self.due.items()]
+            heapq.heapify(self.heap)
+        return list(picked)
+
+    def observe(self, address, snapshot):
+        """Re-tier an address from the snapshot just fetched and schedule its next refresh."""
+        if address not in self.due:
+            return
+        tier = classify(snapshot, self.thresholds)
+        previous = self.tiers[address]
+        if tier != previous:
+            order = list(self.intervals)
+            if order.index(tier) < order.index(previous):
+                self.promotions += 1
+            else:
+                self.demotions += 1
+            self.tiers[address] = tier
+        self.schedule(address, self.clock() + self.intervals[tier])
+
+    def next_wake(self):
+        """Seconds until the earliest refresh is due (None if nothing is tracked)."""
+        while self.heap and self.due.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)  # stale heap item
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - self.clock())
+
+    def stats(self):
+        counts = {tier: 0 for tier in self.intervals}
+        for tier in self.tiers.values():
+            counts[tier] += 1
+        return {**counts, "promotions": self.promotions, "demotions": self.demotions}
@@ -0,0 +1,307 @@
+'''
+Replay recorded history through the screening filter and analytics signals.
+
+Evaluates a filter (filters.json, or any file passed with --filter) against
+everything recorded so far, instead of running it live for days:
+
+    snapshot store     snapshot_data/<address>/...     refresh history
+    CSV history        test_coin_data/*.csv            ad-hoc exports
+    payload archives   {test_,}coin_data/archive/      discovery payloads
+    JSON fixtures      {test_,}coin_data/<address>.json
+
+Each source is a generator of (address, part) items, grouped per address;
+history in the snapshot store and CSVs is only read by the worker that
+replays the address. Workers are spawned processes, like in
+sharded_refresh.py. An address's rows are sorted by time, run through the
+compiled filter in one vectorized pass (age is taken at each row's own
+time) and through the analytics signals, with momentum from the row's own
+history.
+Fields that are not recorded per row (socials, DEX, creation time) come
+from the newest discovery payload of the address, when there is one.
+
+An "entry" is a row where the rule passes after not passing. Entries from
+all workers are merged back into timestamp order; the summary compares the
+forward returns after entries with those after every replayed row.
+
+    python replay.py --filter candidate.json --events
+'''
+
+import argparse
+import glob
+import heapq
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analytics import MOMENTUM_WINDOW, compute_signals
+from filter_engine import FILTERS_FILE, FIELDS, PairFilter, load_filter
+from pair_snapshot import NUMERIC_FIELDS, to_number
+from payload_archive import PayloadArchive
+from serialization import loads
+from snapshot_store import SNAPSHOT_DIR, SnapshotStore, read_csv_history
+
+DATA_DIRS = ["./test_coin_data", "./coin_data"]
+
+# Forward return horizons (milliseconds) measured after each entry
+HORIZONS = {"5m": 5 * 60 * 1000, "1h": 60 * 60 * 1000, "24h": 24 * 60 * 60 * 1000}
+
+# Signals reported with each entry
+ENTRY_SIGNALS = ("buy_sell_m5", "volume_acceleration", "momentum", "liquidity_to_fdv")
+
+
+def payload_columns(payload, ts):
+    """One-row series (and the raw pair) for a saved lookup result, or (None, None) without pairs."""
+    pairs = (payload or {}).get("pairs") or []
+    if not pairs:
+        return None, None
+    pair = pairs[0]
+    columns = {"ts": np.array([ts], dtype="<i8")}
+    for field, _ in NUMERIC_FIELDS:
+        columns[field] = np.array([to_number(FIELDS[field][1](pair), "<f8")])
+    return columns, pair
+
+
+def store_series(root=SNAPSHOT_DIR):
+    """Yield (address, ("store", root)): the history is read in the worker."""
+    for address in SnapshotStore(root).addresses():
+        yield address, ("store", root)
+
+
+def csv_series(dirs=DATA_DIRS):
+    """Yield (address, ("csv", path)) for every CSV export with price history."""
+    for directory in dirs:
+        for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+            with open(path, newline="") as file:
+                header = file.readline()
+            if "Price (USD)" in header:
+                address = os.path.splitext(os.path.basename(path))[0]
+                yield address, ("csv", path)
+
+
+def archive_series(dirs=DATA_DIRS):
+    """Yield (address, ("rows", columns, pair)) for every archived payload."""
+    for directory in dirs:
+        root = os.path.join(directory, "archive")
+        if not os.path.isdir(root):
+            continue
+        archive = PayloadArchive(root, readonly=True)
+        for address, ts, payload in archive.scan():
+            columns, pair = payload_columns(payload, ts)
+            if columns is not None:
+                yield address, ("rows", columns, pair)
+        archive.close()
+
+
+def fixture_series(dirs=DATA_DIRS):
+    """Yield (address, ("rows", columns, pair)) for every `<address>.json` payload (timed by mtime)."""
+    for directory in dirs:
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            try:
+                with open(path, "rb") as file:
+                    payload = loads(file.read())
+            except (OSError, ValueError):
+                continue
+            if isinstance(payload, dict):
+                columns, pair = payload_columns(payload, int(os.path.getmtime(path) * 1000))
+                if columns is not None:
+                    yield os.path.splitext(os.path.basename(path))[0], ("rows", columns, pair)
+
+
+SOURCES = {
+    "store": lambda args: store_series(args.store),
+    "csv": lambda args: csv_series(args.data),
+    "archive": lambda args: archive_series(args.data),
+    "fixtures": lambda args: fixture_series(args.data),
+}
+
+
+def group_by_address(items):
+    """Collect the parts of every address from the source generators."""
+    parts = {}
+    for address, part in items:
+        parts.setdefault(address, []).append(part)
+    return parts
+
+
+def load_parts(address, parts):
+    """Merge every part of an address into time-sorted float columns plus its newest raw pair."""
+    pieces, pair, pair_ts = [], None, None
+    for part in parts:
+        if part[0] == "store":
+            columns = SnapshotStore(part[1]).read_range(address)
+        elif part[0] == "csv":
+            _, columns = read_csv_history(part[1], address)
+        else:
+            columns = part[1]
+            if pair_ts is None or columns["ts"][0] >= pair_ts:
+                pair, pair_ts = part[2], columns["ts"][0]
+        if columns is not None and len(columns["ts"]):
+            pieces.append(columns)
+    if not pieces:
+        return None, pair
+    ts = np.concatenate([np.asarray(piece["ts"], dtype="<i8") for piece in pieces])
+    order = np.argsort(ts, kind="stable")
+    merged = {"ts": ts[order]}
+    for field, dtype in NUMERIC_FIELDS:
+        values = np.concatenate([np.asarray(piece[field], dtype=float) for piece in pieces])[order]
+        if dtype == "<i4":
+            values[values < 0] = np.nan  # missing counts are stored as -1
+        merged[field] = values
+    # The same observation can come from several sources; keep the first row per timestamp
+    keep = np.concatenate([[True], np.diff(merged["ts"]) > 0])
+    return {field: column[keep] for field, column in merged.items()}, pair
+
+
+def value_at(ts, values, at):
+    """values at the first row with ts >= at (NaN past the end)."""
+    index = np.searchsorted(ts, at, "left")
+    result = np.full(len(at), np.nan)
+    inside = index < len(ts)
+    result[inside] = values[index[inside]]
+    return result
+
+
+def forward_returns(ts, price, rows=None):
+    """Price change from each row (or just `rows`) to the first row at least each horizon later."""
+    rows = np.arange(len(ts)) if rows is None else rows
+    returns = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name, horizon in HORIZONS.items():
+            ahead = value_at(ts, price, ts[rows] + horizon)
+            change = ahead / price[rows] - 1
+            change[~np.isfinite(change)] = np.nan
+            returns[name] = change
+    return returns
+
+
+pair_filter = None
+
+
+def init_worker(spec):
+    global pair_filter
+    pair_filter = PairFilter(spec)
+
+
+def replay_address(task):
+    """Replay one address; returns its entries and return totals (runs in a worker)."""
+    address, parts = task
+    columns, pair = load_parts(address, parts)
+    if columns is None:
+        return {"address": address, "rows": 0, "entries": [], "returns": {}}
+    ts, n = columns["ts"], len(columns["ts"])
+
+    # Per-row fields from the history, static ones from the newest discovery payload
+    filter_columns = {field: columns[field] for field in pair_filter.needed_fields() if field in columns}
+    if pair is not None:
+        static = pair_filter.columns([pair])
+        for field in pair_filter.needed_fields() - filter_columns.keys():
+            filter_columns[field] = np.repeat(static[field], n)
+    passed = pair_filter.mask_columns(filter_columns, n, now=ts / 1000)
+
+    # Momentum over each row's own trailing window, as analytics does for the latest row
+    columns["price_before"] = value_at(ts, columns["price_usd"], ts - MOMENTUM_WINDOW)
+    signals = compute_signals(columns)
+
+    entries_index = np.flatnonzero(passed & ~np.concatenate([[False], passed[:-1]]))
+    entry_returns = forward_returns(ts, columns["price_usd"], entries_index)
+    all_returns = forward_returns(ts, columns["price_usd"])
+    entries = [
+        (int(ts[i]), address, {
+            "price_usd": float(columns["price_usd"][i]),
+            **{name: float(signals[name][i]) for name in ENTRY_SIGNALS},
+            **{f"return_{name}": float(entry_returns[name][k]) for name in HORIZONS},
+        })
+        for k, i in enumerate(entries_index)
+    ]
+    totals = {}
+    for name in HORIZONS:
+        for kind, values in (("entry", entry_returns[name]), ("all", all_returns[name])):
+            finite = values[np.isfinite(values)]
+            totals[(kind, name)] = (float(finite.sum()), len(finite))
+    return {"address": address, "rows": n, "passed_rows": int(passed.sum()),
+            "entries": entries, "returns": totals}
+
+
+def replay(parts, spec, workers=None):
+    """
+    Replay every address; yields per-address results as they finish.
+
+    With one worker everything runs in this process.
+    """
+    tasks = sorted(parts.items())
+    if workers == 1 or len(tasks) < 2:
+        init_worker(spec)
+        yield from map(replay_address, tasks)
+        return
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (workers * 4))
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker, initargs=(spec,)) as pool:
+        yield from pool.map(replay_address, tasks, chunksize=chunksize)
+
+
+def summarize(results, show_events=False):
+    """Merge the entries of all addresses in timestamp order and print the totals."""
+    rows = passed_rows = addresses = 0
+    entry_streams, returns = [], {}
+    for result in results:
+        addresses += 1
+        rows += result["rows"]
+        passed_rows += result.get("passed_rows", 0)
+        entry_streams.append(result["entries"])
+        for key, (total, count) in result["returns"].items():
+            previous = returns.get(key, (0.0, 0))
+            returns[key] = (previous[0] + total, previous[1] + count)
+
+    entries = 0
+    hit_addresses = set()
+    for ts, address, entry in heapq.merge(*entry_streams, key=lambda entry: entry[0]):
+        entries += 1
+        hit_addresses.add(address)
+        if show_events:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts / 1000))
+            details = " ".join(f"{name}={value:.4g}" for name, value in entry.items())
+            print(f"{when} {address} {details}")
+    return {
+        "addresses": addresses,
+        "rows": rows,
+        "passed_rows": passed_rows,
+        "entries": entries,
+        "addresses_entered": len(hit_addresses),
+        "mean_returns": {
+            f"{kind}_{name}": (total / count if count else None, count)
+            for (kind, name), (total, count) in sorted(returns.items())
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded history through a screening filter.")
+    parser.add_argument("--filter", default=FILTERS_FILE, help="filter file to evaluate")
+    parser.add_argument("--sources", default=",".join(SOURCES), help="comma-separated: " + ", ".join(SOURCES))
+    parser.add_argument("--data", action="append", help="data directory (repeatable)")
+    parser.add_argument("--store", default=SNAPSHOT_DIR, help="snapshot store directory")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--events", action="store_true", help="print every entry in timestamp order")
+    args = parser.parse_args()
+    args.data = args.data or DATA_DIRS
+
+    started = time.perf_counter()
+    spec = load_filter(args.filter).spec
+    parts = group_by_address(item for name in args.sources.split(",") for item in SOURCES[name](args))
+    summary = summarize(replay(parts, spec, args.workers), args.events)
+    elapsed = time.perf_counter() - started
+
+    print(f"Replayed {summary['rows']} rows of {summary['addresses']} addresses in {elapsed:.2f}s "
+          f"({summary['rows'] / elapsed if elapsed else 0:.0f} rows/s)")
+    print(f"Rule passed on {summary['passed_rows']} rows; {summary['entries']} entries "
+          f"over {summary['addresses_entered']} addresses")
+    for name in HORIZONS:
+        entry, entry_count = summary["mean_returns"].get(f"entry_{name}", (None, 0))
+        base, base_count = summary["mean_returns"].get(f"all_{name}", (None, 0))
+        fmt = lambda value: "   n/a" if value is None else f"{value:+6.2%}"
+        print(f"{name:>4} forward return   after entries {fmt(entry)} (n={entry_count})   "
+              f"after any row {fmt(base)} (n={base_count})")
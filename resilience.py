@@ -0,0 +1,319 @@
+'''
+Deadlines, hedged requests and circuit breakers for the upstream clients.
+
+Every request made through rate_limiter.limited_get / limited_get_json_async
+gets a timeout: REQUEST_TIMEOUT, cut down to whatever is left of the
+current deadline. A deadline is set per cycle (see `deadline` and
+`within_deadline`), so one hung connection can cost at most the rest of its
+cycle instead of freezing the loop; once the deadline has passed, further
+requests in that cycle fail fast with DeadlineExceeded.
+
+Each upstream has a circuit breaker. After FAILURE_THRESHOLD consecutive
+failures (connection errors, timeouts, 5xx) it opens and requests fail
+immediately with CircuitOpenError; after RESET_TIMEOUT seconds a single
+probe request is let through, which closes the circuit again on success
+or re-opens it on failure.
+
+With DEX_HEDGE_REQUESTS=1, a request that has not answered within the
+upstream's recent p95 latency is sent a second time (only if the rate
+limiter has a token to spare) and whichever answers first wins.
+
+    python resilience.py   # check all three against a fault-injecting fake_server
+'''
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import requests
+
+from metrics import circuit_state, hedged_requests
+
+REQUEST_TIMEOUT = float(os.getenv("DEX_REQUEST_TIMEOUT", "10"))  # seconds, when no deadline is tighter
+CONNECT_TIMEOUT = 3.05
+
+FAILURE_THRESHOLD = 5      # consecutive failures that open a circuit
+RESET_TIMEOUT = 30.0       # seconds an open circuit waits before probing
+
+HEDGE_REQUESTS = os.getenv("DEX_HEDGE_REQUESTS", "") not in ("", "0")
+HEDGE_QUANTILE = 0.95      # hedge once a request is slower than this share of recent ones
+HEDGE_DEFAULT_DELAY = 1.0  # seconds, until enough latencies have been seen
+HEDGE_MIN_DELAY = 0.05
+LATENCY_SAMPLES = 200
+MIN_LATENCY_SAMPLES = 20
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The cycle's deadline passed before the request could be sent."""
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The upstream's circuit is open; the request was not sent."""
+
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """Give every request made inside the block at most `seconds` in total (nested deadlines only shrink)."""
+    at = time.monotonic() + seconds
+    outer = current_deadline.get()
+    token = current_deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def within_deadline(seconds):
+    """Decorator: run each call of a function (or coroutine function) under `deadline(seconds)`."""
+    def decorate(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper_async(*args, **kwargs):
+                with deadline(seconds):
+                    return await function(*args, **kwargs)
+            return wrapper_async
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one."""
+    at = current_deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def request_timeout(default=REQUEST_TIMEOUT):
+    """Timeout for the next request: `default`, capped by the deadline; raises DeadlineExceeded when it has passed."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("the cycle deadline passed before the request was sent")
+    return min(default, left)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Raise CircuitOpenError unless a request may be sent now.
+
+        Returns True when the request is the half-open probe; the caller must
+        then record its outcome or call release_probe.
+        """
+        with self.lock:
+            if self.state == "open":
+                wait = self.opened_at + self.reset_timeout - self.clock()
+                if wait > 0:
+                    raise CircuitOpenError(f"{self.name} circuit open, next probe in {wait:.1f}s")
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "half_open":
+                if self.probing:
+                    raise CircuitOpenError(f"{self.name} circuit half-open, waiting for the probe")
+                self.probing = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Let another probe through after one ended without an outcome (cancelled, deadline passed)."""
+        with self.lock:
+            if self.state == "half_open":
+                self.probing = False
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Circuit for {self.name} opened after {self.failures} failures.")
+                self.state = "open"
+                self.opened_at = self.clock()
+                self.probing = False
+
+    def record_status(self, status):
+        """Count a response: 5xx is a failure, anything else (429 included) shows the upstream is up."""
+        if status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+class LatencyWindow:
+    """The most recent request latencies of an upstream."""
+
+    def __init__(self, size=LATENCY_SAMPLES):
+        self.samples = deque(maxlen=size)
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+
+    def quantile(self, q):
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self):
+        """How long to wait for the first request before sending a duplicate."""
+        delay = self.quantile(HEDGE_QUANTILE)
+        return HEDGE_DEFAULT_DELAY if delay is None else max(HEDGE_MIN_DELAY, delay)
+
+
+breakers = {}
+latencies = {}
+upstreams_lock = threading.Lock()
+
+
+def get_breaker(upstream):
+    """Return the process-wide circuit breaker for an upstream, creating it on first use."""
+    with upstreams_lock:
+        if upstream not in breakers:
+            breaker = breakers[upstream] = CircuitBreaker(upstream)
+            circuit_state.set_function(lambda: CIRCUIT_STATES[breaker.state], upstream=upstream)
+        return breakers[upstream]
+
+
+def get_latency(upstream):
+    """Return the process-wide latency window for an upstream."""
+    with upstreams_lock:
+        if upstream not in latencies:
+            latencies[upstream] = LatencyWindow()
+        return latencies[upstream]
+
+
+hedge_pool = None
+
+
+def hedged_call(send, hedge_after, may_hedge, upstream=None):
+    """
+    Call `send()`; if it is still running after `hedge_after` seconds and
+    `may_hedge()` agrees, call it again and return the first success.
+
+    The slower call is left to finish in the background.
+    """
+    global hedge_pool
+    with upstreams_lock:
+        if hedge_pool is None:
+            hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+    first = hedge_pool.submit(send)
+    done, _ = wait([first], timeout=hedge_after)
+    if done or not may_hedge():
+        return first.result()
+    hedged_requests.inc(upstream=upstream, outcome="sent")
+    second = hedge_pool.submit(send)
+    pending, error = {first, second}, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    hedged_requests.inc(upstream=upstream, outcome="won")
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def hedged_call_async(send, hedge_after, may_hedge, upstream=None):
+    """Async variant of hedged_call; `send` is a coroutine function and the loser is cancelled."""
+    first = asyncio.ensure_future(send())
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done or not may_hedge():
+        return await first
+    hedged_requests.inc(upstream=upstream, outcome="sent")
+    second = asyncio.ensure_future(send())
+    pending, error = {first, second}, None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        hedged_requests.inc(upstream=upstream, outcome="won")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def check(requests_per_scenario=200):
+    """Exercise deadlines, hedging and the breaker against a local faulty fake_server."""
+    import dex_client
+    import fake_server
+    import rate_limiter
+    # The instance rate_limiter uses, not this file run as __main__
+    from resilience import deadline, get_breaker
+
+    def run(label, hedge=False, budget=None, **faults):
+        server, base_url = fake_server.start_server(fixture_dirs=[], synthetic=50, listing_rate=0, **faults)
+        addresses = list(server.fixtures)
+        dex_client.DEX_SCREENER_BASE_URL = base_url
+        limiter = rate_limiter.AdaptiveRateLimiter(1000, name=f"check-{label}")
+        timings, errors = [], {}
+        started = time.perf_counter()
+        for i in range(requests_per_scenario):
+            url = dex_client.tokens_url([addresses[i % len(addresses)]])
+            begun = time.perf_counter()
+            try:
+                if budget is None:
+                    rate_limiter.limited_get(limiter, requests, url, hedge=hedge)
+                else:
+                    with deadline(budget):
+                        rate_limiter.limited_get(limiter, requests, url, hedge=hedge)
+            except requests.exceptions.RequestException as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            timings.append(time.perf_counter() - begun)
+        server.shutdown()
+        timings.sort()
+        print(f"{label:<22} total {time.perf_counter() - started:6.2f}s   "
+              f"p50 {timings[len(timings) // 2] * 1000:7.1f} ms   "
+              f"p99 {timings[int(len(timings) * 0.99)] * 1000:7.1f} ms   "
+              f"max {timings[-1] * 1000:7.1f} ms   "
+              f"circuit {get_breaker(limiter.name).state:<9} errors {errors}")
+
+    run("hangs, no deadline", hang_rate=0.05, hang_seconds=3)
+    run("hangs, 0.5s deadline", budget=0.5, hang_rate=0.05, hang_seconds=3)
+    run("slow tail", latency=0.02, tail_rate=0.03, tail_latency=0.5)
+    run("slow tail, hedged", hedge=True, latency=0.02, tail_rate=0.03, tail_latency=0.5)
+    run("outage (503s)", outage=(0, 3600))
+
+
+if __name__ == "__main__":
+    check()
@@ -0,0 +1,150 @@
+'''
+In-process TTL response cache with single-flight deduplication.
+
+Lookups are cached per address with a per-endpoint TTL and LRU eviction.
+Concurrent async lookups for the same address (e.g. discovery, the retry
+sweep and the live refresh all asking for a coin that was just added)
+collapse into one upstream request. Hit / miss / coalesced counts are kept
+per endpoint so the TTLs can be tuned, and exported as the
+dex_cache_lookups_total counters of metrics.py.
+'''
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from metrics import cache_entries, cache_lookups
+
+# Seconds a response stays fresh, per endpoint (0 disables caching)
+CACHE_TTLS = {
+    "tokens": float(os.getenv("DEX_TOKENS_CACHE_TTL", "5")),
+}
+MAX_ENTRIES = 10000
+
+MISSING = object()
+
+
+class ResponseCache:
+    """TTL + LRU cache keyed by address, with single-flight async fetches."""
+
+    def __init__(self, ttl, max_entries=MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.inflight = {}            # key -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """Return a fresh cached value (and mark it recently used), or MISSING."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            return MISSING
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.ttl <= 0:
+            return
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_many(self, keys, fetch_many):
+        """
+        Blocking lookup: serve fresh keys from the cache and fetch the rest in one call.
+
+        `fetch_many(keys)` returns a dict; keys it leaves out are not cached.
+        """
+        results, missing = {}, []
+        for key in keys:
+            value = self.get(key)
+            if value is MISSING:
+                self.misses += 1
+                missing.append(key)
+            else:
+                self.hits += 1
+                results[key] = value
+        if missing:
+            fetched = fetch_many(missing)
+            for key, value in fetched.items():
+                self.put(key, value)
+            results.update(fetched)
+        return results
+
+    async def get_many_async(self, keys, fetch_many):
+        """
+        Async lookup with single-flight: keys already being fetched by another
+        caller are awaited instead of requested again.
+        """
+        loop = asyncio.get_running_loop()
+        results, missing, waiting = {}, [], {}
+        for key in keys:
+            value = self.get(key)
+            if value is not MISSING:
+                self.hits += 1
+                results[key] = value
+            elif key in self.inflight:
+                self.coalesced += 1
+                waiting[key] = self.inflight[key]
+            elif key not in waiting and key not in missing:
+                self.misses += 1
+                missing.append(key)
+                self.inflight[key] = loop.create_future()
+
+        if missing:
+            fetched = {}
+            try:
+                fetched = await fetch_many(missing)
+                for key, value in fetched.items():
+                    self.put(key, value)
+                results.update(fetched)
+            finally:
+                # Waiters get None for keys the fetch failed to return
+                for key in missing:
+                    future = self.inflight.pop(key)
+                    if not future.done():
+                        future.set_result(fetched.get(key))
+
+        for key, future in waiting.items():
+            value = await future
+            if value is not None:
+                results[key] = value
+        return results
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
+
+
+caches = {}
+
+
+def get_cache(endpoint):
+    """Return the process-wide cache for an endpoint, creating it on first use."""
+    if endpoint not in caches:
+        cache = caches[endpoint] = ResponseCache(CACHE_TTLS.get(endpoint, 0))
+        for result, count in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced")):
+            cache_lookups.set_function(lambda count=count: getattr(cache, count),
+                                       endpoint=endpoint, result=result)
+        cache_entries.set_function(lambda: len(cache.entries), endpoint=endpoint)
+    return caches[endpoint]
+
+
+def cache_stats():
+    """Stats for every endpoint cache, keyed by endpoint."""
+    return {endpoint: cache.stats() for endpoint, cache in caches.items()}
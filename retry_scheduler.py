@@ -0,0 +1,102 @@
+'''
+Backoff-aware retry scheduling for addresses that had no Dex Screener data.
+
+Each address keeps its own next-due time in a heap. Every time it comes due
+it is handed out for one retry and immediately rescheduled with exponential
+backoff plus jitter, so a token listed seconds ago is retried often while one
+that has had no data for an hour is barely touched. Addresses older than the
+TTL are expired, and each cycle hands out at most `max_per_cycle` addresses.
+'''
+
+import heapq
+import random
+import time
+
+RETRY_BASE_DELAY = 5        # seconds before the first retry
+RETRY_MAX_DELAY = 15 * 60   # cap for the backoff delay
+RETRY_JITTER = 0.2          # +/- fraction applied to every delay
+RETRY_TTL = 24 * 60 * 60    # give up on an address after this many seconds
+MAX_RETRIES_PER_CYCLE = 30  # one batched Dex Screener request
+
+
+class RetryEntry:
+    __slots__ = ("first_seen", "attempts", "due")
+
+    def __init__(self, first_seen, due):
+        self.first_seen = first_seen
+        self.attempts = 0
+        self.due = due
+
+
+class RetryScheduler:
+    """Min-heap of (due time, address) with lazy deletion."""
+
+    def __init__(self, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 jitter=RETRY_JITTER, ttl=RETRY_TTL, max_per_cycle=MAX_RETRIES_PER_CYCLE,
+                 clock=time.time):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.ttl = ttl
+        self.max_per_cycle = max_per_cycle
+        self.clock = clock
+        self.heap = []
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, address):
+        return address in self.entries
+
+    def backoff(self, attempts):
+        """Delay before the next retry after `attempts` retries so far."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempts))
+        return delay * (1 + self.jitter * (2 * random.random() - 1))
+
+    def push(self, address, entry):
+        heapq.heappush(self.heap, (entry.due, address))
+
+    def add(self, address, first_seen=None):
+        """Start tracking an address; no-op if it is already scheduled."""
+        if address in self.entries:
+            return
+        now = self.clock()
+        entry = RetryEntry(first_seen if first_seen is not None else now, now + self.backoff(0))
+        self.entries[address] = entry
+        self.push(address, entry)
+
+    def discard(self, address):
+        """Stop retrying an address (its heap item is dropped lazily)."""
+        self.entries.pop(address, None)
+
+    def pop_due(self, limit=None):
+        """
+        Hand out the addresses whose retry is due.
+
+        Returns (due, expired). Due addresses are rescheduled with the next
+        backoff delay right away, so a failed or lost lookup is simply retried
+        later; callers only need to `discard` addresses that got data.
+        Expired addresses are dropped and should be removed from no_data_pairs.
+        """
+        limit = self.max_per_cycle if limit is None else limit
+        now = self.clock()
+        due, expired = [], []
+        while self.heap and self.heap[0][0] <= now and len(due) < limit:
+            due_time, address = heapq.heappop(self.heap)
+            entry = self.entries.get(address)
+            if entry is None or entry.due != due_time:
+                continue  # stale heap item
+            if self.ttl and now - entry.first_seen > self.ttl:
+                del self.entries[address]
+                expired.append(address)
+                continue
+            entry.attempts += 1
+            entry.due = now + self.backoff(entry.attempts)
+            self.push(address, entry)
+            due.append(address)
+        # Drop stale items once they outnumber live ones, keeping the heap bounded
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [(entry.due, address) for address, entry in self.entries.items()]
+            heapq.heapify(self.heap)
+        return due, expired
@@ -0,0 +1,145 @@
+'''
+JSON decoding and encoding for API payloads.
+
+Uses orjson when it is installed (several times faster at both ends) and
+falls back to the standard library otherwise. Pairs are cut down to the
+fields the scrapers read (prices, txns, volume, liquidity, valuation,
+socials) as soon as a response is decoded, so caches and saved files hold
+about a dozen fields instead of the full payload. Files are written compact;
+set DEX_PRETTY_JSON=1 to indent them for debugging, and DEX_FULL_PAYLOADS=1
+to keep every field.
+
+    python serialization.py --cycles 20   # CPU and bytes per refresh cycle over the fixtures
+'''
+
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+PRETTY = os.getenv("DEX_PRETTY_JSON", "") not in ("", "0")
+FULL_PAYLOADS = os.getenv("DEX_FULL_PAYLOADS", "") not in ("", "0")
+
+# The process umask (os.umask can only be read by setting it)
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+
+# Fields of a Dex Screener pair that are kept (True keeps the whole value)
+PAIR_FIELDS = {
+    "chainId": True,
+    "dexId": True,
+    "pairAddress": True,
+    "baseToken": {"address": True, "name": True, "symbol": True},
+    "quoteToken": {"address": True, "symbol": True},
+    "priceUsd": True,
+    "txns": True,
+    "volume": True,
+    "liquidity": {"usd": True},
+    "fdv": True,
+    "marketCap": True,
+    "pairCreatedAt": True,
+    "info": {"socials": True, "websites": True},
+}
+
+
+def loads(data):
+    """Decode JSON from bytes or str."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, pretty=None):
+    """Encode to UTF-8 JSON bytes; compact unless `pretty` (default: DEX_PRETTY_JSON)."""
+    pretty = PRETTY if pretty is None else pretty
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    # Same bytes as orjson: two-space indent, non-ASCII characters unescaped
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def select(obj, spec):
+    """Copy only the fields named in `spec` (nested dicts select nested fields)."""
+    if spec is True or not isinstance(obj, dict):
+        return obj
+    return {key: select(obj[key], sub) for key, sub in spec.items() if key in obj}
+
+
+def slim_pairs(pairs):
+    """The pairs with only PAIR_FIELDS kept (unchanged when DEX_FULL_PAYLOADS is set)."""
+    if FULL_PAYLOADS:
+        return pairs
+    return [select(pair, PAIR_FIELDS) for pair in pairs]
+
+
+def file_mode(path):
+    """Permissions for a rewritten `path`: its current ones, or what open() would give a new file."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def write_json(path, obj, pretty=None):
+    """Write `obj` to `path` via a temp file and rename, so readers never see a partial file."""
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, file_mode(path))  # mkstemp creates the file 0600
+        with os.fdopen(fd, "wb") as file:
+            file.write(dumps(obj, pretty))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def bench(paths, cycles):
+    """Time decode / encode of every fixture per cycle, the old way and the new way."""
+    raw = [open(path, "rb").read() for path in paths]
+    payloads = [json.loads(data) for data in raw]
+    payloads = [data for data in payloads if isinstance(data, dict) and "pairs" in data]
+
+    def timed(function):
+        started = time.process_time()
+        for _ in range(cycles):
+            result = function()
+        return (time.process_time() - started) / cycles, result
+
+    old_decode, _ = timed(lambda: [json.loads(data) for data in raw])
+    new_decode, _ = timed(lambda: [loads(data) for data in raw])
+    old_encode, old_bytes = timed(lambda: sum(len(json.dumps(data, indent=4)) for data in payloads))
+    new_encode, new_bytes = timed(lambda: sum(
+        len(dumps({"schemaVersion": data.get("schemaVersion"), "pairs": slim_pairs(data["pairs"] or [])},
+                  pretty=False))
+        for data in payloads))
+
+    print(f"{len(payloads)} payloads per cycle, backend: {BACKEND}")
+    print(f"decode  json.loads {old_decode * 1000:8.2f} ms   {BACKEND}.loads {new_decode * 1000:8.2f} ms")
+    print(f"encode  indent=4   {old_encode * 1000:8.2f} ms   slim compact {new_encode * 1000:8.2f} ms")
+    print(f"bytes   indent=4   {old_bytes:8d}      slim compact {new_bytes:8d}   "
+          f"({100 * (1 - new_bytes / old_bytes) if old_bytes else 0:.0f}% smaller)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark payload decoding and encoding.")
+    parser.add_argument("--data", action="append", help="fixture directory (repeatable)")
+    parser.add_argument("--cycles", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = [path for directory in args.data or ["./test_coin_data", "./coin_data"]
+             for path in glob.glob(os.path.join(directory, "*.json"))]
+    bench(paths, args.cycles)
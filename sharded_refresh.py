@@ -0,0 +1,225 @@
+'''
+Sharded multi-process refresh of the watchlist.
+
+The coordinator (this process) splits the addresses in coins_with_socials.json
+across N worker processes with a consistent-hash ring, so adding or removing
+a worker only moves the addresses on its arcs of the ring. Each worker runs
+the live_json_data refresh loop for its shard on its own event loop and
+connection pool, and reports per-cycle stats back; the coordinator merges
+them, restarts dead workers and pushes new assignments when the watchlist or
+the worker count changes. Everything runs on one machine.
+
+Each worker's rate limiter (rate and burst) is scaled down to its share of
+the upstream quota. When an address moves to another worker, the old owner
+may still be writing it; snapshot_store serializes appends per address, so
+the two never interleave rows.
+
+    python sharded_refresh.py --workers 4
+'''
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import queue
+import time
+
+DEFAULT_WORKERS = 4
+REFRESH_INTERVAL = 10   # seconds
+VIRTUAL_NODES = 100     # points per worker on the ring, for an even spread
+
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping addresses to worker ids."""
+
+    def __init__(self, nodes=(), replicas=VIRTUAL_NODES):
+        self.replicas = replicas
+        self.points = []   # sorted hashes
+        self.owners = {}   # hash -> node
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = ring_hash(f"{node}#{i}")
+            if point not in self.owners:
+                bisect.insort(self.points, point)
+                self.owners[point] = node
+
+    def remove(self, node):
+        self.points = [point for point in self.points if self.owners[point] != node]
+        self.owners = {point: owner for point, owner in self.owners.items() if owner != node}
+
+    def node_for(self, key):
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, ring_hash(key)) % len(self.points)
+        return self.owners[self.points[index]]
+
+    def assign(self, keys):
+        """Dict of node -> sorted list of the keys it owns."""
+        assignment = {node: [] for node in set(self.owners.values())}
+        for key in keys:
+            assignment[self.node_for(key)].append(key)
+        return {node: sorted(owned) for node, owned in assignment.items()}
+
+
+def worker_main(worker_id, control, stats, interval):
+    """Entry point of a worker process."""
+    try:
+        asyncio.run(worker_loop(worker_id, control, stats, interval))
+    except KeyboardInterrupt:
+        pass
+
+
+async def worker_loop(worker_id, control, stats, interval):
+    """Refresh the assigned shard every `interval` seconds until told to stop."""
+    import live_json_data
+    from dex_client import limiter
+    from http_pool import create_session
+
+    addresses = []
+    async with create_session() as session:
+        next_run = time.monotonic()
+        while True:
+            # Apply the latest control messages without blocking the refresh
+            while True:
+                try:
+                    message = control.get_nowait()
+                except queue.Empty:
+                    break
+                if message[0] == "stop":
+                    return
+                if message[0] == "assign":
+                    previous = addresses
+                    _, addresses, rate = message
+                    for address in set(previous) - set(addresses):
+                        live_json_data.forget_coin(address)
+                    # Each worker gets its share of the upstream quota, burst included
+                    limiter.max_rate = limiter.rate = rate
+                    limiter.min_rate = rate / 20
+                    limiter.capacity = max(1.0, rate)
+                    limiter.tokens = min(limiter.tokens, limiter.capacity)
+
+            started = time.monotonic()
+            before = live_json_data.change_detector.stats()
+            if addresses:
+                try:
+                    await live_json_data.fetch_pairs_data(session, addresses)
+                except Exception as e:
+                    print(f"Worker {worker_id} refresh failed:", e)
+            after = live_json_data.change_detector.stats()
+            stats.put((worker_id, {
+                "addresses": len(addresses),
+                "written": after["written"] - before["written"],
+                "suppressed": after["suppressed"] - before["suppressed"],
+                "seconds": time.monotonic() - started,
+            }))
+
+            next_run += interval
+            await asyncio.sleep(max(0, next_run - time.monotonic()))
+
+
+class RefreshCoordinator:
+    """Starts workers, keeps their shards balanced and merges their stats."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, interval=REFRESH_INTERVAL, load_addresses=None):
+        self.interval = interval
+        self.load_addresses = load_addresses
+        self.context = multiprocessing.get_context("spawn")
+        self.stats = self.context.Queue()
+        self.processes = {}   # worker id -> (process, control queue)
+        self.assigned = {}    # worker id -> addresses last sent
+        self.ring = HashRing()
+        self.next_id = 0
+        self.resize(workers)
+
+    def start_worker(self, worker_id):
+        control = self.context.Queue()
+        process = self.context.Process(
+            target=worker_main, args=(worker_id, control, self.stats, self.interval), daemon=True)
+        process.start()
+        self.processes[worker_id] = (process, control)
+        self.assigned.pop(worker_id, None)
+
+    def resize(self, workers):
+        """Add or remove workers; only the moved addresses change owner."""
+        while len(self.processes) < workers:
+            worker_id = self.next_id
+            self.next_id += 1
+            self.ring.add(worker_id)
+            self.start_worker(worker_id)
+        while len(self.processes) > workers:
+            worker_id = max(self.processes)
+            process, control = self.processes.pop(worker_id)
+            self.ring.remove(worker_id)
+            self.assigned.pop(worker_id, None)
+            control.put(("stop",))
+            process.join(timeout=5)
+
+    def restart_dead_workers(self):
+        for worker_id, (process, _) in list(self.processes.items()):
+            if not process.is_alive():
+                print(f"Worker {worker_id} died (exit code {process.exitcode}); restarting.")
+                self.start_worker(worker_id)
+
+    def rebalance(self, addresses):
+        """Send each worker its shard if it changed (and its share of the rate limit)."""
+        from rate_limiter import UPSTREAM_RATES
+
+        rate = UPSTREAM_RATES["dexscreener"] / max(1, len(self.processes))
+        for worker_id, owned in self.ring.assign(addresses).items():
+            if self.assigned.get(worker_id) != owned:
+                self.processes[worker_id][1].put(("assign", owned, rate))
+                self.assigned[worker_id] = owned
+
+    def merge_stats(self):
+        """Drain the stats queue and sum what every worker reported since last time."""
+        merged = {"reports": 0, "addresses": 0, "written": 0, "suppressed": 0, "slowest": 0.0}
+        while True:
+            try:
+                _, report = self.stats.get_nowait()
+            except queue.Empty:
+                return merged
+            merged["reports"] += 1
+            merged["addresses"] += report["addresses"]
+            merged["written"] += report["written"]
+            merged["suppressed"] += report["suppressed"]
+            merged["slowest"] = max(merged["slowest"], report["seconds"])
+
+    def run(self):
+        """Coordinate until interrupted."""
+        if self.load_addresses is None:
+            from live_json_data import load_coin_addresses
+
+            self.load_addresses = load_coin_addresses
+        try:
+            while True:
+                self.restart_dead_workers()
+                self.rebalance(self.load_addresses())
+                time.sleep(self.interval)
+                merged = self.merge_stats()
+                print(f"{len(self.processes)} workers refreshed {merged['addresses']} addresses: "
+                      f"{merged['written']} written, {merged['suppressed']} unchanged, "
+                      f"slowest shard {merged['slowest']:.2f}s")
+                if merged["slowest"] > self.interval:
+                    print("Slowest shard overran the refresh interval; consider more workers.")
+        finally:
+            self.resize(0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the watchlist with a pool of worker processes.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL)
+    args = parser.parse_args()
+
+    try:
+        RefreshCoordinator(args.workers, args.interval).run()
+    except KeyboardInterrupt:
+        print("Sharded refresh stopped.")
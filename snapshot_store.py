@@ -0,0 +1,287 @@
+'''
+Append-only columnar time series of pair snapshots.
+
+Each refresh appends one row per address. Rows are stored column by column
+as fixed-width little-endian NumPy arrays, partitioned by address and UTC day:
+
+    snapshot_data/<address>/<YYYY-MM-DD>/<field>.bin
+
+Appending is a small write at the end of each column file, and reads
+memory-map the columns, so range queries only touch the days they need.
+
+Appends to an address hold an exclusive lock on snapshot_data/<address>/.lock
+and skip rows that are not newer than the last one stored. When a shard
+moves to another worker process (sharded_refresh.py), the old and new owner
+can briefly both write the address; the lock keeps every row whole across
+the column files, and the timestamp fence keeps the history in time order.
+
+Each address also keeps its newest row, all fields in one record, in
+snapshot_data/<address>/.latest, so reading the latest state of thousands
+of coins is one small read per coin instead of one per column. It is
+replaced under the same lock; after a crash between the two writes it can
+be one row behind until the next append.
+'''
+
+import argparse
+import csv
+import fcntl
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from pair_snapshot import NUMERIC_FIELDS, WINDOWS, PairSnapshot, now_ms, to_number
+
+SNAPSHOT_DIR = "./snapshot_data"
+
+# (field, dtype); `ts` is the refresh time in milliseconds since the epoch
+FIELDS = [("ts", "<i8")] + NUMERIC_FIELDS
+FIELD_DTYPES = dict(FIELDS)
+# One row with every field, as stored in <address>/.latest
+ROW_DTYPE = np.dtype(FIELDS)
+LATEST_FILE = ".latest"
+
+
+def field_names(fields=None):
+    """Requested fields in storage order, always including `ts`."""
+    wanted = set(fields or FIELD_DTYPES) | {"ts"}
+    return [field for field, _ in FIELDS if field in wanted]
+
+
+def day_of(ts):
+    """UTC day partition name for a millisecond timestamp."""
+    return datetime.fromtimestamp(ts / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class SnapshotStore:
+    """Columnar, day-partitioned snapshot history per address."""
+
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+
+    def partition_dir(self, address, day):
+        return os.path.join(self.root, address, day)
+
+    def days(self, address):
+        """Sorted day partitions stored for an address."""
+        path = os.path.join(self.root, address)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if not name.startswith("."))
+
+    def addresses(self):
+        """All addresses with stored snapshots."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(os.listdir(self.root))
+
+    def append(self, address, snapshot):
+        """Append one PairSnapshot for an address."""
+        self.append_many(address, [snapshot])
+
+    def append_many(self, address, snapshots):
+        """Append several PairSnapshots for an address in one write per column."""
+        rows = [snapshot.row() for snapshot in snapshots]
+        self.append_rows(address, {field: [row[field] for row in rows] for field, _ in FIELDS})
+
+    def last_ts(self, address):
+        """Timestamp of the newest stored row of an address, or None."""
+        for day in reversed(self.days(address)):
+            path = os.path.join(self.partition_dir(address, day), "ts.bin")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size >= 8:
+                with open(path, "rb") as file:
+                    file.seek(size - size % 8 - 8)
+                    return int(np.frombuffer(file.read(8), dtype="<i8")[0])
+        return None
+
+    def append_rows(self, address, columns):
+        """
+        Append several rows given as a dict of field -> sequence of values.
+
+        Rows at or before the newest stored timestamp are dropped.
+        """
+        ts = np.asarray(columns["ts"], dtype="<i8")
+        if not len(ts):
+            return
+        os.makedirs(os.path.join(self.root, address), exist_ok=True)
+        with open(os.path.join(self.root, address, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file is closed
+            last = self.last_ts(address)
+            newer = ts > last if last is not None else np.ones(len(ts), dtype=bool)
+            # Rows may span days (e.g. a CSV import); split them per partition
+            days = np.array([day_of(value) for value in ts])
+            for day in np.unique(days[newer]):
+                mask = newer & (days == day)
+                path = self.partition_dir(address, day)
+                os.makedirs(path, exist_ok=True)
+                for field, dtype in FIELDS:
+                    values = np.asarray(columns[field], dtype=dtype)[mask]
+                    with open(os.path.join(path, f"{field}.bin"), "ab") as file:
+                        values.tofile(file)
+            if newer.any():
+                self.write_latest(address, columns, int(np.flatnonzero(newer)[np.argmax(ts[newer])]))
+
+    def write_latest(self, address, columns, index):
+        """Replace the .latest record of an address with row `index` of `columns`."""
+        row = np.zeros(1, dtype=ROW_DTYPE)
+        for field, dtype in FIELDS:
+            row[field] = np.asarray(columns[field], dtype=dtype)[index]
+        path = os.path.join(self.root, address, LATEST_FILE)
+        row.tofile(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+    def latest_row(self, address):
+        """The newest stored row of an address as a record (from .latest), or None."""
+        try:
+            row = np.fromfile(os.path.join(self.root, address, LATEST_FILE), dtype=ROW_DTYPE)
+        except (OSError, ValueError):
+            return None
+        return row[0] if len(row) == 1 else None
+
+    def read_partition(self, address, day, fields=None):
+        """Memory-map the columns of one day partition."""
+        path = self.partition_dir(address, day)
+        columns = {}
+        for field in field_names(fields):
+            file_path = os.path.join(path, f"{field}.bin")
+            dtype = np.dtype(FIELD_DTYPES[field])
+            size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            if size < dtype.itemsize:
+                columns[field] = np.empty(0, dtype=dtype)
+            else:
+                columns[field] = np.memmap(file_path, dtype=dtype, mode="r", shape=(size // dtype.itemsize,))
+        # A crash mid-append can leave columns of different lengths; trust the shortest
+        rows = min(len(column) for column in columns.values())
+        return {field: column[:rows] for field, column in columns.items()}
+
+    def read_range(self, address, start_ts=None, end_ts=None, fields=None):
+        """
+        Read rows with start_ts <= ts < end_ts (milliseconds) as a dict of arrays.
+
+        Only the day partitions overlapping the range are opened.
+        """
+        first_day = day_of(start_ts) if start_ts is not None else None
+        last_day = day_of(end_ts) if end_ts is not None else None
+        parts = []
+        for day in self.days(address):
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            part = self.read_partition(address, day, fields)
+            ts = part["ts"]
+            lo = np.searchsorted(ts, start_ts, "left") if start_ts is not None else 0
+            hi = np.searchsorted(ts, end_ts, "left") if end_ts is not None else len(ts)
+            parts.append({field: column[lo:hi] for field, column in part.items()})
+        wanted = field_names(fields)
+        if not parts:
+            return {field: np.empty(0, dtype=FIELD_DTYPES[field]) for field in wanted}
+        return {field: np.concatenate([part[field] for part in parts]) for field in wanted}
+
+    def read_tail(self, address, span, fields=None):
+        """
+        Read the rows of the last `span` milliseconds up to the newest row, as a dict of arrays.
+
+        Only those rows are read, with positioned reads instead of memory maps,
+        so it stays cheap when called for thousands of addresses.
+        """
+        wanted = field_names(fields)
+        parts, start = [], None
+        for day in reversed(self.days(address)):
+            path = self.partition_dir(address, day)
+            rows = None
+            for field in wanted:
+                file_path = os.path.join(path, f"{field}.bin")
+                size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+                count = size // np.dtype(FIELD_DTYPES[field]).itemsize
+                rows = count if rows is None else min(rows, count)  # a torn append: trust the shortest
+            if not rows:
+                continue
+            ts = np.fromfile(os.path.join(path, "ts.bin"), dtype="<i8", count=rows)
+            if start is None:
+                start = int(ts[-1]) - span
+            lo = int(np.searchsorted(ts, start, "left"))
+            part = {"ts": ts[lo:]}
+            for field in wanted:
+                if field != "ts":
+                    dtype = np.dtype(FIELD_DTYPES[field])
+                    part[field] = np.fromfile(os.path.join(path, f"{field}.bin"), dtype=dtype,
+                                              count=rows - lo, offset=lo * dtype.itemsize)
+            parts.append(part)
+            if lo > 0 or day_of(start) >= day:
+                break  # the window starts in this partition
+        if not parts:
+            return {field: np.empty(0, dtype=FIELD_DTYPES[field]) for field in wanted}
+        return {field: np.concatenate([part[field] for part in reversed(parts)]) for field in wanted}
+
+    def latest(self, address):
+        """The most recent stored PairSnapshot for an address, or None."""
+        row = self.latest_row(address)
+        if row is not None:
+            return PairSnapshot.from_row(address, {field: row[field].item() for field, _ in FIELDS})
+        # Histories written before .latest existed
+        for day in reversed(self.days(address)):
+            part = self.read_partition(address, day)
+            if len(part["ts"]):
+                return PairSnapshot.from_row(address, {field: part[field][-1].item() for field in part})
+        return None
+
+
+def read_csv_history(csv_file, address=None, start_ts=None, interval=10):
+    """
+    Read an ad-hoc CSV export (see test_coin_data/*.csv) into (address, columns).
+
+    The CSVs have no timestamps, so rows are spaced `interval` seconds apart
+    starting at `start_ts` (milliseconds, default: now minus the whole span).
+    Returns (address, None) for an empty file or one without price history.
+    """
+    with open(csv_file, newline="") as file:
+        rows = list(csv.DictReader(file))
+    if not rows or "Price (USD)" not in rows[0]:
+        return address, None
+    address = address or rows[0]["Pair Address"]
+    if start_ts is None:
+        start_ts = now_ms() - len(rows) * interval * 1000
+    headers = {
+        "price_usd": "Price (USD)", "fdv": "FDV", "market_cap": "Market Cap",
+        "liquidity_usd": "Liquidity (USD)",
+    }
+    for window in WINDOWS:
+        headers[f"buys_{window}"] = f"{window.upper()} Buys"
+        headers[f"sells_{window}"] = f"{window.upper()} Sells"
+        headers[f"volume_{window}"] = f"Volume {window.upper()}"
+    columns = {"ts": [start_ts + i * interval * 1000 for i in range(len(rows))]}
+    for field, header in headers.items():
+        columns[field] = [to_number(row.get(header), FIELD_DTYPES[field]) for row in rows]
+    return address, columns
+
+
+def import_csv(store, csv_file, address=None, start_ts=None, interval=10):
+    """Import an ad-hoc CSV export into the store (see read_csv_history); returns the row count."""
+    address, columns = read_csv_history(csv_file, address, start_ts, interval)
+    if columns is None:
+        return 0
+    store.append_rows(address, columns)
+    return len(columns["ts"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or import pair snapshot history.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import-csv", help="import an ad-hoc CSV export")
+    import_parser.add_argument("csv_file")
+    import_parser.add_argument("--address")
+    import_parser.add_argument("--interval", type=int, default=10, help="seconds between rows")
+    show_parser = subparsers.add_parser("show", help="print the stored rows for an address")
+    show_parser.add_argument("address")
+    args = parser.parse_args()
+
+    store = SnapshotStore()
+    if args.command == "import-csv":
+        count = import_csv(store, args.csv_file, args.address, interval=args.interval)
+        print(f"Imported {count} rows from {args.csv_file}.")
+    else:
+        columns = store.read_range(args.address)
+        fields = [field for field, _ in FIELDS]
+        print(",".join(fields))
+        for i in range(len(columns["ts"])):
+            print(",".join(str(columns[field][i]) for field in fields))
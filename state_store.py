@@ -0,0 +1,225 @@
+'''
+Durable state for the discovery scripts (processed, no-data and socials sets).
+
+Backed by SQLite in WAL mode: every change appends a small record to the
+write-ahead log instead of rewriting a whole JSON file, and several sets can
+be updated in one transaction so a crash never leaves them disagreeing.
+Members keep the time they were added, so e.g. the no-data retry TTL keeps
+counting across restarts. A background thread checkpoints the log and
+refreshes the legacy JSON files, which stay around as read-only views for
+tools like live_json_data.py.
+
+Large sets can instead be loaded as memory-mapped MembershipSets (see
+load_index): each compaction journals their changes next to the index file,
+a clean shutdown rewrites it, and both are stamped with the set's change
+counter, so a restart maps the file directly and only falls back to reading
+the database when the stamp shows it is out of date. Indexed sets get no
+JSON view: nothing reads one, and exporting it would load the whole set into
+memory every compaction. Their legacy JSON file is renamed to
+`<file>.migrated` instead, so nothing keeps reading a list that is no
+longer updated.
+'''
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from membership_index import MembershipSet
+from serialization import write_json
+
+STATE_DB_FILE = "./test_coin_data/state.db"
+COMPACTION_INTERVAL = 10  # seconds between background checkpoints / JSON exports
+
+
+class StateStore:
+    """Named sets of addresses persisted in a SQLite WAL database."""
+
+    def __init__(self, path=STATE_DB_FILE, json_files=None, compaction_interval=COMPACTION_INTERVAL):
+        self.path = path
+        # set name -> legacy JSON file, used for the one-time migration and the exported views
+        self.json_files = json_files or {}
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.indexes = {}  # set name -> (MembershipSet, index file)
+        # Held while changing or saving an index (the compaction thread saves them)
+        self.index_lock = threading.Lock()
+        self.closed = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS members ("
+            " set_name TEXT NOT NULL, address TEXT NOT NULL, added_at REAL,"
+            " PRIMARY KEY (set_name, address)) WITHOUT ROWID"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(members)")]
+        if "added_at" not in columns:
+            # Databases from before added_at: their members count as added now
+            self.conn.execute("ALTER TABLE members ADD COLUMN added_at REAL")
+            self.conn.execute("UPDATE members SET added_at = ?", (time.time(),))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.migrate_from_json()
+
+        if compaction_interval:
+            thread = threading.Thread(target=self.compact_forever, args=(compaction_interval,), daemon=True)
+            thread.start()
+        atexit.register(self.close)
+
+    def get_meta(self, key, default=None):
+        """Read a value from the meta table."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        """Write a value to the meta table."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load(self, set_name):
+        """Load one set into memory."""
+        with self.lock:
+            rows = self.conn.execute("SELECT address FROM members WHERE set_name = ?", (set_name,))
+            return {address for (address,) in rows}
+
+    def added_times(self, set_name):
+        """Map every member of a set to when it was added (unix seconds)."""
+        with self.lock:
+            rows = self.conn.execute("SELECT address, added_at FROM members WHERE set_name = ?", (set_name,))
+            return dict(rows.fetchall())
+
+    def load_index(self, set_name, path):
+        """
+        Load one set as a memory-mapped MembershipSet kept in `path`.
+
+        The returned set must receive the same changes as the store (like the
+        sets returned by `load`), under `index_lock`; they are journaled to
+        `path` on every compaction and the file is rewritten on close.
+        """
+        stamp = int(self.get_meta(f"version:{set_name}", "0"))
+        index = MembershipSet.open(path)
+        if index is None or index.stamp != stamp:
+            MembershipSet(self.load(set_name)).save(path, stamp)
+            index = MembershipSet.open(path)
+        self.indexes[set_name] = (index, path)
+        json_file = self.json_files.get(set_name)
+        if json_file and os.path.exists(json_file):
+            os.replace(json_file, f"{json_file}.migrated")  # imported by migrate_from_json
+        return index
+
+    def apply(self, add=None, remove=None):
+        """
+        Apply one atomic change across any number of sets.
+
+        `add` and `remove` map a set name to the addresses to insert into or
+        delete from it; either all of the change is committed or none of it.
+        """
+        self.apply_many([(add, remove)])
+
+    def apply_many(self, changes):
+        """Apply a list of (add, remove) changes in order, in one transaction."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed = set()
+                now = time.time()
+                for add, remove in changes:
+                    add = add or {}
+                    remove = remove or {}
+                    for set_name, addresses in remove.items():
+                        self.conn.executemany(
+                            "DELETE FROM members WHERE set_name = ? AND address = ?",
+                            [(set_name, address) for address in addresses],
+                        )
+                    for set_name, addresses in add.items():
+                        self.conn.executemany(
+                            "INSERT OR IGNORE INTO members (set_name, address, added_at) VALUES (?, ?, ?)",
+                            [(set_name, address, now) for address in addresses],
+                        )
+                    changed.update(add)
+                    changed.update(remove)
+                # Change counters, so a stale index file is detected after a crash
+                self.conn.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, '1')"
+                    " ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                    [(f"version:{set_name}",) for set_name in changed],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.dirty.update(changed)
+
+    def migrate_from_json(self):
+        """Import the legacy JSON set files once, the first time the database is opened."""
+        if self.get_meta("json_migrated"):
+            return
+        add = {}
+        for set_name, json_file in self.json_files.items():
+            if not os.path.exists(json_file):
+                continue
+            with open(json_file, "r") as file:
+                try:
+                    add[set_name] = list(json.load(file))
+                except json.JSONDecodeError:
+                    print(f"Skipping unreadable {json_file} during migration.")
+        self.apply(add=add)
+        self.set_meta("json_migrated", "1")
+        self.dirty.clear()
+
+    def export_json(self, set_name):
+        """Atomically rewrite the legacy JSON view of one set (not of indexed sets)."""
+        json_file = self.json_files.get(set_name)
+        if not json_file or set_name in self.indexes:
+            return
+        write_json(json_file, sorted(self.load(set_name)))
+
+    def compact(self):
+        """Checkpoint the WAL into the database, journal the indexes and refresh changed JSON views."""
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        for set_name, (index, path) in list(self.indexes.items()):
+            # An index can run ahead of the database by the changes still queued for it:
+            # once committed they move the counter past this stamp, and a restart rebuilds
+            # the index; if a crash loses them first, the index keeps them.
+            with self.index_lock:
+                try:
+                    index.save_changes(path, int(self.get_meta(f"version:{set_name}", "0")))
+                except OSError as e:
+                    print(f"Journaling the {set_name} index failed:", e)
+        for set_name in dirty:
+            try:
+                self.export_json(set_name)
+            except OSError as e:
+                print(f"Exporting {set_name} failed:", e)
+
+    def compact_forever(self, interval):
+        """Background compaction loop."""
+        while not self.closed.wait(interval):
+            try:
+                self.compact()
+            except sqlite3.Error as e:
+                print("State compaction failed:", e)
+
+    def close(self):
+        """Flush pending exports and close the database."""
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.compact()
+        for set_name, (index, path) in self.indexes.items():
+            with self.index_lock:
+                try:
+                    index.save(path, int(self.get_meta(f"version:{set_name}", "0")))
+                except OSError as e:
+                    print(f"Saving the {set_name} index failed:", e)
+        with self.lock:
+            self.conn.close()
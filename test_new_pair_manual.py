@@ -1,26 +1,28 @@
-import requests
 import csv
 import os
 import schedule
 import time
 from dotenv import load_dotenv
+from config import MANUAL_PAIRS
+from dex_client import fetch_tokens
+from filter_engine import get_filter
+from resilience import within_deadline
 
 # Directory to store CSV file
 output_dir = "./test_coin_data"
 os.makedirs(output_dir, exist_ok=True)
 csv_file = os.path.join(output_dir, "pairs_with_socials.csv")
 
+# Seconds between runs; also the deadline for the requests of one run
+RUN_INTERVAL = 10
+
 # Keep track of processed pairs
 processed_pairs = set()
 
 load_dotenv()
 
-# Manually add pair addresses
-manual_pairs = [
-    "Fikoi5epMDNz848rQUbKVwRWTt9ubwroweSNbafAJLMD",
-    "sp6DKKYq1MDXJi45QfbJyqvKwVxrNghTtZ9vH49pump",
-    "6rgQRypjqs2rsrbuZ2AcQheV7r2MmtJwHNDsgMd7pump"
-]
+# Manually added pair addresses (edit them in config.py)
+manual_pairs = MANUAL_PAIRS
 
 # Create CSV file if it doesn't exist
 if not os.path.isfile(csv_file):
@@ -28,32 +30,28 @@ if not os.path.isfile(csv_file):
         writer = csv.writer(file)
         writer.writerow(["Pair Address"])  # Header row
 
+@within_deadline(RUN_INTERVAL)
 def process_manual_pairs():
     print("Processing manually added pairs...")
-    for pair_address in manual_pairs:
-        if pair_address not in processed_pairs:
-            if fetch_pair_data(pair_address):
-                processed_pairs.add(pair_address)
-
-def fetch_pair_data(pair_address):
-    print(f"Fetching data for pair: {pair_address}...")
-
-    url = f"https://api.dexscreener.com/latest/dex/search?q={pair_address}"
-
+    pending = [pair_address for pair_address in manual_pairs if pair_address not in processed_pairs]
+    if not pending:
+        return
+
+    # One batched Dex Screener request for all pending pairs
+    results = fetch_tokens(pending)
+    screened = get_filter().screen(results)
+    for pair_address in pending:
+        if pair_address in results and save_pair_data(pair_address, screened[pair_address]):
+            processed_pairs.add(pair_address)
+
+def save_pair_data(pair_address, passed):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        if 'pairs' not in data or not data['pairs']:
+        if passed is None:
             print(f"No data found for the pair address: {pair_address}.")
             return False
 
-        pair = data['pairs'][0]
-        socials = pair.get("info", {}).get("socials", [])
-
-        if not socials:
-            print(f"Pair {pair_address} has data but no social links, skipping.")
+        if not passed:
+            print(f"Pair {pair_address} has data but did not pass the filters, skipping.")
             return False
 
         # Save only the pair address in CSV
@@ -64,16 +62,15 @@ def fetch_pair_data(pair_address):
         print(f"Pair {pair_address} saved.")
         return True
 
-    except requests.exceptions.RequestException as e:
-        print(f"API request failed for pair {pair_address}:", e)
     except Exception as e:
         print(f"An error occurred for pair {pair_address}: {e}")
     
     return False
 
-# Schedule the task every 10 seconds
-schedule.every(10).seconds.do(process_manual_pairs)
+if __name__ == "__main__":
+    # Schedule the task every 10 seconds
+    schedule.every(RUN_INTERVAL).seconds.do(process_manual_pairs)
 
-while True:
-    schedule.run_pending()
-    time.sleep(1)
+    while True:
+        schedule.run_pending()
+        time.sleep(1)
@@ -0,0 +1,73 @@
+from alert_engine import AlertEngine, AlertRule, RollingExtreme, RollingMean
+from pair_snapshot import PairSnapshot
+
+RULES = [
+    {"name": "volume_spike", "field": "volume_m5", "stat": "mean", "window": 1800,
+     "op": ">=", "ratio": 3.0, "cooldown": 600},
+    {"name": "liquidity_drop", "field": "liquidity_usd", "stat": "max", "window": 120,
+     "op": "<=", "ratio": 0.6, "cooldown": 300},
+]
+
+
+def engine():
+    return AlertEngine([AlertRule(spec) for spec in RULES])
+
+
+def snapshot(seconds, **numbers):
+    return PairSnapshot(address="coin", ts=seconds * 1000, **numbers)
+
+
+def test_rolling_mean_drops_values_outside_the_window():
+    mean = RollingMean(10)
+    for now, value in ((0, 1.0), (5, 3.0), (12, 5.0)):
+        mean.update(now, value)
+    assert mean.value(12) == 4.0
+
+
+def test_rolling_max_follows_the_window():
+    extreme = RollingExtreme(10)
+    for now, value in ((0, 9.0), (5, 3.0), (8, 4.0)):
+        extreme.update(now, value)
+    assert extreme.value(8) == 9.0
+    assert extreme.value(11) == 4.0
+
+
+def test_volume_spike_fires_once_per_cooldown():
+    alerts = engine()
+    fired = []
+    for i, volume in enumerate([100, 100, 100, 400, 400]):
+        fired += alerts.observe(snapshot(i * 10, volume_m5=float(volume), liquidity_usd=1000.0))
+    assert [alert["rule"] for alert in fired] == ["volume_spike"]
+    assert fired[0]["baseline"] == 100.0
+
+
+def test_liquidity_drop_fires_against_the_recent_high():
+    alerts = engine()
+    fired = []
+    for i, liquidity in enumerate([1000, 900, 950, 500]):
+        fired += alerts.observe(snapshot(i * 10, volume_m5=10.0, liquidity_usd=float(liquidity)))
+    assert [alert["rule"] for alert in fired] == ["liquidity_drop"]
+
+
+def test_zero_baseline_never_fires():
+    alerts = engine()
+    fired = []
+    for i in range(6):
+        fired += alerts.observe(snapshot(i * 10, volume_m5=0.0, liquidity_usd=0.0))
+    assert fired == []
+
+
+def test_missing_values_are_skipped():
+    alerts = engine()
+    for i in range(5):
+        assert alerts.observe(snapshot(i * 10)) == []
+
+
+def test_forget_drops_the_windows_of_a_coin():
+    alerts = engine()
+    for i in range(3):
+        alerts.observe(snapshot(i * 10, volume_m5=100.0, liquidity_usd=1000.0))
+    alerts.forget("coin")
+    assert alerts.stats()["addresses"] == 0
+    # A forgotten coin starts over and needs min_samples values again
+    assert alerts.observe(snapshot(40, volume_m5=900.0, liquidity_usd=1000.0)) == []
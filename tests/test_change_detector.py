@@ -0,0 +1,32 @@
+from change_detector import ChangeDetector
+from pair_snapshot import PairSnapshot
+
+
+def snapshot(price):
+    return PairSnapshot(address="coin", ts=1, price_usd=price)
+
+
+def test_unchanged_snapshots_are_suppressed():
+    detector = ChangeDetector()
+    assert detector.changed("coin", snapshot(1.0))
+    assert not detector.changed("coin", snapshot(1.0))
+    assert detector.changed("coin", snapshot(2.0))
+    assert detector.stats()["suppressed"] == 1
+
+
+def test_seeding_reads_the_store_once_per_address():
+    loads = []
+
+    def load_last(address):
+        loads.append(address)
+        return snapshot(1.0) if address == "coin" else None
+
+    detector = ChangeDetector(load_last=load_last)
+    detector.seed(["coin", "new"])
+    assert not detector.changed("coin", snapshot(1.0))
+    assert detector.changed("new", snapshot(1.0))
+    assert loads == ["coin", "new"]
+
+    detector.forget("coin")
+    detector.changed("coin", snapshot(1.0))
+    assert loads == ["coin", "new", "coin"]
@@ -0,0 +1,61 @@
+import pytest
+
+import dex_client
+from dex_client import TOKENS_BATCH_LIMIT, chunked, split_pairs_by_address
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def api(fake_api, monkeypatch):
+    server, base_url = fake_api()
+    monkeypatch.setattr(dex_client, "DEX_SCREENER_BASE_URL", base_url)
+    monkeypatch.setattr(dex_client, "cache", ResponseCache(0))
+    return server
+
+
+def test_chunked_splits_at_the_batch_limit_and_drops_repeats():
+    addresses = [f"coin{i}" for i in range(2 * TOKENS_BATCH_LIMIT + 1)]
+    batches = list(chunked(addresses + addresses[:5] + [None, ""]))
+    assert [len(batch) for batch in batches] == [TOKENS_BATCH_LIMIT, TOKENS_BATCH_LIMIT, 1]
+    assert sum(batches, []) == addresses
+
+
+def test_split_gives_every_address_its_own_pairs():
+    data = {"schemaVersion": "1.0.0", "pairs": [
+        {"pairAddress": "pair1", "baseToken": {"address": "a"}, "quoteToken": {"address": "sol"}},
+        {"pairAddress": "pair2", "baseToken": {"address": "b"}, "quoteToken": {"address": "sol"}},
+        {"pairAddress": "pair3", "baseToken": {"address": "a"}, "quoteToken": {"address": "usdc"}},
+    ]}
+    split = split_pairs_by_address(["a", "b", "missing", "pair2"], data)
+    assert [pair["pairAddress"] for pair in split["a"]["pairs"]] == ["pair1", "pair3"]
+    assert [pair["pairAddress"] for pair in split["b"]["pairs"]] == ["pair2"]
+    assert [pair["pairAddress"] for pair in split["pair2"]["pairs"]] == ["pair2"]
+    assert split["missing"] == {"schemaVersion": "1.0.0", "pairs": []}
+    assert split_pairs_by_address(["a"], None)["a"]["pairs"] == []
+
+
+def test_one_request_per_batch(api):
+    addresses = sorted(api.fixtures)[:5]
+    results = dex_client.request_tokens(addresses)
+    assert set(results) == set(addresses)
+    assert api.path_counts["/latest/dex/tokens"] == 1
+
+    many = [f"unknown{i}" for i in range(TOKENS_BATCH_LIMIT + 1)]
+    dex_client.request_tokens(many)
+    assert api.path_counts["/latest/dex/tokens"] == 3
+
+
+def test_lookups_map_to_statuses(api, new_pair_fetch):
+    def has_socials(pairs):
+        return any((pair.get("info") or {}).get("socials") for pair in pairs)
+
+    with_socials = next(a for a, pairs in api.fixtures.items() if pairs and has_socials(pairs))
+    without = next(a for a, pairs in api.fixtures.items() if pairs and not has_socials(pairs))
+    empty = next(a for a, pairs in api.fixtures.items() if not pairs)
+    results = dex_client.fetch_tokens([with_socials, without, empty, "UnknownAddress111"])
+    assert new_pair_fetch.screen_pairs_data(results) == {
+        with_socials: "success",
+        without: "no_socials",
+        empty: "no_data",
+        "UnknownAddress111": "no_data",
+    }
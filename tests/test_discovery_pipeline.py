@@ -0,0 +1,54 @@
+import asyncio
+import importlib
+
+import pytest
+
+import filter_engine
+from filter_engine import FilterError
+
+
+@pytest.fixture
+def discovery_pipeline(new_pair_fetch, monkeypatch):
+    # Imported here, after new_pair_fetch has been loaded into tmp_path
+    module = importlib.import_module("discovery_pipeline")
+    monkeypatch.setattr(module, "new_pair_fetch", new_pair_fetch)
+    return module
+
+
+def test_a_failed_screen_keeps_the_worker_running(discovery_pipeline, new_pair_fetch, monkeypatch):
+    calls = []
+
+    def screen_pairs_data(results):
+        calls.append(sorted(results))
+        if len(calls) == 1:
+            raise ValueError("bad batch")
+        return {pair_address: "no_socials" for pair_address in results}
+
+    monkeypatch.setattr(new_pair_fetch, "screen_pairs_data", screen_pairs_data)
+
+    async def screen(batches):
+        pipeline = discovery_pipeline.DiscoveryPipeline(session=None)
+        worker = asyncio.ensure_future(pipeline.filter_worker())
+        for batch in batches:
+            pipeline.pending.update(batch)
+            for pair_address in batch:
+                await pipeline.filter_queue.put((pair_address, {"pairs": []}))
+            await pipeline.filter_queue.join()
+        worker.cancel()
+        return pipeline
+
+    pipeline = asyncio.run(screen([["coin1", "coin2"], ["coin3"]]))
+    assert calls == [["coin1", "coin2"], ["coin3"]]
+    assert pipeline.persist_queue.get_nowait()[:2] == ("coin3", "no_socials")
+    assert "coin1" in new_pair_fetch.retry_scheduler and "coin2" in new_pair_fetch.retry_scheduler
+    assert pipeline.pending == {"coin3"}
+
+
+def test_a_bad_filter_spec_fails_at_startup(discovery_pipeline, monkeypatch):
+    def load_filter():
+        raise FilterError("unknown field 'nope'")
+
+    monkeypatch.setattr(filter_engine, "pair_filter", None)
+    monkeypatch.setattr(filter_engine, "load_filter", load_filter)
+    with pytest.raises(FilterError):
+        discovery_pipeline.DiscoveryPipeline(session=None)
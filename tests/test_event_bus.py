@@ -0,0 +1,37 @@
+import json
+
+from event_bus import EventBus
+
+
+def drain(subscription):
+    events = []
+    while not subscription.queue.empty():
+        events.append(json.loads(subscription.queue.get_nowait()))
+    return events
+
+
+def test_a_full_subscriber_keeps_the_newest_events():
+    bus = EventBus(queue_size=3)
+    slow = bus.subscribe()
+    for i in range(5):
+        bus.publish("listing", address=f"coin{i}")
+    assert [event["address"] for event in drain(slow)] == ["coin2", "coin3", "coin4"]
+    assert slow.dropped == 2
+    assert bus.stats()["dropped"] == 2 and bus.stats()["published"]["listing"] == 5
+
+
+def test_subscribers_only_get_their_topics_and_do_not_share_drops():
+    bus = EventBus(queue_size=2)
+    listings = bus.subscribe(["listing"])
+    everything = bus.subscribe(maxsize=10)
+    bus.publish("listing", address="coin0")
+    for i in range(3):
+        bus.publish("snapshot", address=f"coin{i}", price_usd=float("nan"))
+    assert [event["topic"] for event in drain(listings)] == ["listing"]
+    events = drain(everything)
+    assert len(events) == 4 and everything.dropped == 0
+    assert events[-1]["price_usd"] is None  # NaN is sent as null
+
+    listings.close()
+    bus.publish("listing", address="coin1")
+    assert drain(listings) == [] and bus.stats()["subscribers"] == 1
@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+import pytest
+
+from filter_engine import DEFAULT_FILTER, FilterError, PairFilter
+
+
+def pair(**fields):
+    base = {"dexId": "raydium", "priceUsd": "1.0", "liquidity": {"usd": 10000},
+            "txns": {"m5": {"buys": 10, "sells": 5}}, "info": {"socials": [{"type": "twitter"}]}}
+    base.update(fields)
+    return base
+
+
+def test_default_filter_is_the_socials_check():
+    screen = PairFilter(DEFAULT_FILTER).screen({
+        "with": {"pairs": [pair()]},
+        "without": {"pairs": [pair(info={})]},
+        "empty": {"pairs": []},
+    })
+    assert screen == {"with": True, "without": False, "empty": None}
+
+
+def test_any_pair_of_an_address_can_pass():
+    rule = {"field": "liquidity_usd", "op": ">=", "value": 5000}
+    responses = {"coin": {"pairs": [pair(liquidity={"usd": 10}), pair()]}}
+    assert PairFilter(rule).screen(responses) == {"coin": True}
+
+
+def test_nested_rules():
+    spec = {"all": [
+        {"field": "dex_id", "op": "in", "value": ["raydium", "pumpswap"]},
+        {"any": [{"field": "buys_m5", "op": ">", "value": 100}, {"field": "has_socials", "op": "==", "value": True}]},
+        {"not": {"field": "sells_m5", "op": ">", "value": 20}},
+    ]}
+    mask = PairFilter(spec).mask([pair(), pair(dexId="orca"), pair(info={}), pair(txns={"m5": {"sells": 50}})])
+    assert mask.tolist() == [True, False, False, False]
+
+
+def test_missing_numbers_fail_every_comparison():
+    spec = {"any": [{"field": "fdv", "op": ">", "value": 0}, {"field": "fdv", "op": "<=", "value": 0}]}
+    assert PairFilter(spec).mask([pair()]).tolist() == [False]
+
+
+def test_age_is_derived_from_the_creation_time():
+    now = time.time()
+    spec = {"field": "age_seconds", "op": "<", "value": 3600}
+    pairs = [pair(pairCreatedAt=(now - 60) * 1000), pair(pairCreatedAt=(now - 7200) * 1000)]
+    assert PairFilter(spec).mask(pairs, now=now).tolist() == [True, False]
+
+
+def test_mask_columns_takes_per_row_times():
+    spec = {"field": "age_seconds", "op": "<", "value": 100}
+    columns = {"pair_created_at": np.array([0.0, 0.0])}
+    mask = PairFilter(spec).mask_columns(columns, 2, now=np.array([50.0, 500.0]))
+    assert mask.tolist() == [True, False]
+
+
+@pytest.mark.parametrize("spec", [
+    {"field": "nope", "op": "==", "value": 1},
+    {"field": "fdv", "op": "~", "value": 1},
+    {"field": "fdv", "op": ">="},
+    {"field": "fdv", "op": ">", "value": "high"},
+    {"field": "fdv", "op": "in", "value": 5},
+    {"field": "dex_id", "op": "<", "value": "raydium"},
+    ["not", "an", "object"],
+])
+def test_invalid_rules_raise_filter_error(spec):
+    with pytest.raises(FilterError):
+        PairFilter(spec)
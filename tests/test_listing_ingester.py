@@ -0,0 +1,102 @@
+import asyncio
+import importlib
+
+import pytest
+
+import listing_ingester
+from listing_ingester import ListingIngester
+from write_behind import get_writer
+
+
+class MetaStore:
+    """The get_meta / set_meta half of a StateStore."""
+
+    path = "meta-store"
+
+    def __init__(self):
+        self.meta = {}
+
+    def get_meta(self, key):
+        return self.meta.get(key)
+
+    def set_meta(self, key, value):
+        self.meta[key] = value
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """A Birdeye new-listing feed; append {"address", "liquidityAddedAt"} items to it."""
+    listings = []
+
+    def fetch_new_listings(limit, session=None, time_to=None):
+        items = [item for item in listings if time_to is None or item["liquidityAddedAt"] < time_to]
+        return sorted(items, key=lambda item: -item["liquidityAddedAt"])[:limit]
+
+    monkeypatch.setattr(listing_ingester, "fetch_new_listings", fetch_new_listings)
+    return listings
+
+
+def list_coins(feed, start, count):
+    feed.extend({"address": f"coin{start + i}", "liquidityAddedAt": 1000 + start + i} for i in range(count))
+
+
+def addresses(items):
+    return [item["address"] for item in items]
+
+
+def test_first_poll_starts_from_the_newest_page(feed):
+    list_coins(feed, 0, 30)
+    ingester = ListingIngester(page_limit=10)
+    assert addresses(ingester.poll()) == [f"coin{i}" for i in range(20, 30)]
+    assert ingester.poll() == []
+
+
+def test_bursts_longer_than_a_page_are_paged_back_to_the_mark(feed):
+    list_coins(feed, 0, 5)
+    ingester = ListingIngester(page_limit=10)
+    ingester.poll()
+    list_coins(feed, 5, 25)
+    assert addresses(ingester.poll()) == [f"coin{i}" for i in range(5, 30)]
+    assert ingester.requests == 4 and ingester.gaps == 0
+
+
+def test_running_out_of_pages_is_a_gap(feed):
+    list_coins(feed, 0, 1)
+    ingester = ListingIngester(page_limit=10, max_pages=2)
+    ingester.poll()
+    list_coins(feed, 1, 40)
+    assert len(ingester.poll()) == 20
+    assert ingester.gaps == 1
+
+
+def test_the_mark_survives_a_restart(feed):
+    store = MetaStore()
+    list_coins(feed, 0, 5)
+    ListingIngester(store, page_limit=10).poll()
+    get_writer().flush()  # the cursor is saved by the write-behind thread
+    list_coins(feed, 5, 3)
+    assert addresses(ListingIngester(store, page_limit=10).poll()) == ["coin5", "coin6", "coin7"]
+
+
+def test_failed_lookups_are_handed_to_the_retries(new_pair_fetch, monkeypatch):
+    # Imported here, after new_pair_fetch has been loaded into tmp_path
+    discovery_pipeline = importlib.import_module("discovery_pipeline")
+
+    async def failing_lookup(session, addresses, fresh=False):
+        return {}  # what fetch_tokens_async returns when every batch fails
+
+    monkeypatch.setattr(discovery_pipeline, "new_pair_fetch", new_pair_fetch)
+    monkeypatch.setattr(discovery_pipeline, "fetch_tokens_async", failing_lookup)
+
+    async def look_up(pair_addresses):
+        pipeline = discovery_pipeline.DiscoveryPipeline(session=None)
+        for pair_address in pair_addresses:
+            await pipeline.enqueue(pair_address)
+        worker = asyncio.ensure_future(pipeline.lookup_worker())
+        await pipeline.lookup_queue.join()
+        worker.cancel()
+        return pipeline
+
+    pipeline = asyncio.run(look_up(["coin1", "coin2"]))
+    assert not pipeline.pending
+    assert "coin1" in new_pair_fetch.retry_scheduler and "coin2" in new_pair_fetch.retry_scheduler
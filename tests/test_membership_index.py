@@ -0,0 +1,97 @@
+import os
+
+import membership_index
+from membership_index import JOURNAL_SUFFIX, MembershipSet, b58encode
+from state_store import StateStore
+
+ADDRESSES = [b58encode(bytes([i]) * 32) for i in range(1, 50)]
+
+
+def test_membership_and_non_key_addresses():
+    index = MembershipSet(ADDRESSES[:10] + ["not-base58!"])
+    assert all(address in index for address in ADDRESSES[:10])
+    assert ADDRESSES[10] not in index
+    assert "not-base58!" in index and len(index) == 11
+    index.discard(ADDRESSES[0])
+    assert ADDRESSES[0] not in index and len(index) == 10
+
+
+def test_save_and_open_map_the_same_set(tmp_path):
+    path = str(tmp_path / "set.idx")
+    MembershipSet(ADDRESSES + ["other"]).save(path, stamp=7)
+    index = MembershipSet.open(path)
+    assert index.stamp == 7
+    assert sorted(index) == sorted(ADDRESSES + ["other"])
+    assert MembershipSet.open(str(tmp_path / "missing.idx")) is None
+
+
+def test_changes_are_journaled_and_replayed(tmp_path):
+    path = str(tmp_path / "set.idx")
+    MembershipSet(ADDRESSES[:10]).save(path)
+    index = MembershipSet.open(path)
+    index.add(ADDRESSES[20])
+    index.discard(ADDRESSES[0])
+    index.save_changes(path)
+    size = os.path.getsize(path)
+    index.add(ADDRESSES[21])
+    index.discard(ADDRESSES[20])
+    index.save_changes(path)
+    assert os.path.getsize(path) == size  # only the journal grew
+    assert open(path + JOURNAL_SUFFIX).read().splitlines() == [
+        f"+{ADDRESSES[20]}", f"-{ADDRESSES[0]}", f"+{ADDRESSES[21]}", f"-{ADDRESSES[20]}"]
+
+    reopened = MembershipSet.open(path)
+    assert sorted(reopened) == sorted(ADDRESSES[1:10] + [ADDRESSES[21]])
+
+
+def test_a_torn_journal_line_is_ignored(tmp_path):
+    path = str(tmp_path / "set.idx")
+    MembershipSet(ADDRESSES[:3]).save(path)
+    with open(path + JOURNAL_SUFFIX, "w") as file:
+        file.write(f"+{ADDRESSES[3]}\n+{ADDRESSES[4][:10]}")
+    assert sorted(MembershipSet.open(path)) == sorted(ADDRESSES[:4])
+
+
+def test_a_long_journal_is_folded_into_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(membership_index, "JOURNAL_MIN_COMPACT", 4)
+    path = str(tmp_path / "set.idx")
+    index = MembershipSet(ADDRESSES[:2])
+    index.save(path)
+    index.update(ADDRESSES[2:10])
+    index.save_changes(path)
+    assert not os.path.exists(path + JOURNAL_SUFFIX)
+    assert sorted(MembershipSet.open(path)) == sorted(ADDRESSES[:10])
+
+
+def test_stale_index_is_rebuilt_and_indexed_sets_are_not_exported(tmp_path):
+    json_files = {"seen": str(tmp_path / "seen.json"), "kept": str(tmp_path / "kept.json")}
+    store = StateStore(str(tmp_path / "state.db"), json_files=json_files, compaction_interval=0)
+    store.apply(add={"seen": ADDRESSES[:5], "kept": ADDRESSES[:2]})
+    index = store.load_index("seen", str(tmp_path / "seen.idx"))
+    assert sorted(index) == sorted(ADDRESSES[:5])
+    store.compact()
+    assert os.path.exists(json_files["kept"]) and not os.path.exists(json_files["seen"])
+    store.apply(add={"seen": [ADDRESSES[5]]})  # as if the process died before the next compaction
+
+    reopened = StateStore(str(tmp_path / "state.db"), json_files=json_files, compaction_interval=0)
+    assert sorted(reopened.load_index("seen", str(tmp_path / "seen.idx"))) == sorted(ADDRESSES[:6])
+    store.close()
+    reopened.close()
+
+
+def test_compaction_journals_indexes_a_restart_can_trust(tmp_path):
+    json_files = {"seen": str(tmp_path / "seen.json")}
+    with open(json_files["seen"], "w") as file:
+        file.write(f'["{ADDRESSES[0]}"]')
+    store = StateStore(str(tmp_path / "state.db"), json_files=json_files, compaction_interval=0)
+    index = store.load_index("seen", str(tmp_path / "seen.idx"))
+    assert not os.path.exists(json_files["seen"]) and os.path.exists(json_files["seen"] + ".migrated")
+
+    index.add(ADDRESSES[1])
+    store.apply(add={"seen": [ADDRESSES[1]]})
+    store.compact()
+    # As if the process died here: the index file is stale, its journal is not
+    journaled = MembershipSet.open(str(tmp_path / "seen.idx"))
+    assert journaled.stamp == int(store.get_meta("version:seen"))
+    assert sorted(journaled) == sorted(ADDRESSES[:2])
+    store.close()
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from payload_archive import INDEX_FILE, RECORD_HEADER, PayloadArchive, migrate, segment_name
+from serialization import write_json
+
+PAYLOAD = {"schemaVersion": "1.0.0", "pairs": [{"pairAddress": "p1", "priceUsd": "0.5"}]}
+
+
+def test_append_get_and_reopen(tmp_path):
+    archive = PayloadArchive(str(tmp_path))
+    archive.append("a", PAYLOAD, ts=1)
+    archive.append("b", {"pairs": []}, ts=2)
+    archive.append("a", {"pairs": [{"pairAddress": "p2"}]}, ts=3)
+    assert archive.get("a") == {"pairs": [{"pairAddress": "p2"}]}
+    assert archive.get("missing") is None
+    archive.close()
+
+    reopened = PayloadArchive(str(tmp_path))
+    assert len(reopened) == 2 and reopened.saved_at("a") == 3
+    assert [address for address, _, _ in reopened.scan(latest_only=True)] == ["b", "a"]
+    reopened.close()
+
+
+def test_records_after_the_saved_index_are_scanned_back_in(tmp_path):
+    archive = PayloadArchive(str(tmp_path))
+    archive.append("a", PAYLOAD)
+    archive.save_index()
+    archive.append("b", PAYLOAD)
+    archive.dirty = False  # as if the process died before close()
+    archive.close()
+    assert PayloadArchive(str(tmp_path)).get("b") == PAYLOAD
+
+
+def test_torn_tail_is_cut_off_on_open(tmp_path):
+    archive = PayloadArchive(str(tmp_path))
+    archive.append("a", PAYLOAD)
+    archive.close()
+    path = os.path.join(str(tmp_path), segment_name(1))
+    size = os.path.getsize(path)
+    with open(path, "ab") as file:
+        file.write(RECORD_HEADER.pack(100, 0, 0, 1) + b"x")  # header of a record that never finished
+
+    archive = PayloadArchive(str(tmp_path))
+    assert os.path.getsize(path) == size
+    archive.append("b", PAYLOAD)
+    assert archive.get("a") == PAYLOAD and archive.get("b") == PAYLOAD
+    archive.close()
+
+
+def test_corrupt_record_stops_the_scan(tmp_path):
+    archive = PayloadArchive(str(tmp_path))
+    archive.append("a", PAYLOAD)
+    archive.append("b", PAYLOAD)
+    archive.close()
+    os.remove(os.path.join(str(tmp_path), INDEX_FILE))
+    path = os.path.join(str(tmp_path), segment_name(1))
+    with open(path, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        file.write(b"\0")
+    assert PayloadArchive(str(tmp_path), readonly=True).addresses() == ["a"]
+
+
+def test_readonly_never_truncates_or_writes(tmp_path):
+    archive = PayloadArchive(str(tmp_path))
+    archive.append("a", PAYLOAD)
+    archive.close()
+    path = os.path.join(str(tmp_path), segment_name(1))
+    with open(path, "ab") as file:
+        file.write(b"partial record still being written")
+    size = os.path.getsize(path)
+    index = open(os.path.join(str(tmp_path), INDEX_FILE), "rb").read()
+
+    reader = PayloadArchive(str(tmp_path), readonly=True)
+    assert reader.get("a") == PAYLOAD
+    with pytest.raises(ValueError):
+        reader.append("b", PAYLOAD)
+    reader.close()
+    assert os.path.getsize(path) == size
+    assert open(os.path.join(str(tmp_path), INDEX_FILE), "rb").read() == index
+
+
+def test_segments_roll_over(tmp_path):
+    archive = PayloadArchive(str(tmp_path), segment_bytes=200)
+    for i in range(10):
+        archive.append(f"coin{i}", PAYLOAD)
+    assert archive.stats()["segments"] > 1
+    assert all(archive.get(f"coin{i}") == PAYLOAD for i in range(10))
+    archive.close()
+
+
+def test_migrate_packs_payload_files_once(tmp_path):
+    write_json(str(tmp_path / "coin1.json"), PAYLOAD)
+    write_json(str(tmp_path / "processed_pairs.json"), ["coin1"])
+    archive = PayloadArchive(str(tmp_path / "archive"))
+    assert migrate(str(tmp_path), archive)[0] == 1
+    migrate(str(tmp_path), archive)
+    assert len(list(archive.scan())) == 1
+    assert archive.get("coin1") == PAYLOAD
+    archive.close()
+
+
+def test_two_writers_keep_each_others_records(tmp_path):
+    first = PayloadArchive(str(tmp_path))
+    second = PayloadArchive(str(tmp_path))
+    first.append("a", {"pairs": ["a"]})
+    second.append("b", {"pairs": ["b"]})
+    first.append("c", {"pairs": ["c"]})
+    assert first.get("c") == {"pairs": ["c"]}
+    assert second.get("b") == {"pairs": ["b"]}
+    first.close()
+    second.close()  # saved last, yet must not drop the records of `first`
+
+    reopened = PayloadArchive(str(tmp_path))
+    assert {address: reopened.get(address) for address in "abc"} == {
+        "a": {"pairs": ["a"]}, "b": {"pairs": ["b"]}, "c": {"pairs": ["c"]}}
+    reopened.close()
+
+
+def test_writers_follow_each_others_segment_rollover(tmp_path):
+    first = PayloadArchive(str(tmp_path), segment_bytes=200)
+    second = PayloadArchive(str(tmp_path), segment_bytes=200)
+    for i in range(6):
+        (first if i % 2 else second).append(f"coin{i}", PAYLOAD)
+    assert all(first.get(f"coin{i}") == PAYLOAD for i in range(6))
+    first.close()
+    second.close()
+    assert len(PayloadArchive(str(tmp_path), readonly=True)) == 6
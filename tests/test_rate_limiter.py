@@ -0,0 +1,62 @@
+import pytest
+
+from rate_limiter import (DECREASE_FACTOR, INCREASE_FRACTION, AdaptiveRateLimiter, parse_retry_after)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_reserve_waits_once_the_burst_is_spent(clock):
+    limiter = AdaptiveRateLimiter(5, clock=clock)
+    assert [limiter.reserve() for _ in range(5)] == [0.0] * 5
+    assert limiter.reserve() == pytest.approx(0.2)
+    clock.advance(1.0)
+    assert limiter.reserve() == 0.0
+
+
+def test_throttling_halves_the_rate_once_per_cooldown(clock):
+    limiter = AdaptiveRateLimiter(10, clock=clock)
+    limiter.record(429)
+    limiter.record(429)
+    assert limiter.rate == 10 * DECREASE_FACTOR
+    clock.advance(1.0)
+    limiter.record(503)
+    assert limiter.rate == 10 * DECREASE_FACTOR ** 2
+
+
+def test_rate_never_drops_below_the_minimum(clock):
+    limiter = AdaptiveRateLimiter(10, min_rate=2, clock=clock)
+    for _ in range(10):
+        limiter.record(429)
+        clock.advance(1.0)
+    assert limiter.rate == 2
+
+
+def test_healthy_responses_raise_the_rate_additively(clock):
+    limiter = AdaptiveRateLimiter(10, clock=clock)
+    limiter.record(429)
+    limiter.record(200)
+    assert limiter.rate == pytest.approx(5 + 10 * INCREASE_FRACTION)
+    for _ in range(100):
+        limiter.record(200)
+    assert limiter.rate == 10
+
+
+def test_retry_after_blocks_every_request(clock):
+    limiter = AdaptiveRateLimiter(10, clock=clock)
+    limiter.record(429, "2")
+    assert limiter.reserve() == pytest.approx(2.0)
+    assert not limiter.try_acquire()
+    clock.advance(2.5)
+    assert limiter.try_acquire()
+
+
+def test_try_acquire_never_goes_into_debt(clock):
+    limiter = AdaptiveRateLimiter(2, clock=clock)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.tokens == 0
@@ -0,0 +1,64 @@
+from pair_snapshot import PairSnapshot
+from refresh_tiers import TIER_INTERVALS, TieredScheduler, classify
+
+
+def activity(txns=0, volume=0.0):
+    return PairSnapshot(address="coin", ts=1, buys_m5=txns, sells_m5=0, volume_m5=volume)
+
+
+def test_tiers_follow_the_thresholds():
+    assert classify(None) == "cold"
+    assert classify(activity()) == "cold"
+    assert classify(activity(txns=4, volume=499)) == "cold"
+    assert classify(activity(txns=5)) == "warm"
+    assert classify(activity(volume=500)) == "warm"
+    assert classify(activity(txns=50)) == "hot"
+    assert classify(activity(txns=1, volume=10000)) == "hot"
+    assert classify(PairSnapshot(address="coin", ts=1)) == "cold"  # missing counts and volume
+
+
+def test_coins_are_promoted_and_demoted_as_their_activity_changes(clock):
+    scheduler = TieredScheduler(clock=clock)
+    scheduler.sync(["coin"])
+    assert scheduler.pop_due() == ["coin"]  # new coins start hot and due now
+
+    scheduler.observe("coin", activity())
+    assert scheduler.tiers["coin"] == "cold" and scheduler.demotions == 1
+    clock.advance(TIER_INTERVALS["cold"] - 1)
+    assert scheduler.pop_due() == []
+    clock.advance(1)
+    assert scheduler.pop_due() == ["coin"]
+
+    scheduler.observe("coin", activity(txns=60))
+    assert scheduler.tiers["coin"] == "hot" and scheduler.promotions == 1
+    assert scheduler.next_wake() == TIER_INTERVALS["hot"]
+    assert scheduler.stats()["hot"] == 1
+
+
+def test_each_cycle_hands_out_at_most_max_batches(clock):
+    scheduler = TieredScheduler(batch_size=30, max_batches=2, clock=clock)
+    scheduler.sync([f"coin{i}" for i in range(100)])
+    first = scheduler.pop_due()
+    assert len(first) == 60
+    second = scheduler.pop_due()
+    # The other 40, and the partial batch topped up with 20 of the first cycle's coins
+    assert len(second) == 60 and len(set(second) - set(first)) == 40
+
+
+def test_a_partial_batch_is_topped_up_with_the_coins_due_next(clock):
+    scheduler = TieredScheduler(batch_size=30, clock=clock)
+    scheduler.sync([f"coin{i}" for i in range(40)])
+    scheduler.pop_due()
+    for i in range(40):
+        scheduler.observe(f"coin{i}", activity(txns=60 if i < 10 else 0))
+    clock.advance(TIER_INTERVALS["hot"])
+    # 10 hot coins are due; the batch is filled with 20 cold ones due later
+    assert len(scheduler.pop_due()) == 30
+
+
+def test_sync_returns_the_removed_addresses(clock):
+    scheduler = TieredScheduler(clock=clock)
+    scheduler.sync(["a", "b", "c"])
+    assert sorted(scheduler.sync(["b", "c", "d"])) == ["a"]
+    assert len(scheduler) == 3 and "a" not in scheduler.tiers
+    assert sorted(scheduler.pop_due()) == ["b", "c", "d"]  # "a" is never handed out again
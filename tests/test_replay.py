@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+
+import replay
+from pair_snapshot import PairSnapshot
+from snapshot_store import SnapshotStore
+
+START = 1_700_000_000_000
+MINUTE = 60 * 1000
+
+
+def rows_part(ts, prices, pair=None):
+    """A ("rows", columns, pair) part like the ones read from payloads, with just ts and price."""
+    columns = {"ts": np.array(ts, dtype="<i8")}
+    for field, _ in replay.NUMERIC_FIELDS:
+        columns[field] = np.full(len(ts), np.nan)
+    columns["price_usd"] = np.array(prices, dtype=float)
+    return ("rows", columns, pair)
+
+
+def test_parts_are_merged_in_time_order_keeping_the_first_row_per_timestamp(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.append_many("coin", [PairSnapshot("coin", ts=START + i * MINUTE, price_usd=float(i)) for i in (1, 3)])
+    parts = [
+        ("store", str(tmp_path)),
+        rows_part([START + 3 * MINUTE, START + 2 * MINUTE], [30.0, 2.0], pair={"dexId": "old"}),
+        rows_part([START + 4 * MINUTE], [4.0], pair={"dexId": "new"}),
+    ]
+    columns, pair = replay.load_parts("coin", parts)
+    assert columns["ts"].tolist() == [START + i * MINUTE for i in (1, 2, 3, 4)]
+    assert columns["price_usd"].tolist() == [1.0, 2.0, 3.0, 4.0]  # the store's row at 3 wins
+    assert math.isnan(columns["buys_m5"][0])  # missing counts (-1 in the store) become NaN
+    assert pair == {"dexId": "new"}  # from the newest payload
+
+    assert replay.load_parts("missing", [("store", str(tmp_path))]) == (None, None)
+
+
+def test_forward_returns_use_the_first_row_past_each_horizon():
+    ts = np.array([START, START + 4 * MINUTE, START + 6 * MINUTE, START + 70 * MINUTE])
+    price = np.array([1.0, 2.0, 3.0, 0.0])
+    returns = replay.forward_returns(ts, price)
+    assert returns["5m"][:3].tolist() == [2.0, -1.0, -1.0]  # 1 -> 3, 2 -> 0, 3 -> 0
+    assert math.isnan(returns["5m"][3])  # nothing that far ahead
+    assert returns["1h"][0] == -1.0 and np.isnan(returns["24h"]).all()
+    assert replay.forward_returns(ts, price, np.array([1]))["5m"].tolist() == [-1.0]
+
+
+def test_entries_are_rows_where_the_rule_starts_passing():
+    replay.init_worker({"all": [
+        {"field": "price_usd", "op": ">", "value": 2},
+        {"field": "has_socials", "op": "==", "value": True},
+    ]})
+    prices = [1.0, 3.0, 3.0, 1.0, 4.0, 8.0]
+    pair = {"priceUsd": "8", "info": {"socials": [{"type": "twitter"}]}}
+    part = rows_part([START + i * 5 * MINUTE for i in range(len(prices))], prices, pair)
+    result = replay.replay_address(("coin", [part]))
+    assert result["rows"] == 6 and result["passed_rows"] == 4
+    assert [ts for ts, _, _ in result["entries"]] == [START + 5 * MINUTE, START + 20 * MINUTE]
+    assert [entry["return_5m"] for _, _, entry in result["entries"]] == [0.0, 1.0]
+
+    # Without socials (from the discovery payload) the rule never passes
+    result = replay.replay_address(("coin", [rows_part(part[1]["ts"], prices, {"info": {}})]))
+    assert result["passed_rows"] == 0 and result["entries"] == []
@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+import requests
+
+import rate_limiter
+from resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceeded, deadline, get_breaker,
+                        remaining, request_timeout, within_deadline)
+
+
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, reset_timeout=30, clock=clock)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    circuit = breaker(clock)
+    for _ in range(2):
+        circuit.allow()
+        circuit.record_failure()
+    circuit.record_success()  # resets the count
+    for _ in range(3):
+        circuit.allow()
+        circuit.record_failure()
+    assert circuit.state == "open"
+    with pytest.raises(CircuitOpenError):
+        circuit.allow()
+
+
+def test_half_open_lets_one_probe_through(clock):
+    circuit = breaker(clock)
+    for _ in range(3):
+        circuit.record_failure()
+    clock.advance(31)
+    assert circuit.allow() is True
+    assert circuit.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        circuit.allow()
+    circuit.record_status(200)
+    assert circuit.state == "closed"
+    assert circuit.allow() is False
+
+
+def test_failed_probe_reopens(clock):
+    circuit = breaker(clock)
+    for _ in range(3):
+        circuit.record_failure()
+    clock.advance(31)
+    circuit.allow()
+    circuit.record_status(502)
+    assert circuit.state == "open"
+
+
+def test_released_probe_frees_the_half_open_slot(clock):
+    circuit = breaker(clock)
+    for _ in range(3):
+        circuit.record_failure()
+    clock.advance(31)
+    assert circuit.allow()
+    circuit.release_probe()  # e.g. the probe was cancelled
+    assert circuit.allow()
+
+
+def test_throttling_is_not_a_failure(clock):
+    circuit = breaker(clock)
+    for _ in range(5):
+        circuit.record_status(429)
+    assert circuit.state == "closed"
+
+
+def test_deadlines_nest_and_only_shrink():
+    assert remaining() is None
+    assert request_timeout(7) == 7
+    with deadline(5):
+        with deadline(60):
+            assert remaining() <= 5
+        assert request_timeout(10) <= 5
+    assert remaining() is None
+
+
+def test_passed_deadline_fails_fast():
+    with deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            request_timeout()
+
+
+def test_within_deadline_wraps_sync_and_async_functions():
+    @within_deadline(3)
+    def sync():
+        return remaining()
+
+    @within_deadline(3)
+    async def coroutine():
+        return remaining()
+
+    assert 0 < sync() <= 3
+    assert 0 < asyncio.run(coroutine()) <= 3
+
+
+def test_open_circuit_fails_fast_without_spending_tokens(fake_api):
+    _, base_url = fake_api(outage=(0, 3600))
+    limiter = rate_limiter.AdaptiveRateLimiter(1000, name="test-outage")
+    url = f"{base_url}/latest/dex/search?q=x"
+    for _ in range(5):
+        rate_limiter.limited_get(limiter, requests, url)
+    assert get_breaker("test-outage").state == "open"
+    tokens = limiter.tokens
+    with pytest.raises(CircuitOpenError):
+        rate_limiter.limited_get(limiter, requests, url)
+    assert limiter.tokens == tokens
+
+
+def test_deadline_caps_a_hung_request(fake_api):
+    _, base_url = fake_api(hang_rate=1.0, hang_seconds=3)
+    limiter = rate_limiter.AdaptiveRateLimiter(1000, name="test-hang")
+    started = time.perf_counter()
+    with deadline(0.3), pytest.raises(requests.exceptions.Timeout):
+        rate_limiter.limited_get(limiter, requests, f"{base_url}/latest/dex/search?q=x")
+    assert time.perf_counter() - started < 1.5
+
+
+def test_cancelled_probe_does_not_stick_half_open(fake_api):
+    _, base_url = fake_api(hang_rate=1.0, hang_seconds=3)
+    limiter = rate_limiter.AdaptiveRateLimiter(1000, name="test-cancel")
+    circuit = get_breaker("test-cancel")
+    circuit.state, circuit.opened_at = "open", circuit.clock() - 60
+
+    async def cancel_probe():
+        async with aiohttp.ClientSession() as session:
+            task = asyncio.ensure_future(rate_limiter.limited_get_json_async(
+                limiter, session, f"{base_url}/latest/dex/search?q=x"))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(cancel_probe())
+    assert circuit.state == "half_open"
+    assert circuit.allow()  # the next request becomes the probe
+
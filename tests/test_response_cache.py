@@ -0,0 +1,86 @@
+import asyncio
+
+import metrics
+from response_cache import MISSING, ResponseCache, get_cache
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(5, clock=clock)
+    cache.put("a", 1)
+    clock.advance(4.9)
+    assert cache.get("a") == 1
+    clock.advance(0.2)
+    assert cache.get("a") is MISSING
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(5, max_entries=2, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING and cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_blocking_lookups_only_fetch_what_is_missing(clock):
+    cache = ResponseCache(5, clock=clock)
+    fetched = []
+
+    def fetch_many(keys):
+        fetched.append(keys)
+        return {key: key.upper() for key in keys if key != "gone"}
+
+    assert cache.get_many(["a", "gone"], fetch_many) == {"a": "A"}
+    assert cache.get_many(["a", "b", "gone"], fetch_many) == {"a": "A", "b": "B"}
+    assert fetched == [["a", "gone"], ["b", "gone"]]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 4
+
+
+def test_concurrent_lookups_share_one_request(clock):
+    cache = ResponseCache(5, clock=clock)
+    requests = []
+
+    async def fetch_many(keys):
+        requests.append(keys)
+        await asyncio.sleep(0.01)
+        return {key: key.upper() for key in keys}
+
+    async def look_up():
+        return await asyncio.gather(
+            cache.get_many_async(["a", "b"], fetch_many),
+            cache.get_many_async(["b", "c"], fetch_many),
+        )
+
+    first, second = asyncio.run(look_up())
+    assert first == {"a": "A", "b": "B"} and second == {"b": "B", "c": "C"}
+    assert requests == [["a", "b"], ["c"]]
+    assert cache.stats()["coalesced"] == 1 and not cache.inflight
+
+
+def test_waiters_of_a_failed_request_get_nothing(clock):
+    cache = ResponseCache(5, clock=clock)
+
+    async def failing_fetch(keys):
+        await asyncio.sleep(0.01)
+        raise OSError("upstream down")
+
+    async def look_up():
+        return await asyncio.gather(
+            cache.get_many_async(["a"], failing_fetch),
+            cache.get_many_async(["a"], failing_fetch),
+            return_exceptions=True,
+        )
+
+    failed, waiter = asyncio.run(look_up())
+    assert isinstance(failed, OSError) and waiter == {}
+    assert not cache.inflight and cache.get("a") is MISSING
+
+
+def test_counts_are_exported_as_counters():
+    cache = get_cache("test-endpoint")
+    cache.hits, cache.misses, cache.coalesced = 3, 2, 1
+    lines = metrics.registry.render().splitlines()
+    assert "# TYPE dex_cache_lookups_total counter" in lines
+    assert 'dex_cache_lookups_total{endpoint="test-endpoint",result="hit"} 3' in lines
+    assert 'dex_cache_lookups_total{endpoint="test-endpoint",result="coalesced"} 1' in lines
+    assert 'dex_cache_entries{endpoint="test-endpoint"} 0' in lines
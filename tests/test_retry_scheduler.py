@@ -0,0 +1,78 @@
+from retry_scheduler import RetryScheduler
+
+
+def scheduler(clock, **options):
+    return RetryScheduler(base_delay=5, max_delay=60, jitter=0, ttl=3600, clock=clock, **options)
+
+
+def test_nothing_is_due_before_the_first_delay(clock):
+    retries = scheduler(clock)
+    retries.add("a")
+    assert retries.pop_due() == ([], [])
+    clock.advance(5)
+    assert retries.pop_due() == (["a"], [])
+
+
+def test_delays_double_up_to_the_cap(clock):
+    retries = scheduler(clock)
+    retries.add("a")
+    waits = []
+    for _ in range(6):
+        entry = retries.entries["a"]
+        waits.append(entry.due - clock())
+        clock.advance(entry.due - clock())
+        assert retries.pop_due()[0] == ["a"]
+    assert waits == [5, 10, 20, 40, 60, 60]
+
+
+def test_jitter_stays_within_its_fraction(clock):
+    retries = RetryScheduler(base_delay=10, jitter=0.2, clock=clock)
+    assert all(8 <= retries.backoff(0) <= 12 for _ in range(100))
+
+
+def test_adding_again_keeps_the_schedule(clock):
+    retries = scheduler(clock)
+    retries.add("a")
+    clock.advance(3)
+    retries.add("a")
+    clock.advance(2)
+    assert retries.pop_due()[0] == ["a"]
+
+
+def test_discarded_addresses_are_never_handed_out(clock):
+    retries = scheduler(clock)
+    retries.add("a")
+    retries.add("b")
+    retries.discard("a")
+    clock.advance(5)
+    assert retries.pop_due() == (["b"], [])
+    assert "a" not in retries and len(retries) == 1
+
+
+def test_addresses_past_the_ttl_expire(clock):
+    retries = scheduler(clock)
+    retries.add("old", first_seen=clock() - 3600)
+    retries.add("new")
+    clock.advance(5)
+    assert retries.pop_due() == (["new"], ["old"])
+    assert "old" not in retries
+
+
+def test_each_cycle_hands_out_at_most_the_limit(clock):
+    retries = scheduler(clock, max_per_cycle=3)
+    for i in range(5):
+        retries.add(f"coin{i}")
+    clock.advance(5)
+    assert len(retries.pop_due()[0]) == 3
+    assert len(retries.pop_due()[0]) == 2
+
+
+def test_stale_heap_items_are_dropped(clock):
+    retries = scheduler(clock)
+    for i in range(200):
+        retries.add(f"coin{i}")
+        retries.discard(f"coin{i}")
+    retries.add("kept")
+    clock.advance(5)
+    assert retries.pop_due()[0] == ["kept"]
+    assert len(retries.heap) <= 2 * len(retries) + 64
@@ -0,0 +1,22 @@
+import pytest
+
+import serialization
+
+PAYLOAD = {"pairs": [{"priceUsd": "1.5", "baseToken": {"name": "Café"}, "txns": {"m5": {"buys": 3}}}]}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_both_backends_write_the_same_bytes(backend):
+    assert serialization.dumps(PAYLOAD, pretty=False) == (
+        '{"pairs":[{"priceUsd":"1.5","baseToken":{"name":"Café"},"txns":{"m5":{"buys":3}}}]}'.encode())
+    pretty = serialization.dumps(PAYLOAD, pretty=True).decode()
+    assert pretty.splitlines()[:3] == ["{", '  "pairs": [', "    {"]
+    assert serialization.loads(pretty) == PAYLOAD
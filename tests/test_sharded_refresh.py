@@ -0,0 +1,94 @@
+import pytest
+
+import sharded_refresh
+from sharded_refresh import HashRing, RefreshCoordinator
+
+ADDRESSES = [f"coin{i}" for i in range(4000)]
+
+
+def owners(ring):
+    return {address: ring.node_for(address) for address in ADDRESSES}
+
+
+def moved(before, after):
+    return sum(before[address] != after[address] for address in ADDRESSES)
+
+
+def test_assign_gives_each_address_to_exactly_one_worker():
+    assignment = HashRing(range(4)).assign(ADDRESSES)
+    assert set(assignment) == {0, 1, 2, 3}
+    owned = [address for addresses in assignment.values() for address in addresses]
+    assert sorted(owned) == sorted(ADDRESSES)
+    # Virtual nodes keep the shards roughly even
+    assert all(len(addresses) > len(ADDRESSES) / 4 * 0.6 for addresses in assignment.values())
+
+
+def test_adding_or_removing_a_worker_moves_about_one_in_n():
+    ring = HashRing(range(4))
+    before = owners(ring)
+
+    ring.add(4)
+    after = owners(ring)
+    assert moved(before, after) == pytest.approx(len(ADDRESSES) / 5, rel=0.4)
+    # Only the new worker gains addresses
+    assert all(after[address] == 4 for address in ADDRESSES if before[address] != after[address])
+
+    ring.remove(4)
+    assert owners(ring) == before
+
+
+class FakeProcess:
+    exitcode = None
+
+    def __init__(self, target, args, daemon):
+        pass
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+    def join(self, timeout=None):
+        pass
+
+
+class ControlQueue(list):
+    put = list.append
+
+
+class FakeContext:
+    """Worker "processes" that never start; their control queues are plain lists."""
+
+    Process = FakeProcess
+    Queue = ControlQueue
+
+
+@pytest.fixture
+def coordinator(monkeypatch):
+    monkeypatch.setattr(sharded_refresh.multiprocessing, "get_context", lambda method: FakeContext())
+    return RefreshCoordinator(workers=4)
+
+
+def test_resizing_only_reassigns_the_moved_shards(coordinator):
+    coordinator.rebalance(ADDRESSES)
+    before = {worker_id: list(owned) for worker_id, owned in coordinator.assigned.items()}
+    for _, control in coordinator.processes.values():
+        control.clear()
+
+    coordinator.resize(5)
+    coordinator.rebalance(ADDRESSES)
+    after = coordinator.assigned
+    assert sorted(address for owned in after.values() for address in owned) == sorted(ADDRESSES)
+    moved_count = sum(len(set(before[worker_id]) - set(after[worker_id])) for worker_id in before)
+    assert moved_count == len(after[4])
+    assert moved_count == pytest.approx(len(ADDRESSES) / 5, rel=0.4)
+
+    sent = {worker_id: len(control) for worker_id, (_, control) in coordinator.processes.items()}
+    assert sent == {worker_id: 1 for worker_id in range(5)}  # every shard changed
+    coordinator.rebalance(ADDRESSES)  # nothing changed: nothing is sent again
+    assert all(len(control) == 1 for _, control in coordinator.processes.values())
+
+    coordinator.resize(4)
+    coordinator.rebalance(ADDRESSES)
+    assert coordinator.assigned == before
@@ -0,0 +1,111 @@
+import math
+import os
+
+import numpy as np
+
+from pair_snapshot import NUMERIC_FIELDS, PairSnapshot, parse_response
+from analytics import load_latest
+from snapshot_store import LATEST_FILE, SnapshotStore, import_csv
+
+DAY = 24 * 60 * 60 * 1000
+START = 1_700_000_000_000
+
+
+def snapshot(ts, price):
+    return PairSnapshot("coin", ts=ts, price_usd=price, buys_m5=3, volume_h24=1e6)
+
+
+def test_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.append_many("coin", [snapshot(START + i * 1000, float(i)) for i in range(5)])
+    columns = store.read_range("coin")
+    assert columns["ts"].tolist() == [START + i * 1000 for i in range(5)]
+    assert columns["price_usd"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert columns["buys_m5"].dtype == np.dtype("<i4") and columns["buys_m5"][0] == 3
+    assert math.isnan(columns["fdv"][0]) and columns["sells_m5"][0] == -1
+
+    latest = store.latest("coin")
+    assert latest.ts == START + 4000 and latest.price_usd == 4.0
+    assert store.addresses() == ["coin"]
+
+
+def test_rows_are_partitioned_by_day_and_range_reads_skip_days(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.append_many("coin", [snapshot(START + day * DAY, float(day)) for day in range(3)])
+    assert len(store.days("coin")) == 3
+    columns = store.read_range("coin", START + DAY, START + 2 * DAY, fields=["price_usd"])
+    assert set(columns) == {"ts", "price_usd"} and columns["price_usd"].tolist() == [1.0]
+
+
+def test_rows_not_newer_than_the_last_one_are_dropped(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.append("coin", snapshot(START + 2000, 2.0))
+    store.append_many("coin", [snapshot(START + 1000, 1.0), snapshot(START + 2000, 2.5), snapshot(START + 3000, 3.0)])
+    columns = store.read_range("coin")
+    assert columns["ts"].tolist() == [START + 2000, START + 3000]
+    assert columns["price_usd"].tolist() == [2.0, 3.0]
+
+
+def test_the_latest_row_follows_appends(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.append_many("coin", [snapshot(START + 1000, 1.0), snapshot(START + 3000, 3.0)])
+    store.append("coin", snapshot(START + 2000, 2.0))  # older: dropped, .latest unchanged
+    row = store.latest_row("coin")
+    assert row["ts"] == START + 3000 and row["price_usd"] == 3.0 and row["buys_m5"] == 3
+    assert store.latest_row("missing") is None
+
+    os.remove(os.path.join(str(tmp_path), "coin", LATEST_FILE))  # a history from before .latest
+    assert store.latest("coin").price_usd == 3.0
+
+
+def test_tail_reads_cross_into_the_previous_day(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    midnight = START - START % DAY + DAY
+    store.append_many("coin", [snapshot(midnight + offset, float(i))
+                               for i, offset in enumerate([-120_000, -60_000, 0, 60_000])])
+    assert store.read_tail("coin", 150_000, fields=["price_usd"])["price_usd"].tolist() == [1.0, 2.0, 3.0]
+    assert store.read_tail("coin", 30_000)["ts"].tolist() == [midnight + 60_000]
+    assert store.read_tail("missing", 30_000)["ts"].tolist() == []
+
+
+def test_load_latest_matches_the_per_coin_reads(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    for n, address in enumerate(["a", "b"]):
+        store.append_many(address, [PairSnapshot(address, ts=START + i * 60_000, price_usd=float(n + i))
+                                    for i in range(10)])
+    columns = load_latest(["a", "b", "missing"], store, momentum_window=5 * 60_000)
+    assert columns["price_usd"][:2].tolist() == [9.0, 10.0]
+    assert columns["price_before"][:2].tolist() == [4.0, 5.0]
+    assert columns["ts"][0] == START + 9 * 60_000
+    assert np.isnan(columns["price_usd"][2]) and np.isnan(columns["buys_m5"][0])
+
+
+def test_a_torn_append_reads_as_the_shortest_column(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.append_many("coin", [snapshot(START, 1.0), snapshot(START + 1000, 2.0)])
+    path = os.path.join(str(tmp_path), "coin", store.days("coin")[0], "ts.bin")
+    with open(path, "ab") as file:
+        np.array([START + 2000], dtype="<i8").tofile(file)
+    assert len(store.read_range("coin")["ts"]) == 2
+
+
+def test_parsed_snapshot_round_trips(tmp_path):
+    data = {"pairs": [{"priceUsd": "0.25", "fdv": 1000, "liquidity": {"usd": "500.5"},
+                       "txns": {"m5": {"buys": 4, "sells": 2}}, "volume": {"h1": 12.5}}]}
+    parsed = parse_response(data, "coin", ts=START)
+    store = SnapshotStore(str(tmp_path))
+    store.append("coin", parsed)
+    stored = store.latest("coin")
+    for field, _ in NUMERIC_FIELDS:
+        a, b = getattr(parsed, field), getattr(stored, field)
+        assert a == b or (math.isnan(a) and math.isnan(b)), field
+
+
+def test_import_csv(tmp_path):
+    csv_file = tmp_path / "coin.csv"
+    csv_file.write_text("Pair Address,Price (USD),M5 Buys,Volume M5\ncoin,1.5,3,100\ncoin,1.6,N/A,200\n")
+    store = SnapshotStore(str(tmp_path / "store"))
+    assert import_csv(store, str(csv_file), start_ts=START, interval=10) == 2
+    columns = store.read_range("coin")
+    assert columns["ts"].tolist() == [START, START + 10000]
+    assert columns["price_usd"].tolist() == [1.5, 1.6] and columns["buys_m5"].tolist() == [3, -1]
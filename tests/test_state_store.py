@@ -0,0 +1,101 @@
+import importlib
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+from state_store import StateStore
+from write_behind import get_writer
+
+
+def test_a_failed_change_is_rolled_back_across_sets(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"), compaction_interval=0)
+    store.apply(add={"seen": ["a"]})
+    changes = [
+        ({"seen": ["b"], "other": ["c"]}, {"seen": ["a"]}),
+        ({"other": [object()]}, None),  # cannot be bound: fails inside the transaction
+    ]
+    with pytest.raises(sqlite3.Error):
+        store.apply_many(changes)
+    assert store.load("seen") == {"a"} and store.load("other") == set()
+    assert store.get_meta("version:other") is None
+    store.apply(add={"other": ["c"]})  # the store is still usable
+    assert store.load("other") == {"c"}
+    store.close()
+
+
+def test_json_files_are_migrated_once(tmp_path):
+    json_file = str(tmp_path / "seen.json")
+    with open(json_file, "w") as file:
+        json.dump(["a", "b"], file)
+    path = str(tmp_path / "state.db")
+    store = StateStore(path, json_files={"seen": json_file}, compaction_interval=0)
+    assert store.load("seen") == {"a", "b"}
+    store.apply(remove={"seen": ["a"]})
+    store.close()
+
+    with open(json_file, "w") as file:
+        json.dump(["a", "b", "c"], file)  # edits after the migration are not imported
+    reopened = StateStore(path, json_files={"seen": json_file}, compaction_interval=0)
+    assert reopened.load("seen") == {"b"}
+    reopened.close()
+
+
+def test_compaction_exports_changed_sets(tmp_path):
+    json_files = {"seen": str(tmp_path / "seen.json"), "other": str(tmp_path / "other.json")}
+    store = StateStore(str(tmp_path / "state.db"), json_files=json_files, compaction_interval=0)
+    store.apply(add={"seen": ["b", "a"]})
+    assert not any(os.path.exists(json_file) for json_file in json_files.values())
+    store.compact()
+    with open(json_files["seen"]) as file:
+        assert json.load(file) == ["a", "b"]
+    assert not os.path.exists(json_files["other"])  # unchanged sets are not rewritten
+    store.close()
+
+
+def test_added_times_survive_a_reopen(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = StateStore(path, compaction_interval=0)
+    store.apply(add={"seen": ["a"]})
+    added = store.added_times("seen")["a"]
+    store.apply(add={"seen": ["a", "b"]})  # adding again keeps the first time
+    store.close()
+
+    reopened = StateStore(path, compaction_interval=0)
+    times = reopened.added_times("seen")
+    assert times["a"] == added and times["b"] >= added
+    reopened.close()
+
+
+def test_databases_without_added_at_are_upgraded(tmp_path):
+    path = str(tmp_path / "state.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE members (set_name TEXT NOT NULL, address TEXT NOT NULL,"
+                 " PRIMARY KEY (set_name, address)) WITHOUT ROWID")
+    conn.execute("INSERT INTO members VALUES ('seen', 'a')")
+    conn.commit()
+    conn.close()
+
+    store = StateStore(path, compaction_interval=0)
+    assert store.load("seen") == {"a"} and store.added_times("seen")["a"] > 0
+    store.close()
+
+
+def test_the_retry_ttl_keeps_counting_across_restarts(new_pair_fetch, monkeypatch):
+    new_pair_fetch.record_pair_status("coin1", "no_data", None)
+    get_writer().flush()
+    # As if coin1 had been added an hour ago, by an earlier run
+    new_pair_fetch.store.conn.execute("UPDATE members SET added_at = added_at - 3600")
+    first_seen = new_pair_fetch.store.added_times("no_data_pairs")["coin1"]
+    new_pair_fetch.store.close()
+    new_pair_fetch.payload_archive.close()
+
+    monkeypatch.delitem(sys.modules, "new_pair_fetch")
+    restarted = importlib.import_module("new_pair_fetch")
+    try:
+        assert restarted.retry_scheduler.entries["coin1"].first_seen == first_seen
+    finally:
+        restarted.store.close()
+        restarted.payload_archive.close()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+from state_store import StateStore
+from write_behind import WriteBehindWriter
+
+
+@pytest.fixture
+def stalled():
+    """A writer with room for one key whose first write hangs until `release` is set."""
+    release = threading.Event()
+    writer = WriteBehindWriter(max_pending=1)
+    written = []
+
+    def slow_write(value):
+        release.wait(5)
+        written.append(value)
+
+    writer.submit("first", slow_write, 1)
+    while not writer.busy:  # the writer thread has taken "first" and is stuck in it
+        threading.Event().wait(0.001)
+    writer.submit("second", written.append, 2)  # fills the map
+    yield writer, release, written
+    release.set()
+    writer.close()
+
+
+def test_values_under_one_key_are_coalesced():
+    writer = WriteBehindWriter()
+    written, appended = [], []
+    release = threading.Event()
+    writer.submit("block", lambda value: release.wait(5), None)
+    for i in range(3):
+        writer.submit("json", written.append, i)
+        writer.submit("rows", appended.append, i, append=True)
+    release.set()
+    writer.flush()
+    assert written == [2] and appended == [[0, 1, 2]]
+    assert writer.stats()["coalesced"] == 4
+    writer.close()
+
+
+def test_a_full_map_blocks_submit(stalled):
+    writer, release, written = stalled
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: (writer.submit("third", written.append, 3), done.set()))
+    thread.start()
+    assert not done.wait(0.1)
+    release.set()
+    assert done.wait(5)
+    writer.flush()
+    assert written == [1, 2, 3] and writer.stats()["full_waits"] == 1
+
+
+def test_non_blocking_submit_overfills_instead_of_waiting(stalled):
+    writer, release, written = stalled
+    writer.submit("third", written.append, 3, block=False)
+    assert len(writer.pending) == 2
+    release.set()
+    writer.flush()
+    assert written == [1, 2, 3]
+
+
+def test_wait_for_room_leaves_the_loop_running(stalled):
+    writer, release, _ = stalled
+
+    async def wait_and_tick():
+        ticks = 0
+        waiter = asyncio.ensure_future(writer.wait_for_room())
+        while not waiter.done():
+            ticks += 1
+            if ticks == 10:
+                release.set()
+            await asyncio.sleep(0.01)
+        return ticks
+
+    assert asyncio.run(wait_and_tick()) >= 10
+
+
+def test_close_writes_what_is_still_pending():
+    writer = WriteBehindWriter()
+    written = []
+    release = threading.Event()
+    writer.submit("block", lambda value: release.wait(5), None)
+    writer.submit("a", written.append, 1)
+    release.set()
+    writer.close()
+    assert written == [1]
+    writer.submit("late", written.append, 2)  # after close: written inline
+    assert written == [1, 2]
+
+
+def test_state_changes_are_applied_in_order(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"), compaction_interval=0)
+    writer = WriteBehindWriter()
+    writer.apply_state(store, add={"seen": ["a", "b"]})
+    writer.apply_state(store, remove={"seen": ["a"]})
+    writer.apply_state(store, add={"seen": ["a"], "other": ["c"]}, remove={"seen": ["b"]})
+    writer.set_meta(store, "cursor", "1")
+    writer.set_meta(store, "cursor", "2")
+    writer.close()
+    assert store.load("seen") == {"a"} and store.load("other") == {"c"}
+    assert store.get_meta("cursor") == "2"
+    store.close()
@@ -0,0 +1,180 @@
+'''
+Write-behind persistence on a dedicated writer thread.
+
+Callers hand writes to a bounded pending map and carry on; one thread
+drains it. Pending writes to the same key are coalesced: a newer payload
+for a JSON path or archived address replaces the queued one, snapshot rows
+queued for the same address are appended together in one call, and queued
+StateStore changes are committed in order in one transaction. JSON files
+are written to a temp file and renamed into place, so readers never see
+half a file. Everything still pending is flushed when the process exits.
+
+When the map is full, `submit` blocks until the writer catches up, so a
+stalled disk slows the producers down instead of growing memory. Code on
+the event loop must not block: it awaits `wait_for_room()` before queueing
+and passes `block=False`, so only that coroutine waits.
+'''
+
+import asyncio
+import atexit
+import threading
+from collections import OrderedDict
+
+from metrics import queue_depth
+from serialization import write_json
+
+MAX_PENDING = 10000  # distinct keys waiting to be written
+
+
+class WriteBehindWriter:
+    def __init__(self, max_pending=MAX_PENDING):
+        self.max_pending = max_pending
+        self.pending = OrderedDict()  # key -> [write function, value or list of values]
+        self.cond = threading.Condition()
+        self.busy = False
+        self.closed = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failures = 0
+        self.full_waits = 0
+        self.room_waiters = []  # (event loop, future) of coroutines in wait_for_room
+        self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, key, write, value, append=False, block=True):
+        """
+        Queue `write(value)` under `key`.
+
+        With `append`, values queued under the same key are collected and
+        written with one `write([values...])` call; otherwise the newest
+        value replaces the queued one. With `block=False` a full map takes
+        the write anyway instead of blocking the calling thread.
+        """
+        with self.cond:
+            self.submitted += 1
+            if self.closed:
+                write([value] if append else value)  # shutting down: write inline
+                return
+            waited = False
+            while True:
+                entry = self.pending.get(key)
+                if entry is not None:
+                    self.coalesced += 1
+                    if append:
+                        entry[1].append(value)
+                    else:
+                        entry[0], entry[1] = write, value
+                    return
+                if len(self.pending) < self.max_pending or not block:
+                    break
+                if not waited:
+                    self.full_waits += 1
+                    waited = True
+                self.cond.wait()
+            self.pending[key] = [write, [value] if append else value]
+            self.cond.notify_all()
+
+    async def wait_for_room(self):
+        """Wait, without blocking the event loop, until the map has room for a new key."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.cond:
+                if len(self.pending) < self.max_pending or self.closed:
+                    return
+                self.full_waits += 1
+                future = loop.create_future()
+                self.room_waiters.append((loop, future))
+            await future
+
+    def write_json(self, path, obj, pretty=None, block=True):
+        """Atomically replace the JSON file at `path` with `obj`, in the background."""
+        self.submit(path, lambda obj: write_json(path, obj, pretty), obj, block=block)
+
+    def append_payload(self, archive, address, payload, block=True):
+        """Append a raw payload to a PayloadArchive, in the background."""
+        self.submit((archive.root, address), lambda payload: archive.append(address, payload), payload,
+                    block=block)
+
+    def append_snapshot(self, store, address, snapshot, block=True):
+        """Append a PairSnapshot to a SnapshotStore, in the background."""
+        self.submit((store.root, address), lambda snapshots: store.append_many(address, snapshots),
+                    snapshot, append=True, block=block)
+
+    def apply_state(self, store, add=None, remove=None, block=True):
+        """Apply a StateStore change, in the background and in the order submitted."""
+        self.submit((store.path, "state"), store.apply_many, (add, remove), append=True, block=block)
+
+    def set_meta(self, store, key, value, block=True):
+        """Write a StateStore meta value, in the background."""
+        self.submit((store.path, "meta", key), lambda value: store.set_meta(key, value), value,
+                    block=block)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                key, (write, value) = self.pending.popitem(last=False)
+                self.busy = True
+                self.cond.notify_all()
+                waiters, self.room_waiters = self.room_waiters, []
+            for loop, future in waiters:
+                loop.call_soon_threadsafe(wake, future)
+            try:
+                write(value)
+                self.written += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"Background write failed for {key}:", e)
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        with self.cond:
+            while self.pending or self.busy:
+                self.cond.wait()
+
+    def close(self):
+        """Write everything still pending and stop the writer thread."""
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+
+    def stats(self):
+        return {
+            "pending": len(self.pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "failures": self.failures,
+            "full_waits": self.full_waits,
+        }
+
+
+def wake(future):
+    if not future.done():  # the waiting coroutine may have been cancelled
+        future.set_result(None)
+
+
+writer = None
+writer_lock = threading.Lock()
+
+
+def get_writer():
+    """The process-wide writer, started on first use."""
+    global writer
+    with writer_lock:
+        if writer is None:
+            writer = WriteBehindWriter()
+            queue_depth.set_function(lambda: len(writer.pending), queue="write_behind")
+        return writer